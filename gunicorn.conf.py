@@ -0,0 +1,46 @@
+# gunicorn.conf.py
+#
+# Production serving config:
+#     SESSION_SECRET=... gunicorn -c gunicorn.conf.py src.app:app
+#
+# preload_app imports src.app (and, via RETRIEVER_EAGER_LOAD, the FAISS index and
+# metadata) once in the master before forking, so workers share those pages copy-on-write instead
+# of each loading its own copy. INDEX_MMAP=1 additionally backs the mappable parts of
+# the index (IVF inverted lists; flat codes where FAISS has IO_FLAG_MMAP_IFC) with
+# the file's page cache, which also keeps them shared across hot-swaps and restarts.
+
+import os
+import multiprocessing
+
+bind = os.getenv("BIND", "0.0.0.0:" + os.getenv("PORT", "8000"))
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+
+# With preload, load the index in the master while importing the app so workers
+# inherit it; without preload each worker loads it in the background at startup
+if preload_app:
+    os.environ.setdefault("RETRIEVER_EAGER_LOAD", "1")
+
+# Streamed answers can take a while; keep idle keep-alive connections briefly
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+
+
+def on_starting(server):
+    # Every worker must sign cookies with the same key
+    if not os.getenv("SESSION_SECRET"):
+        server.log.warning("SESSION_SECRET is not set; sessions will not work across workers.")
+    if workers > 1 and os.getenv("CONVERSATION_STORE", "memory") == "memory":
+        server.log.warning("CONVERSATION_STORE=memory keeps history per worker; use sqlite with several workers.")
+
+
+def child_exit(server, worker):
+    # Drop a dead worker's live metrics when /metrics merges workers (PROMETHEUS_MULTIPROC_DIR)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,447 @@
+# src/answer_cache.py
+
+import os
+import re
+import json
+import time
+import threading
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# File written by build_index.py; its content changes with every new index
+INDEX_VERSION_PATH = Path("indexes/index_version.txt")
+
+# Cache configuration
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") != "0"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")  # unset = in-memory only
+
+# Precomputed FAQ answers written by faq_precompute.py (served before the answer cache)
+FAQ_ENABLED = os.getenv("FAQ_ENABLED", "1") != "0"
+FAQ_CACHE_PATH = Path(os.getenv("FAQ_CACHE_PATH", "indexes/faq_answers.json"))
+FAQ_THRESHOLD = float(os.getenv("FAQ_THRESHOLD", str(ANSWER_CACHE_THRESHOLD)))
+
+
+def normalize_question(text):
+    """
+    Normalize a question for exact-match lookups: lowercase, drop punctuation
+    and collapse whitespace.
+
+    Args:
+        text (str): Raw question text.
+
+    Returns:
+        str: Normalized question.
+    """
+    text = re.sub(r"[^\w\s%.]", " ", text.lower())
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)  # keep decimal points like 8.35
+    return " ".join(text.split())
+
+
+def read_index_version(path=INDEX_VERSION_PATH):
+    """
+    Read the version id of the current index.
+
+    Args:
+        path (Path): Location of the version file.
+
+    Returns:
+        str | None: Version id, or None if no version file exists.
+    """
+    try:
+        return Path(path).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on normalized question text and query embeddings.
+
+    Lookups check the exact normalized text first and then the nearest cached
+    query embedding by cosine similarity. Entries expire after `ttl` seconds,
+    the least recently used entry is evicted when the cache is full, and the
+    whole cache is cleared when the index version changes.
+
+    Query vectors live in one preallocated matrix; stores and evictions write
+    or free single rows, so lookups never re-stack the whole cache.
+    """
+
+    def __init__(
+        self,
+        max_entries=ANSWER_CACHE_SIZE,
+        ttl=ANSWER_CACHE_TTL,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        persist_path=ANSWER_CACHE_PATH,
+        version_path=INDEX_VERSION_PATH,
+        version_fn=None,
+    ):
+        """
+        Args:
+            version_fn (callable | None): Returns the index version currently serving
+                (None while nothing is loaded). Without it, the version file on disk is used.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.version_path = Path(version_path)
+        self.version_fn = version_fn
+        self._entries = OrderedDict()  # normalized question -> entry dict
+        self._lock = threading.Lock()
+
+        # L2-normalized query vectors, one row per entry with a vector; freed rows are reused
+        self._matrix = None
+        self._row_keys = []     # row -> key, None for a free row
+        self._rows = {}         # key -> row
+        self._free_rows = []
+
+        # Index version the cached answers were produced with
+        self._version = (version_fn() if version_fn else None) or read_index_version(self.version_path)
+        self._version_mtime = self._stat_version()
+
+        # Counters
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_stores = 0
+
+        if self.persist_path:
+            self.load()
+
+    def _stat_version(self):
+        """Return the version file's mtime, or None if it does not exist."""
+        try:
+            return self.version_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _check_version(self):
+        """Clear the cache once a new index version is serving. Caller holds the lock."""
+        if self.version_fn is not None:
+            # The serving snapshot, not the file: the hot-swap lags the rebuild by up to a poll interval
+            version = self.version_fn()
+            if version is None:
+                return
+        else:
+            mtime = self._stat_version()
+            if mtime == self._version_mtime:
+                return
+            self._version_mtime = mtime
+            version = read_index_version(self.version_path)
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self.invalidations += 1
+            self._clear()
+
+    def _expired(self, entry, now):
+        """Return True if an entry is older than the TTL."""
+        return now - entry["created_at"] > self.ttl
+
+    def _set_vector(self, key, vec):
+        """Write an entry's vector into its matrix row, taking a free row if needed. Caller holds the lock."""
+        row = self._rows.get(key)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = len(self._row_keys)
+                self._row_keys.append(None)
+                if self._matrix is None:
+                    self._matrix = np.zeros((max(16, min(self.max_entries, 1024)), len(vec)), "float32")
+                elif row >= len(self._matrix):
+                    # Grow geometrically so appends stay amortized O(dim)
+                    grown = np.zeros((2 * len(self._matrix), self._matrix.shape[1]), "float32")
+                    grown[:len(self._matrix)] = self._matrix
+                    self._matrix = grown
+            self._rows[key] = row
+            self._row_keys[row] = key
+        self._matrix[row] = vec
+
+    def _free_row(self, key):
+        """Release an entry's matrix row, if it has one. Caller holds the lock."""
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._matrix[row] = 0.0
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def _drop(self, key):
+        """Remove an entry and free its matrix row. Caller holds the lock."""
+        self._entries.pop(key, None)
+        self._free_row(key)
+
+    def _clear(self):
+        """Remove every entry and row. Caller holds the lock."""
+        self._entries.clear()
+        self._matrix = None
+        self._row_keys = []
+        self._rows = {}
+        self._free_rows = []
+
+    @staticmethod
+    def _unit(vec):
+        """Return an L2-normalized float32 copy of a vector."""
+        vec = np.asarray(vec, dtype="float32")
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, question, qv=None, top_k=None):
+        """
+        Find a cached answer for a question.
+
+        Args:
+            question (str): The user's question.
+            qv (np.ndarray | None): Query embedding; if None only exact matches are checked.
+            top_k (int | None): Number of snippets the caller wants; entries built
+                with a different top_k are not reused.
+
+        Returns:
+            dict | None: Copy of the cached result with a "cached" field, or None.
+        """
+        now = time.time()
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version()
+
+            # 1) Exact normalized-text match
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._drop(key)
+                entry = None
+            if entry is not None and (top_k is None or entry["top_k"] == top_k):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return {**entry["result"], "cached": "exact"}
+
+            if qv is None:
+                return None
+
+            # 2) Nearest cached query embedding above the similarity threshold
+            if self._rows:
+                sims = self._matrix[:len(self._row_keys)] @ self._unit(qv)
+                for i in np.argsort(-sims):
+                    if sims[i] < self.threshold:
+                        break
+                    match_key = self._row_keys[i]
+                    if match_key is None:
+                        continue
+                    match = self._entries.get(match_key)
+                    if match is None or self._expired(match, now):
+                        continue
+                    if top_k is not None and match["top_k"] != top_k:
+                        continue
+                    self._entries.move_to_end(match_key)
+                    self.semantic_hits += 1
+                    return {**match["result"], "cached": "semantic", "similarity": float(sims[i])}
+
+            self.misses += 1
+            return None
+
+    def store(self, question, qv, result, top_k=None, version=None):
+        """
+        Cache the result for a question.
+
+        Args:
+            question (str): The user's question.
+            qv (np.ndarray | None): Query embedding used for semantic lookups.
+            result (dict): Answer dictionary to cache.
+            top_k (int | None): Number of snippets used to build the result.
+            version (str | None): Index version the snippets were retrieved from. If another
+                index is serving by now (hot-swapped during the LLM call), nothing is cached.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version()
+            if version is not None and version != self._version:
+                self.stale_stores += 1
+                return
+            self._put(key, {
+                "question": question,
+                "vector": self._unit(qv) if qv is not None else None,
+                "result": result,
+                "top_k": top_k,
+                "created_at": time.time(),
+            })
+
+            # Evict least recently used entries beyond the size bound
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _put(self, key, entry):
+        """Insert or replace an entry as the most recently used one. Caller holds the lock."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if entry["vector"] is not None:
+            self._set_vector(key, entry["vector"])
+        else:
+            self._free_row(key)
+
+    def clear(self):
+        """Remove every cached entry."""
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        """
+        Return hit and miss counters.
+
+        Returns:
+            dict: Cache statistics.
+        """
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "threshold": self.threshold,
+                "index_version": self._version,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_stores": self.stale_stores,
+                "persist_path": str(self.persist_path) if self.persist_path else None,
+            }
+
+    def save(self, path=None):
+        """
+        Write the cache to a file atomically.
+
+        Args:
+            path (Path | None): Output file; defaults to persist_path (nothing is written if neither is set).
+        """
+        path = Path(path) if path else self.persist_path
+        if not path:
+            return
+        with self._lock:
+            data = {
+                "index_version": self._version,
+                "entries": [
+                    {
+                        "key": k,
+                        **{f: e[f] for f in ("question", "result", "top_k", "created_at")},
+                        "vector": e["vector"].tolist() if e["vector"] is not None else None,
+                    }
+                    for k, e in self._entries.items()
+                ],
+            }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load(self):
+        """Load entries saved by save(), skipping them if the index version changed."""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        with open(self.persist_path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("index_version") != self._version:
+            return
+        now = time.time()
+        with self._lock:
+            for e in data.get("entries", []):
+                if now - e["created_at"] > self.ttl:
+                    continue
+                vec = e.get("vector")
+                self._put(e["key"], {
+                    "question": e["question"],
+                    "vector": np.asarray(vec, dtype="float32") if vec is not None else None,
+                    "result": e["result"],
+                    "top_k": e.get("top_k"),
+                    "created_at": e["created_at"],
+                })
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+
+class PrecomputedAnswers:
+    """
+    Read-only FAQ answers precomputed by faq_precompute.py for the current
+    index version. The file is reloaded whenever it is rewritten, and its
+    answers are ignored as soon as the index version moves past the one
+    they were generated for.
+    """
+
+    def __init__(self, path=FAQ_CACHE_PATH, threshold=FAQ_THRESHOLD, version_path=INDEX_VERSION_PATH,
+                 version_fn=None):
+        self.path = Path(path)
+        self.threshold = threshold
+        self.version_path = version_path
+        self.version_fn = version_fn
+        self._cache = None
+        self._mtime = None
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def _refresh(self):
+        """Load the file again if it was rewritten or another index version started serving."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        version = self.version_fn() if self.version_fn else None
+        if mtime == self._mtime and version == self._version:
+            return
+        with self._lock:
+            if mtime != self._mtime or version != self._version:
+                self._cache = None if mtime is None else SemanticAnswerCache(
+                    max_entries=1_000_000, ttl=float("inf"), threshold=self.threshold,
+                    persist_path=self.path, version_path=self.version_path, version_fn=self.version_fn,
+                )
+                self._mtime, self._version = mtime, version
+
+    def lookup(self, question, qv=None, top_k=None):
+        """
+        Find a precomputed answer for a question (exact text, then nearest embedding).
+
+        Args:
+            question (str): The user's question.
+            qv (np.ndarray | None): Query embedding; if None only exact matches are checked.
+            top_k (int | None): Number of snippets the caller wants.
+
+        Returns:
+            dict | None: Copy of the precomputed result with cached="faq", or None.
+        """
+        self._refresh()
+        cache = self._cache
+        if cache is None:
+            return None
+        result = cache.lookup(question, qv, top_k)
+        if result is None:
+            return None
+        self.hits += 1
+        return {**result, "cached": "faq"}
+
+    def stats(self):
+        """
+        Return the number of loaded answers and hits.
+
+        Returns:
+            dict: FAQ answer statistics.
+        """
+        self._refresh()
+        cache = self._cache
+        return {
+            "path": str(self.path),
+            "entries": cache.stats()["entries"] if cache is not None else 0,
+            "index_version": cache.stats()["index_version"] if cache is not None else None,
+            "hits": self.hits,
+        }
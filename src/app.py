@@ -1,17 +1,64 @@
+import time
+
+# Measure how long importing the app takes (reported by /readyz)
+_import_started = time.perf_counter()
+
+import os
+import json
+import asyncio
+import logging
 import secrets
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+import threading
+import resource
+from collections import deque
+from fastapi import FastAPI, Request, Form, Header, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 from pathlib import Path
-from .retrieve_and_answer import answer_question
+from .retrieve_and_answer import (
+    answer_cache,
+    answer_question_async,
+    assemble_prompt,
+    async_openai_client,
+    cache_lookup,
+    cache_store,
+    call_llm_stream_async,
+    close_async_clients,
+    cpu_executor,
+    embed_with_lexical_async,
+    faq_answers,
+    IMPORT_SECONDS,
+    NO_ANSWER,
+    openai_client,
+    prompt_stats,
+    query_batcher,
+    rank_candidates_async,
+    reranker,
+    retriever,
+    RetrieverNotReady,
+    source_list,
+)
+from .embedding_engine import get_engine
+from .conversation_store import HISTORY_PAGE_SIZE, make_conversation_store
+from .batch_answer import BATCH_CONCURRENCY, BATCH_MAX_QUESTIONS, BATCH_MAX_TOP_K, answer_batch, normalize_items
+from .tracing import annotate, finish_trace, metrics_payload, start_trace
+
+# Errors are logged with their traceback; the user only sees a short message and the request id
+log = logging.getLogger("loan_assistant.app")
 
 # Initialize FastAPI app with a custom title
 app = FastAPI(title="Loan Product Assistant (BoM)")
 
-# Add session middleware with a random secret key generated on each server start
-app.add_middleware(SessionMiddleware, secret_key=secrets.token_hex(16))
+# Session cookies are signed with SESSION_SECRET so every worker (and restart) accepts them.
+# Without it a random per-process key is used, which only works with a single worker.
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+if not SESSION_SECRET:
+    print("Warning: SESSION_SECRET is not set; using a random key (sessions break across workers and restarts).")
+    SESSION_SECRET = secrets.token_hex(32)
+app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET,
+                   https_only=os.getenv("SESSION_HTTPS_ONLY", "0") == "1")
 
 # Define paths for static files and templates
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -24,42 +71,426 @@ app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 # Initialize Jinja2 template engine for rendering HTML pages
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
-# Route for the home page (GET request)
+# Chat history lives on the server; the session cookie only carries a session id
+conversations = make_conversation_store()
+
+# Per-request streaming timings (time-to-first-token and total generation time)
+stream_timings = deque(maxlen=1000)
+
+# Seconds between checks for a rebuilt index to hot-swap in (0 disables the check)
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "30"))
+
+# Token required by POST /admin/reload (the route is disabled when unset)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Load the index while importing only when asked to (gunicorn.conf.py does this with
+# preload_app so forked workers share it); otherwise it loads in the background at
+# startup and /readyz reports 503 until it is serving
+if os.getenv("RETRIEVER_EAGER_LOAD", "0") == "1":
+    try:
+        retriever.load()
+    except RetrieverNotReady as e:
+        print("Index not loaded:", e)
+
+APP_IMPORT_SECONDS = time.perf_counter() - _import_started
+STARTED_AT = time.time()
+
+async def reload_index_periodically():
+    """Hot-swap the index whenever build_index.py writes a new version."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(INDEX_RELOAD_INTERVAL)
+        try:
+            if await loop.run_in_executor(cpu_executor, retriever.reload_if_changed):
+                print("Index reloaded:", retriever.status().get("index_version"))
+        except Exception as e:
+            # Keep serving the current snapshot; try again on the next tick
+            print("Index reload failed:", e)
+
+def warmup_local_engine():
+    """Load the local embedding model in the background; a failure is retried on first use."""
+    try:
+        get_engine().warmup()
+    except Exception as e:
+        print("Embedding model warmup failed:", e)
+
+# Start loading the index and models at startup so the first question does not pay for them
+@app.on_event("startup")
+async def warmup_embeddings():
+    # Load the index off the event loop so the server accepts requests (and health checks) at once
+    retriever.load_in_background()
+    if INDEX_RELOAD_INTERVAL > 0:
+        app.state.reload_task = asyncio.get_running_loop().create_task(reload_index_periodically())
+    # Only needed when queries are embedded locally (no OpenAI key); loaded off the event
+    # loop like the index, so startup and /healthz never wait for the model
+    if openai_client is None:
+        threading.Thread(target=warmup_local_engine, name="embed-warmup", daemon=True).start()
+    # Load the cross-encoder off the event loop; requests keep FAISS order until it is ready
+    if reranker is not None:
+        reranker.warmup_in_background()
+
+# Release the shared OpenAI connection pool and executor on shutdown
+@app.on_event("shutdown")
+async def shutdown_clients():
+    if getattr(app.state, "reload_task", None) is not None:
+        app.state.reload_task.cancel()
+    await close_async_clients()
+
+# Route reporting embedding engine load time and encode latency
+@app.get("/stats/embedding")
+async def embedding_stats():
+    return get_engine().stats()
+
+# Route reporting micro-batching metrics for query embeddings
+@app.get("/stats/batching")
+async def batching_stats():
+    return query_batcher.stats()
+
+# Route reporting answer cache hit and miss counters
+@app.get("/stats/cache")
+async def cache_stats():
+    return answer_cache.stats() if answer_cache is not None else {"enabled": False}
+
+# Route reporting precomputed FAQ answers loaded for the current index and how often they were served
+@app.get("/stats/faq")
+async def faq_stats():
+    return faq_answers.stats() if faq_answers is not None else {"enabled": False}
+
+# Route reporting time-to-first-token and generation time for streamed answers
+@app.get("/stats/streaming")
+async def streaming_stats():
+    timings = list(stream_timings)
+    ttfts = sorted(t["ttft_seconds"] for t in timings if t["ttft_seconds"] is not None)
+    totals = sorted(t["total_seconds"] for t in timings)
+    return {
+        "requests": len(timings),
+        "p50_ttft_seconds": ttfts[len(ttfts) // 2] if ttfts else None,
+        "p50_total_seconds": totals[len(totals) // 2] if totals else None,
+        "recent": timings[-20:],
+    }
+
+# Route reporting prompt token counts after snippet deduplication and budgeting
+@app.get("/stats/prompt")
+async def prompt_size_stats():
+    return prompt_stats.stats()
+
+# Route reporting cross-encoder rerank latency and budget fallbacks
+@app.get("/stats/rerank")
+async def rerank_stats():
+    return reranker.stats() if reranker is not None else {"enabled": False}
+
+def session_id(request):
+    """
+    Return the visitor's conversation id, creating one on the first visit.
+
+    Args:
+        request (Request): Incoming request with the signed session cookie.
+
+    Returns:
+        str: Session id.
+    """
+    # Cookies written before the server-side store carried the whole transcript
+    request.session.pop("messages", None)
+    if "sid" not in request.session:
+        request.session["sid"] = secrets.token_urlsafe(16)
+    return request.session["sid"]
+
+def request_id(request):
+    """Return the caller's X-Request-ID (e.g. from a proxy), or None to generate one."""
+    return request.headers.get("x-request-id")
+
+def record_exchange(sid, question, answer):
+    """Append a question and its answer to the server-side history."""
+    conversations.append(sid, "user", question)
+    conversations.append(sid, "bot", answer)
+
+async def run_blocking(fn, *args):
+    """
+    Run a blocking call in the default executor, so the event loop keeps serving
+    other requests. Used for the conversation store, whose SQLite backend can
+    wait up to CONVERSATION_BUSY_TIMEOUT for a lock.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+def process_memory():
+    """
+    Report this worker's memory use. PSS splits shared pages (the preloaded or
+    memory-mapped index) between the processes using them, so it stays flat
+    per worker as workers are added, unlike RSS.
+
+    Returns:
+        dict: Resident, proportional and private memory in bytes (where available).
+    """
+    mem = {"pid": os.getpid(), "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+
+        def kb(name):
+            return int(fields[name].split()[0]) * 1024
+
+        mem.update({
+            "rss_bytes": kb("Rss"),
+            "pss_bytes": kb("Pss"),
+            "shared_bytes": kb("Shared_Clean") + kb("Shared_Dirty"),
+            "private_bytes": kb("Private_Clean") + kb("Private_Dirty"),
+        })
+    except (OSError, KeyError, ValueError):
+        pass  # not Linux
+    mem["index_mmapped"] = retriever.status().get("index_mmapped")
+    return mem
+
+# Route reporting this worker's resident and shared memory
+@app.get("/stats/memory")
+async def memory_stats():
+    return process_memory()
+
+# Route exposing Prometheus metrics: per-stage latency, token usage, cache hits, retrieval scores
+@app.get("/metrics")
+async def metrics():
+    body, content_type = metrics_payload()
+    if body is None:
+        return PlainTextResponse("prometheus_client is not installed\n", status_code=503)
+    return Response(body, media_type=content_type)
+
+# Liveness probe: the process is up and serving HTTP, whether or not the index is loaded
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "uptime_seconds": round(time.time() - STARTED_AT, 1)}
+
+# Readiness probe: 200 once the index is serving, 503 while it loads or if loading failed
+@app.get("/readyz")
+async def readyz():
+    body = {
+        "ready": retriever.ready,
+        "retriever": retriever.status(),
+        "import_seconds": {"app": round(APP_IMPORT_SECONDS, 4), "retrieve_and_answer": round(IMPORT_SECONDS, 4)},
+    }
+    return JSONResponse(body, status_code=200 if retriever.ready else 503)
+
+# Route to hot-swap a rebuilt index without restarting (requires the X-Admin-Token header)
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: str = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404)
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        # Load the new snapshot off the event loop; requests keep using the old one meanwhile
+        status = await asyncio.get_running_loop().run_in_executor(cpu_executor, retriever.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}")
+    return status
+
+# Route reporting conversation store size
+@app.get("/stats/conversations")
+async def conversation_stats():
+    return await run_blocking(conversations.stats)
+
+# Route for the home page (GET request); ?page=2 shows older messages
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
-    # Retrieve chat messages from the user's session (if any)
-    messages = request.session.get("messages", [])
+async def home(request: Request, page: int = 1):
+    # Retrieve one page of chat messages for this session
+    page = max(1, page)
+    messages, total = await run_blocking(conversations.get_page, session_id(request), page, HISTORY_PAGE_SIZE)
+    pages = max(1, -(-total // HISTORY_PAGE_SIZE))
     # Render the index.html template with messages
-    return templates.TemplateResponse("index.html", {"request": request, "messages": messages})
+    return templates.TemplateResponse(
+        "index.html", {"request": request, "messages": messages, "page": page, "pages": pages}
+    )
 
 # Route to handle user question submission (POST request)
 @app.post("/", response_class=HTMLResponse)
 async def ask(request: Request, question: str = Form(...)):
-    # Retrieve previous messages from session
-    messages = request.session.get("messages", [])
-
+    trace = start_trace("ask", request_id(request))
+    error = None
     try:
-        # Call the function to get an answer for the user's question
-        result = answer_question(question, top_k=5)
+        # Answer without blocking the event loop so other requests keep flowing
+        result = await answer_question_async(question, top_k=5)
         # Extract the answer text from the result or show a fallback message
         answer_text = result.get("answer", "Sorry, I couldn’t find that.")
+    except RetrieverNotReady as e:
+        # The index is still loading (or missing); tell the user instead of showing an error
+        error, answer_text = e, str(e)
     except Exception as e:
-        # Handle errors and show error message in the chat
-        answer_text = f"Error: {str(e)}"
+        # Log the traceback; the chat only shows a reference to it
+        error = e
+        log.exception("ask failed (request_id=%s)", trace.request_id)
+        answer_text = f"Sorry, something went wrong while answering. (request id: {trace.request_id})"
+    finish_trace(trace, error)
 
-    # Append user question and bot answer to session messages
-    messages.append({"sender": "user", "text": question})
-    messages.append({"sender": "bot", "text": answer_text})
-    # Update session with the latest conversation history
-    request.session["messages"] = messages
+    # Store user question and bot answer server-side
+    await run_blocking(record_exchange, session_id(request), question, answer_text)
 
     # Redirect back to the home page to display updated chat
-    return RedirectResponse(url="/", status_code=303)
+    return RedirectResponse(url="/", status_code=303, headers={"X-Request-ID": trace.request_id})
+
+def sse_event(event, data):
+    """
+    Format a Server-Sent Event with a JSON payload.
+
+    Args:
+        event (str): Event name.
+        data: JSON-serialisable payload.
+
+    Returns:
+        str: Encoded SSE frame.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Route to stream an answer over Server-Sent Events: sources first, then LLM tokens
+@app.get("/stream")
+async def ask_stream(request: Request, question: str):
+    sid = session_id(request)
+    rid = request_id(request) or secrets.token_hex(16)
+
+    async def events():
+        trace = start_trace("stream", rid)
+        error = None
+        started = time.perf_counter()
+        ttft = None
+        prompt_report = rerank_info = None
+        answer = ""
+        try:
+            # Serve cached answers (exact text, then similar question) in one go
+            cached = cache_lookup(question, top_k=5)
+            qv = lexical_hits = None
+            if not cached:
+                qv, lexical_hits = await embed_with_lexical_async(question)
+                cached = cache_lookup(question, qv, top_k=5)
+            if cached:
+                yield sse_event("sources", source_list(cached["retrieved"], cached.get("prompt")))
+                ttft = time.perf_counter() - started
+                answer = cached["answer"]
+                yield sse_event("token", answer)
+            else:
+                # Send the sources that made it into the prompt as soon as retrieval finishes
+                version = retriever.version
+                retrieved, rerank_info = await rank_candidates_async(question, qv, 5, lexical_hits)
+                if retrieved:
+                    prompt, prompt_report = assemble_prompt(question, retrieved)
+                yield sse_event("sources", source_list(retrieved, prompt_report))
+
+                if not retrieved:
+                    # No snippet passed the similarity cutoff: answer without the LLM
+                    answer = NO_ANSWER
+                    yield sse_event("token", answer)
+                elif not async_openai_client:
+                    answer = "OPENAI_API_KEY not set — only retrieval performed."
+                    yield sse_event("token", answer)
+                else:
+                    # Stream LLM tokens as they arrive
+                    tokens = []
+                    async for token in call_llm_stream_async(prompt):
+                        if ttft is None:
+                            ttft = time.perf_counter() - started
+                        tokens.append(token)
+                        yield sse_event("token", token)
+                    answer = "".join(tokens)
+                    cache_store(question, qv, {"answer": answer, "retrieved": retrieved,
+                                               "prompt": prompt_report}, 5, version)
+        except RetrieverNotReady as e:
+            error, answer = e, str(e)
+            yield sse_event("error", answer)
+        except Exception as e:
+            error = e
+            log.exception("stream failed (request_id=%s)", rid)
+            answer = f"Sorry, something went wrong while answering. (request id: {rid})"
+            yield sse_event("error", answer)
+
+        # Save the finished exchange in the server-side history
+        await run_blocking(record_exchange, sid, question, answer)
+
+        # Record and report timings for this request
+        timing = {
+            "ttft_seconds": ttft,
+            "total_seconds": time.perf_counter() - started,
+            "prompt_tokens": prompt_report["prompt_tokens"] if prompt_report else None,
+            "rerank_ms": rerank_info["rerank_ms"] if rerank_info else None,
+        }
+        stream_timings.append(timing)
+        annotate(ttft_ms=round(ttft * 1000, 2) if ttft is not None else None)
+        finish_trace(trace, error)
+        yield sse_event("done", {**timing, "request_id": rid})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Request-ID": rid},
+    )
+
+def int_param(body, name, default, low, high):
+    """
+    Read an integer request parameter, rejecting anything outside [low, high] with a 400.
+
+    Args:
+        body (dict): Parsed JSON body.
+        name (str): Parameter name.
+        default (int): Value when the parameter is missing.
+        low (int): Smallest accepted value.
+        high (int): Largest accepted value.
+
+    Returns:
+        int: The parameter value.
+    """
+    value = body.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an integer")
+    if not low <= value <= high:
+        raise HTTPException(status_code=400, detail=f"{name} must be between {low} and {high}")
+    return value
+
+# Route to answer many questions at once; results stream back as NDJSON in completion order
+@app.post("/batch")
+async def ask_batch(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    # Either {"questions": [...], "top_k": 5, "concurrency": 8} or a bare list of questions
+    if isinstance(body, list):
+        body = {"questions": body}
+    if not isinstance(body, dict) or not isinstance(body.get("questions", []), list):
+        raise HTTPException(status_code=400, detail='Body must be a list of questions or {"questions": [...]}')
+    try:
+        items = normalize_items(body.get("questions") or [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not items:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(items) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    top_k = int_param(body, "top_k", 5, 1, BATCH_MAX_TOP_K)
+    concurrency = int_param(body, "concurrency", BATCH_CONCURRENCY, 1, BATCH_CONCURRENCY)
+    if not retriever.ready:
+        return JSONResponse({"detail": "The index is still loading"}, status_code=503)
+    rid = request_id(request) or secrets.token_hex(16)
+
+    async def lines():
+        trace = start_trace("batch", rid)
+        annotate(questions=len(items))
+        error = None
+        try:
+            async for rec in answer_batch(items, top_k, concurrency):
+                yield json.dumps(rec, ensure_ascii=False) + "\n"
+        except Exception as e:
+            error = e
+            log.exception("batch failed (request_id=%s)", rid)
+            yield json.dumps({"error": f"Batch failed (request id: {rid})"}) + "\n"
+        finally:
+            finish_trace(trace, error)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Request-ID": rid})
 
 # Route to clear the chat session
 @app.get("/clear")
 async def clear_session(request: Request):
-    # Remove all stored session data
+    # Remove the stored history and start a new session
+    await run_blocking(conversations.clear, session_id(request))
     request.session.clear()
     # Redirect back to the home page
     return RedirectResponse(url="/", status_code=303)
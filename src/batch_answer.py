@@ -0,0 +1,258 @@
+# src/batch_answer.py
+
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+import contextvars
+from pathlib import Path
+from dotenv import load_dotenv
+
+try:
+    from . import retrieve_and_answer as ra
+except ImportError:  # executed as a script: python src/batch_answer.py
+    import retrieve_and_answer as ra
+
+# Load environment variables from .env file
+load_dotenv()
+
+# LLM calls in flight at once, and the request rate they may not exceed (0 = unlimited)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_RPM = float(os.getenv("BATCH_RPM", "0"))
+
+# Largest batch and largest top_k the web endpoint accepts
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+BATCH_MAX_TOP_K = int(os.getenv("BATCH_MAX_TOP_K", "20"))
+
+
+def normalize_items(records):
+    """
+    Turn input records into (id, question) items. Accepts plain strings and
+    dicts with "question", or the requests.jsonl shape ("request_id", "title", "body").
+
+    Args:
+        records (list): Strings or dicts.
+
+    Returns:
+        list[dict]: Items with "id" and "question"; records without text are skipped.
+
+    Raises:
+        ValueError: If a record is neither a string nor a dict, or its question is not a string.
+    """
+    items = []
+    for n, rec in enumerate(records, 1):
+        if isinstance(rec, str):
+            rec = {"question": rec}
+        if not isinstance(rec, dict):
+            raise ValueError(f"Question {n} must be a string or an object, not {type(rec).__name__}")
+        question = rec.get("question") or rec.get("body") or rec.get("title") or ""
+        if not isinstance(question, str):
+            raise ValueError(f"Question {n} must be a string, not {type(question).__name__}")
+        question = question.strip()
+        if question:
+            items.append({"id": str(rec.get("id") or rec.get("request_id") or n), "question": question})
+    return items
+
+
+def load_questions(path):
+    """
+    Read questions from a JSONL or CSV file (see normalize_items for the columns).
+
+    Args:
+        path (Path): Input file; CSV is detected by its extension.
+
+    Returns:
+        list[dict]: Items with "id" and "question".
+    """
+    path = Path(path)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            return normalize_items(list(csv.DictReader(f)))
+        return normalize_items([json.loads(line) for line in f if line.strip()])
+
+
+class AsyncRateLimiter:
+    """Spaces call starts evenly so they never exceed a requests-per-minute rate."""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        """Sleep until the next call may start."""
+        if not self.interval:
+            return
+        # No await between reading and advancing the slot, so concurrent callers get distinct slots
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+# One limiter and one set of LLM call slots per process, so concurrent batches together stay
+# under BATCH_RPM and BATCH_CONCURRENCY and leave OpenAI capacity for interactive questions
+batch_limiter = AsyncRateLimiter(BATCH_RPM)
+batch_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+
+def result_record(item, started, answer=None, retrieved=(), prompt_report=None, cached=False, note=None, error=None):
+    """Build the output record for one question."""
+    return {
+        "id": item["id"],
+        "question": item["question"],
+        "answer": answer,
+        "sources": ra.source_list(list(retrieved), prompt_report),
+        "cached": cached,
+        "note": note,
+        "error": error,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+async def answer_batch(items, top_k=5, concurrency=BATCH_CONCURRENCY, rpm=None):
+    """
+    Answer many questions at once, yielding each result as soon as it is ready.
+
+    Exact cache hits are returned first. The remaining questions are embedded in
+    one batched call and searched with one FAISS call over the query matrix;
+    their LLM calls then run concurrently, at most `concurrency` at a time and
+    no faster than `rpm` per minute, so throughput grows with concurrency until
+    the rate limit (or OPENAI_MAX_CONNECTIONS) is reached.
+
+    Args:
+        items (list[dict]): Items with "id" and "question" (see normalize_items).
+        top_k (int): Number of snippets retrieved per question.
+        concurrency (int): Maximum LLM calls in flight.
+        rpm (float | None): Maximum LLM calls started per minute (0 = unlimited); None shares
+            the process-wide BATCH_RPM limiter and BATCH_CONCURRENCY call slots with every
+            other batch (the web endpoint).
+
+    Yields:
+        dict: One result record per question, in completion order.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+
+    # Exact-text cache hits need neither an embedding nor a search
+    pending = []
+    for item in items:
+        cached = ra.cache_lookup(item["question"], top_k=top_k)
+        if cached:
+            yield result_record(item, started, cached.get("answer"), cached.get("retrieved", []),
+                                cached.get("prompt"), cached=True)
+        else:
+            pending.append(item)
+    if not pending:
+        return
+
+    # One embedding call for every question, then one FAISS search over the query matrix
+    ra.retriever.require()
+    questions = [item["question"] for item in pending]
+    ctx = contextvars.copy_context()
+    queries = await loop.run_in_executor(None, ctx.run, ra.embed_queries, questions)
+    version = ra.retriever.version
+    ranked = await loop.run_in_executor(ra.cpu_executor, ctx.run, ra.rank_candidates_batch, questions, queries, top_k)
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    limiter = batch_limiter if rpm is None else AsyncRateLimiter(rpm)
+    slots = batch_slots if rpm is None else contextlib.nullcontext()
+
+    async def generate(item, qv, retrieved, prompt, prompt_report, rerank_info):
+        """Call the LLM for one question within the concurrency and rate limits."""
+        try:
+            async with sem, slots:
+                await limiter.wait()
+                answer = await ra.call_llm_async(prompt)
+        except Exception as e:
+            return result_record(item, started, retrieved=retrieved, prompt_report=prompt_report,
+                                 error=f"{type(e).__name__}: {e}")
+        ra.cache_store(item["question"], qv, {"answer": answer, "retrieved": retrieved,
+                                              "prompt": prompt_report, "rerank": rerank_info}, top_k, version)
+        return result_record(item, started, answer, retrieved, prompt_report)
+
+    tasks = []
+    for item, qv, (retrieved, rerank_info) in zip(pending, queries, ranked):
+        # Similar questions answered before are served from the cache
+        cached = ra.cache_lookup(item["question"], qv, top_k)
+        if cached:
+            yield result_record(item, started, cached.get("answer"), cached.get("retrieved", []),
+                                cached.get("prompt"), cached=True)
+        elif not retrieved:
+            yield result_record(item, started, ra.NO_ANSWER, note=ra.no_answer_result()["note"])
+        else:
+            prompt, prompt_report = ra.assemble_prompt(item["question"], retrieved)
+            if not ra.async_openai_client:
+                yield result_record(item, started, None, retrieved, prompt_report,
+                                    note="OPENAI_API_KEY not set — only retrieval performed.")
+            else:
+                tasks.append(asyncio.ensure_future(
+                    generate(item, qv, retrieved, prompt, prompt_report, rerank_info)))
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer went away (e.g. client disconnected): stop the remaining calls
+        for task in tasks:
+            task.cancel()
+
+
+async def run_file(path, out, top_k, concurrency, rpm):
+    """
+    Answer every question in a file and write one JSON line per result as it finishes.
+
+    Returns:
+        dict: Counts and throughput for the run.
+    """
+    items = load_questions(path)
+    started = time.perf_counter()
+    counts = {"questions": len(items), "answered": 0, "cached": 0, "errors": 0}
+    async for rec in answer_batch(items, top_k, concurrency, rpm):
+        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        out.flush()
+        counts["answered"] += rec["error"] is None
+        counts["cached"] += rec["cached"]
+        counts["errors"] += rec["error"] is not None
+    elapsed = time.perf_counter() - started
+    counts["seconds"] = round(elapsed, 2)
+    counts["questions_per_second"] = round(len(items) / elapsed, 2) if elapsed else None
+    await ra.close_async_clients()
+    return counts
+
+
+def main(argv=None):
+    """
+    Answer a file of questions in bulk, e.g.:
+        python src/batch_answer.py questions.csv --out answers.jsonl --concurrency 16 --rpm 500
+    """
+    parser = argparse.ArgumentParser(description="Answer many questions from a JSONL or CSV file.")
+    parser.add_argument("input", type=Path, help="JSONL or CSV with question (or title/body) and optional id")
+    parser.add_argument("--out", type=Path, help="Output JSONL (default: stdout)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--rpm", type=float, default=BATCH_RPM, help="Max LLM calls per minute (0 = unlimited)")
+    args = parser.parse_args(argv)
+
+    try:
+        ra.retriever.load()
+    except ra.RetrieverNotReady as e:
+        print(e, file=sys.stderr)
+        raise SystemExit(1)
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        counts = asyncio.run(run_file(args.input, out, args.top_k, args.concurrency, args.rpm))
+    finally:
+        if args.out:
+            out.close()
+    print(json.dumps(counts), file=sys.stderr)
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
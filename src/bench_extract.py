@@ -0,0 +1,143 @@
+# src/bench_extract.py
+
+import json
+import glob
+import gzip
+import time
+import difflib
+import argparse
+from pathlib import Path
+
+try:
+    from .extract import EXTRACTORS, available_backends
+except ImportError:  # executed as a script: python src/bench_extract.py
+    from extract import EXTRACTORS, available_backends
+
+# Saved crawl output used as fixtures when no directory is given
+HTML_GLOB = "data/raw/html/*.html.gz"
+LEGACY_GLOB = "data/raw/*.json"
+
+
+def load_fixtures(fixtures_dir=None):
+    """
+    Load HTML pages to benchmark on.
+
+    Args:
+        fixtures_dir (str | None): Directory of .html / .html.gz files. When omitted,
+            the compressed pages saved by scrape.py are used, falling back to
+            raw_html inside older data/raw/*.json records.
+
+    Returns:
+        list[tuple]: (name, html) pairs.
+    """
+    if fixtures_dir:
+        paths = sorted(glob.glob(str(Path(fixtures_dir) / "*.html")) + glob.glob(str(Path(fixtures_dir) / "*.html.gz")))
+    else:
+        paths = sorted(glob.glob(HTML_GLOB))
+
+    pages = []
+    for p in paths:
+        opener = gzip.open if p.endswith(".gz") else open
+        with opener(p, "rt", encoding="utf-8") as f:
+            pages.append((Path(p).name, f.read()))
+
+    if not pages and not fixtures_dir:
+        for p in sorted(glob.glob(LEGACY_GLOB)):
+            with open(p, encoding="utf-8") as f:
+                html = json.load(f).get("raw_html")
+            if html:
+                pages.append((Path(p).name, html))
+    return pages
+
+
+def time_backend(fn, pages, repeats):
+    """
+    Time one extractor over all pages.
+
+    Args:
+        fn (callable): Extraction function.
+        pages (list[tuple]): (name, html) pairs.
+        repeats (int): Passes over the pages; the fastest is kept.
+
+    Returns:
+        tuple: (best seconds for one pass, list of extracted texts)
+    """
+    texts = [fn(html) for _, html in pages]  # warm-up pass, also the output compared below
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _, html in pages:
+            fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best, texts
+
+
+def benchmark(pages, backends, repeats=5, reference="bs4"):
+    """
+    Compare extractor speed and output against a reference backend.
+
+    Args:
+        pages (list[tuple]): (name, html) pairs.
+        backends (list[str]): Backends to compare.
+        repeats (int): Timed passes per backend.
+        reference (str): Backend whose output is treated as ground truth.
+
+    Returns:
+        list[dict]: One result row per backend.
+    """
+    results = {name: time_backend(EXTRACTORS[name], pages, repeats) for name in backends}
+    ref_seconds, ref_texts = results.get(reference, (None, None))
+
+    rows = []
+    for name, (seconds, texts) in results.items():
+        row = {
+            "backend": name,
+            "ms_per_page": round(1000 * seconds / len(pages), 3),
+            "pages_per_second": round(len(pages) / seconds, 1) if seconds > 0 else None,
+            "speedup": round(ref_seconds / seconds, 2) if ref_seconds and seconds > 0 else None,
+            "exact_match": None,
+            "similarity": None,
+        }
+
+        # Text equivalence with the reference backend
+        if ref_texts is not None:
+            ratios = [difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() for a, b in zip(ref_texts, texts)]
+            row["exact_match"] = round(sum(a == b for a, b in zip(ref_texts, texts)) / len(pages), 4)
+            row["similarity"] = round(sum(ratios) / len(ratios), 4)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    """
+    Benchmark the HTML extractor backends on saved pages and print a table.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark HTML text extraction backends.")
+    parser.add_argument("--fixtures", help="Directory of .html / .html.gz pages (default: saved crawl output)")
+    parser.add_argument("--backends", nargs="*", help="Backends to compare (default: all installed)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", help="Optional path to save the results as JSON")
+    args = parser.parse_args(argv)
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        raise SystemExit("No HTML fixtures found. Run src/scrape.py first or pass --fixtures.")
+    backends = args.backends or available_backends()
+    rows = benchmark(pages, backends, args.repeats)
+
+    # Print results as an aligned table
+    total_kb = sum(len(html) for _, html in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb:.0f} KiB of HTML, reference backend: bs4")
+    header = ["backend", "ms_per_page", "pages_per_second", "speedup", "exact_match", "similarity"]
+    print("  ".join(f"{h:>16}" for h in header))
+    for r in rows:
+        print("  ".join(f"{str(r[h]):>16}" for h in header))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
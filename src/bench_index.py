@@ -0,0 +1,157 @@
+# src/bench_index.py
+
+import json
+import time
+import argparse
+import faiss
+import numpy as np
+
+try:
+    from .build_index import load_embeddings
+    from .index_factory import build_faiss_index, index_memory_bytes, normalized_vectors
+except ImportError:  # executed as a script: python src/bench_index.py
+    from build_index import load_embeddings
+    from index_factory import build_faiss_index, index_memory_bytes, normalized_vectors
+
+# Configurations compared when none are given on the command line
+DEFAULT_CONFIGS = [
+    "flat",
+    "ivf_flat:nlist=64,nprobe=1",
+    "ivf_flat:nlist=64,nprobe=8",
+    "hnsw:hnsw_m=32,ef_search=16",
+    "hnsw:hnsw_m=32,ef_search=64",
+    "ivf_pq:nlist=64,nprobe=8,pq_m=16",
+    "sq8",
+]
+
+
+def parse_config(spec):
+    """
+    Parse a configuration string such as "ivf_flat:nlist=64,nprobe=8".
+
+    Args:
+        spec (str): Index type optionally followed by ":key=value,..." parameters.
+
+    Returns:
+        tuple: (index_type, params dict)
+    """
+    index_type, _, rest = spec.partition(":")
+    params = {}
+    for item in filter(None, rest.split(",")):
+        key, _, value = item.partition("=")
+        params[key.strip()] = int(value)
+    return index_type.strip(), params
+
+
+def make_queries(vecs, n_queries, noise=0.05, seed=0):
+    """
+    Build benchmark queries by perturbing randomly chosen corpus vectors.
+
+    Args:
+        vecs (np.ndarray): Corpus vectors.
+        n_queries (int): Number of queries to generate.
+        noise (float): Standard deviation of the Gaussian noise, relative to vector norm.
+        seed (int): Random seed.
+
+    Returns:
+        np.ndarray: 2D float32 array of query vectors.
+    """
+    rng = np.random.default_rng(seed)
+    picks = vecs[rng.integers(0, len(vecs), n_queries)]
+    scale = noise * np.linalg.norm(picks, axis=1, keepdims=True) / np.sqrt(vecs.shape[1])
+    return (picks + rng.normal(size=picks.shape) * scale).astype("float32")
+
+
+def recall_at_k(found, truth, k):
+    """
+    Average fraction of the exact top-k neighbours present in the approximate top-k.
+
+    Args:
+        found (np.ndarray): Approximate result ids, shape (n_queries, k).
+        truth (np.ndarray): Exact result ids, shape (n_queries, k).
+        k (int): Cut-off.
+
+    Returns:
+        float: Recall@k in [0, 1].
+    """
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / float(len(truth) * k)
+
+
+def benchmark(vecs, queries, specs, k=5, repeats=3):
+    """
+    Build each index configuration and measure recall@k, QPS and memory.
+
+    Args:
+        vecs (np.ndarray): Corpus vectors.
+        queries (np.ndarray): Query vectors.
+        specs (list[str]): Configuration strings (see parse_config).
+        k (int): Number of neighbours to retrieve.
+        repeats (int): Timed search repetitions (best one is reported).
+
+    Returns:
+        list[dict]: One result row per configuration.
+    """
+    # Exact results from a flat index are the ground truth
+    flat, _ = build_faiss_index(vecs, "flat")
+    _, truth = flat.search(queries, k)
+
+    rows = []
+    for spec in specs:
+        index_type, params = parse_config(spec)
+        start = time.perf_counter()
+        index, params = build_faiss_index(vecs, index_type, params)
+        build_seconds = time.perf_counter() - start
+
+        # Keep the fastest of several runs to reduce timer noise
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            _, found = index.search(queries, k)
+            best = min(best, time.perf_counter() - start)
+
+        rows.append({
+            "config": spec,
+            f"recall@{k}": round(recall_at_k(found, truth, k), 4),
+            "qps": round(len(queries) / best, 1) if best > 0 else None,
+            "memory_bytes": index_memory_bytes(index),
+            "build_seconds": round(build_seconds, 4),
+        })
+    return rows
+
+
+def main(argv=None):
+    """
+    Compare index configurations against the exact flat index and print a table.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index configurations.")
+    parser.add_argument("configs", nargs="*", default=DEFAULT_CONFIGS,
+                        help='e.g. "flat" "hnsw:ef_search=32" "ivf_flat:nlist=64,nprobe=4"')
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--json", help="Optional path to save the results as JSON")
+    args = parser.parse_args(argv)
+
+    vecs, _ = load_embeddings()
+    queries = make_queries(vecs, args.queries)
+
+    # Benchmark with the same cosine setup build_index.py uses by default
+    vecs = normalized_vectors(vecs)
+    faiss.normalize_L2(queries)
+    rows = benchmark(vecs, queries, args.configs, k=args.k)
+
+    # Print results as an aligned table
+    print(f"{len(vecs)} vectors, dim {vecs.shape[1]}, {len(queries)} queries")
+    header = ["config", f"recall@{args.k}", "qps", "memory_bytes", "build_seconds"]
+    print("  ".join(f"{h:>34}" if i == 0 else f"{h:>14}" for i, h in enumerate(header)))
+    for r in rows:
+        print("  ".join(f"{str(r[h]):>34}" if i == 0 else f"{str(r[h]):>14}" for i, h in enumerate(header)))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
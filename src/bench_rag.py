@@ -0,0 +1,391 @@
+# src/bench_rag.py
+
+import os
+import json
+import math
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .stub_openai import STUB_DIM, serve, stub_vector
+    from .index_factory import CONFIG_PATH, build_faiss_index, chunk_faiss_id, save_index_config
+    from .lexical_index import LEXICAL_PATH, build_lexical_index
+    from .meta_store import write_meta_store
+except ImportError:  # executed as a script: python src/bench_rag.py
+    from stub_openai import STUB_DIM, serve, stub_vector
+    from index_factory import CONFIG_PATH, build_faiss_index, chunk_faiss_id, save_index_config
+    from lexical_index import LEXICAL_PATH, build_lexical_index
+    from meta_store import write_meta_store
+
+# Labelled questions: {"question": ..., "relevant": [{"source_url": ..., "text": <evidence span>}]} per line.
+# Labels name a page and a passage of it rather than chunk ids, so re-chunking does not invalidate them.
+GOLDEN_PATH = Path("data/golden_questions.jsonl")
+
+# Chunks the throwaway stub index is built from
+CHUNKS_PATH = Path("data/chunks.jsonl")
+
+# Stages timed for every question, in pipeline order
+STAGES = ["embed", "search", "prompt", "llm", "total"]
+
+
+def load_golden(path=GOLDEN_PATH):
+    """
+    Read the golden question set.
+
+    Args:
+        path (Path): JSONL file with "question" and "relevant" (source_url plus evidence text) per line.
+
+    Returns:
+        list[dict]: Golden records.
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentiles(values_ms):
+    """
+    Summarise latencies with nearest-rank percentiles.
+
+    Args:
+        values_ms (list[float]): Latencies in milliseconds.
+
+    Returns:
+        dict: Count, mean, p50, p95 and p99 in milliseconds.
+    """
+    vals = sorted(values_ms)
+    if not vals:
+        return {"n": 0, "mean": None, "p50": None, "p95": None, "p99": None}
+
+    def rank(p):
+        return round(vals[max(0, math.ceil(p / 100 * len(vals)) - 1)], 3)
+
+    return {"n": len(vals), "mean": round(sum(vals) / len(vals), 3), "p50": rank(50), "p95": rank(95), "p99": rank(99)}
+
+
+def _normalize(text):
+    """Lower-case and collapse whitespace, so spans match regardless of line breaks and case."""
+    return " ".join((text or "").lower().split())
+
+
+def is_relevant(chunk, label):
+    """
+    Check whether a retrieved chunk contains a labelled evidence span.
+
+    Args:
+        chunk (dict): Retrieved chunk with "source_url" and "text".
+        label (dict): {"source_url", "text"} from the golden set.
+
+    Returns:
+        bool: True if the chunk comes from the labelled page and contains the span.
+    """
+    return chunk.get("source_url") == label["source_url"] and _normalize(label["text"]) in _normalize(chunk.get("text"))
+
+
+def recall_at_k(found, labels, k):
+    """
+    Fraction of the labelled evidence spans found in the first k results.
+
+    Args:
+        found (list[dict]): Retrieved chunks, best first.
+        labels (list[dict]): Labelled evidence spans.
+        k (int): Cut-off.
+
+    Returns:
+        float: Recall@k in [0, 1].
+    """
+    if not labels:
+        return 0.0
+    return sum(any(is_relevant(c, label) for c in found[:k]) for label in labels) / float(len(labels))
+
+
+def git_commit():
+    """Return the short hash of the checked-out commit, or None outside a git checkout."""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_stub(args):
+    """
+    Start the local OpenAI-compatible stub and point the OpenAI clients at it.
+    Must run before retrieve_and_answer is imported, which reads these variables.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line options.
+
+    Returns:
+        ThreadingHTTPServer: The running stub server.
+    """
+    server = serve(port=0, latency=args.embed_latency, llm_latency=args.llm_latency,
+                   token_latency=args.token_latency, answer_tokens=args.answer_tokens)
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    return server
+
+
+def build_stub_index(out_dir, chunks_path=CHUNKS_PATH, dim=STUB_DIM):
+    """
+    Build a throwaway flat index over the current chunks with the stub's
+    vectors, so queries embedded by the stub are searched against vectors from
+    the same model. The real index was built with a different model, and
+    searching it with stub vectors would give meaningless results.
+
+    Args:
+        out_dir (Path): Directory for the index, metadata and sidecar files.
+        chunks_path (Path): Chunks JSONL written by chunk.py.
+        dim (int): Vector dimension the stub returns.
+
+    Returns:
+        Path: The FAISS index file (its sidecars are written next to it).
+    """
+    import faiss
+    import numpy as np
+
+    with open(chunks_path, encoding="utf-8") as f:
+        chunks = [json.loads(line) for line in f if line.strip()]
+    metas = [{
+        "chunk_id": c["chunk_id"],
+        "source_url": c["source_url"],
+        "text": c["text"],
+        "n_tokens": c.get("n_tokens"),
+        "doc_id": c["doc_id"],
+        "fetched_at": c.get("fetched_at"),
+        "content_hash": c.get("content_hash"),
+    } for c in chunks]
+
+    # Same vectors the stub's embeddings endpoint returns for these texts (already unit length)
+    vecs = np.asarray([stub_vector(m["text"], dim) for m in metas], dtype="float32")
+    ids = np.asarray([chunk_faiss_id(m["chunk_id"]) for m in metas], dtype="int64")
+    index, params = build_faiss_index(vecs, "flat", metric="ip", ids=ids)
+
+    out_dir = Path(out_dir)
+    index_path = out_dir / "faiss.index"
+    faiss.write_index(index, str(index_path))
+    save_index_config("flat", params, "ip", stable_ids=True, path=out_dir / CONFIG_PATH.name)
+    write_meta_store(metas, out_dir / "meta.jsonl", ids=ids)
+    build_lexical_index([m["text"] for m in metas], out_dir / LEXICAL_PATH.name)
+    return index_path
+
+
+def timed_answer(ra, question, top_k):
+    """
+    Answer one question stage by stage, as answer_question() does, timing each stage.
+
+    Args:
+        ra (module): The imported retrieve_and_answer module.
+        question (str): Question text.
+        top_k (int): Number of snippets to retrieve.
+
+    Returns:
+        dict: Milliseconds per stage (None for stages that did not run).
+    """
+    timings = dict.fromkeys(STAGES)
+    started = t0 = time.perf_counter()
+
+    # Query embedding (micro-batched) plus the BM25 lookup that overlaps it
+    qv, lexical_hits = ra.embed_with_lexical(question)
+    t1 = time.perf_counter()
+    timings["embed"] = (t1 - t0) * 1000
+
+    # FAISS search, fusion and optional reranking
+    retrieved, _ = ra.rank_candidates(question, qv, top_k, lexical_hits)
+    t2 = time.perf_counter()
+    timings["search"] = (t2 - t1) * 1000
+
+    if retrieved:
+        prompt, _ = ra.assemble_prompt(question, retrieved)
+        t3 = time.perf_counter()
+        timings["prompt"] = (t3 - t2) * 1000
+        if ra.openai_client:
+            ra.call_llm(prompt)
+            timings["llm"] = (time.perf_counter() - t3) * 1000
+
+    timings["total"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def bench_stages(ra, questions, top_k, rounds):
+    """
+    Time every stage for each question, one question at a time.
+
+    Returns:
+        dict: Percentile summary per stage.
+    """
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(rounds):
+        for q in questions:
+            for stage, ms in timed_answer(ra, q, top_k).items():
+                if ms is not None:
+                    samples[stage].append(ms)
+    return {stage: percentiles(vals) for stage, vals in samples.items()}
+
+
+def bench_recall(ra, golden, ks):
+    """
+    Measure recall@k of retrieve() against the labelled evidence spans.
+
+    Returns:
+        dict: Mean recall@k and hit rate@k (any relevant chunk found) for each k,
+        plus per-question results.
+    """
+    max_k = max(ks)
+    per_question = []
+    for g in golden:
+        found = ra.retrieve(g["question"], top_k=max_k)
+        per_question.append({
+            "question": g["question"],
+            "found": [r.get("chunk_id") for r in found],
+            **{f"recall@{k}": round(recall_at_k(found, g["relevant"], k), 4) for k in ks},
+        })
+
+    summary = {}
+    for k in ks:
+        summary[f"recall@{k}"] = round(sum(q[f"recall@{k}"] for q in per_question) / len(per_question), 4)
+        summary[f"hit@{k}"] = round(sum(q[f"recall@{k}"] > 0 for q in per_question) / len(per_question), 4)
+    summary["questions"] = per_question
+    return summary
+
+
+def bench_concurrency(ra, questions, top_k, levels, rounds):
+    """
+    Replay the questions through answer_question() from several threads at once.
+
+    Args:
+        ra (module): The imported retrieve_and_answer module.
+        questions (list[str]): Question texts.
+        top_k (int): Number of snippets to retrieve.
+        levels (list[int]): Numbers of concurrent callers to try.
+        rounds (int): Passes over the question set per level.
+
+    Returns:
+        list[dict]: QPS and end-to-end latency percentiles per concurrency level.
+    """
+    def one(question):
+        start = time.perf_counter()
+        ra.answer_question(question, top_k=top_k)
+        return (time.perf_counter() - start) * 1000
+
+    rows = []
+    work = questions * rounds
+    for level in levels:
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            start = time.perf_counter()
+            latencies = list(pool.map(one, work))
+            elapsed = time.perf_counter() - start
+        rows.append({"concurrency": level, "requests": len(work),
+                     "qps": round(len(work) / elapsed, 2), "latency_ms": percentiles(latencies)})
+    return rows
+
+
+def print_report(report):
+    """Print the stage, recall and concurrency results as aligned tables."""
+    print(f"\n{'stage':>8}  {'n':>6}  {'p50 ms':>10}  {'p95 ms':>10}  {'p99 ms':>10}")
+    for stage, p in report["stages"].items():
+        print(f"{stage:>8}  {p['n']:>6}  {str(p['p50']):>10}  {str(p['p95']):>10}  {str(p['p99']):>10}")
+
+    if report.get("recall"):
+        print("\n" + "  ".join(f"{k}={v}" for k, v in report["recall"].items() if k != "questions"))
+
+    print(f"\n{'conc':>6}  {'qps':>10}  {'p50 ms':>10}  {'p95 ms':>10}  {'p99 ms':>10}")
+    for r in report["concurrency"]:
+        p = r["latency_ms"]
+        print(f"{r['concurrency']:>6}  {r['qps']:>10}  {str(p['p50']):>10}  {str(p['p95']):>10}  {str(p['p99']):>10}")
+
+
+def main(argv=None):
+    """
+    Replay the golden questions through the RAG pipeline against a local stub
+    for the embedding and chat APIs, and report stage latencies, QPS and recall@k.
+
+    With the stub, retrieval runs against a throwaway index built from
+    data/chunks.jsonl with stub vectors, so recall measures the stub's bag of
+    words rather than the real model; use --no-stub to measure the real index.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark retrieval and end-to-end answering.")
+    parser.add_argument("--golden", type=Path, default=GOLDEN_PATH)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--ks", default="1,3,5", help="Cut-offs for recall@k")
+    parser.add_argument("--concurrency", default="1,4,16", help="Concurrent callers to try")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the question set per measurement")
+    parser.add_argument("--no-stub", action="store_true",
+                        help="Use the configured OpenAI endpoint (or local embeddings) instead of the stub")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Stub seconds per embeddings call")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Stub seconds before the first chat token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Stub seconds between chat tokens")
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--json", help="Optional path to save the results as JSON")
+    args = parser.parse_args(argv)
+
+    golden = load_golden(args.golden)
+    questions = [g["question"] for g in golden]
+    ks = [int(k) for k in args.ks.split(",")]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    # Every repeat must reach the pipeline, not the answer cache or precomputed FAQ answers
+    os.environ["ANSWER_CACHE_ENABLED"] = "0"
+    os.environ["FAQ_ENABLED"] = "0"
+    stub = None if args.no_stub else start_stub(args)
+
+    # Imported only now so it picks up the stub endpoint and settings above
+    try:
+        from . import retrieve_and_answer as ra
+    except ImportError:
+        import retrieve_and_answer as ra
+
+    stub_dir = None
+    if stub is not None:
+        # Search an index built with the stub's own vectors, not the real-model index
+        stub_dir = tempfile.TemporaryDirectory(prefix="bench_rag_")
+        index_path = build_stub_index(Path(stub_dir.name), dim=stub.RequestHandlerClass.state.dim)
+        ra.retriever = ra.Retriever(index_path=index_path, meta_path=index_path.with_name("meta.jsonl"))
+    ra.retriever.load()
+
+    # Warm up: embedding engine, connection pool, reranker, page cache
+    if ra.reranker is not None:
+        ra.reranker.warmup()
+    for q in questions:
+        ra.answer_question(q, top_k=args.top_k)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "questions": len(questions),
+            "rounds": args.rounds,
+            "top_k": args.top_k,
+            "stub": None if stub is None else {
+                "embed_latency": args.embed_latency,
+                "llm_latency": args.llm_latency,
+                "token_latency": args.token_latency,
+                "answer_tokens": args.answer_tokens,
+                "index": "throwaway flat index over stub vectors",
+            },
+            "index": ra.retriever.status(),
+            "rerank": ra.reranker is not None,
+        },
+        "stages": bench_stages(ra, questions, args.top_k, args.rounds),
+        "recall": bench_recall(ra, golden, ks),
+        "concurrency": bench_concurrency(ra, questions, args.top_k, levels, args.rounds),
+    }
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("\nSaved results to", args.json)
+
+    if stub is not None:
+        stub.shutdown()
+        stub_dir.cleanup()
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
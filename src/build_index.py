@@ -1,51 +1,195 @@
 import json, faiss, numpy as np
+import os
+import uuid
+import argparse
+from datetime import datetime
 from pathlib import Path
 
+try:
+    from .index_factory import (
+        DEFAULT_PARAMS, INDEX_TYPES, METRICS, build_faiss_index, chunk_faiss_id, load_index_config,
+        normalized_vectors, save_index_config, supports_incremental,
+    )
+    from .embedding_store import load_embeddings_any
+    from .meta_store import write_meta_store
+    from .lexical_index import LEXICAL_PATH, build_lexical_index
+except ImportError:  # executed as a script: python src/build_index.py
+    from index_factory import (
+        DEFAULT_PARAMS, INDEX_TYPES, METRICS, build_faiss_index, chunk_faiss_id, load_index_config,
+        normalized_vectors, save_index_config, supports_incremental,
+    )
+    from embedding_store import load_embeddings_any
+    from meta_store import write_meta_store
+    from lexical_index import LEXICAL_PATH, build_lexical_index
+
 # Define file paths for input embeddings and output index/meta files
-IN = Path("data/embeddings.jsonl")
+IN = Path("data/embeddings")                 # binary embedding store written by embed.py
+LEGACY_IN = Path("data/embeddings.jsonl")    # older JSONL format, still readable
 INDEX_PATH = Path("indexes/faiss.index")
 META_PATH = Path("indexes/meta.jsonl")
+VERSION_PATH = Path("indexes/index_version.txt")
 
 # Ensure the 'indexes' directory exists
 INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-def main():
-    # Lists to store embeddings and metadata
-    embeddings = []
-    metas = []
-    
-    # Read embeddings and metadata line by line from JSONL file
-    for line in open(IN, encoding="utf-8"):
-        r = json.loads(line)
-        embeddings.append(r["embedding"])
-        metas.append({
-            "chunk_id": r["chunk_id"],
-            "source_url": r["source_url"],
-            "text": r["text"],
-            "doc_id": r["doc_id"],
-            "fetched_at": r.get("fetched_at")
-        })
-    
-    # Convert list of embeddings to a NumPy float32 array
-    vecs = np.array(embeddings).astype('float32')
-    dim = vecs.shape[1]  # Determine vector dimensionality
-    
-    # Create a simple FAISS L2 (Euclidean) index for exact search
-    index = faiss.IndexFlatL2(dim)
-    
-    # Add all vectors to the index
-    index.add(vecs)
-    
-    # Save the FAISS index to disk
-    faiss.write_index(index, str(INDEX_PATH))
-    
-    # Save corresponding metadata to a JSONL file
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        for m in metas:
-            f.write(json.dumps(m, ensure_ascii=False) + "\n")
+def load_embeddings(path=None):
+    """
+    Load embeddings and chunk metadata from the binary store (memory-mapped,
+    no copies) or, if only that exists, the legacy embeddings JSONL file.
+
+    Args:
+        path (Path | None): Store directory or JSONL file; defaults to IN, then LEGACY_IN.
+
+    Returns:
+        tuple: (2D float32 array of vectors, list of metadata dicts)
+    """
+    if path is None:
+        path = IN if IN.exists() else LEGACY_IN
+    vecs, recs = load_embeddings_any(path)
+    
+    # Keep only the metadata fields needed at query time
+    metas = [{
+        "chunk_id": r["chunk_id"],
+        "source_url": r["source_url"],
+        "text": r["text"],
+        "n_tokens": r.get("n_tokens"),
+        "doc_id": r["doc_id"],
+        "fetched_at": r.get("fetched_at"),
+        "content_hash": r.get("content_hash")
+    } for r in recs]
+    return vecs, metas
+
+def parse_args(argv=None):
+    """
+    Parse index type and tuning parameters from the command line.
+    Defaults come from the INDEX_TYPE environment variable and DEFAULT_PARAMS.
+    """
+    parser = argparse.ArgumentParser(description="Build the FAISS index from embeddings.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=os.getenv("INDEX_TYPE", "flat"))
+    parser.add_argument("--metric", choices=sorted(METRICS), default=os.getenv("INDEX_METRIC", "ip"),
+                        help="ip = cosine similarity on normalized vectors (default), l2 = Euclidean")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Update the existing index in place: remove stale chunks, add new or changed ones")
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int, default=default)
+    return parser.parse_args(argv)
+
+def load_existing_index(args, dim):
+    """
+    Load the current index if it can be updated incrementally with these arguments.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line arguments.
+        dim (int): Dimension of the new vectors.
+
+    Returns:
+        tuple | None: (index, config, {faiss_id: content_hash}) or None when a full rebuild is needed.
+    """
+    if not (INDEX_PATH.exists() and META_PATH.exists()):
+        return None
+    config = load_index_config()
+    if not config["stable_ids"] or config["index_type"] != args.index_type or config["metric"] != args.metric:
+        print("Existing index has a different type, metric or id scheme; rebuilding from scratch.")
+        return None
+    if not supports_incremental(args.index_type):
+        print(f"{args.index_type} indexes cannot remove vectors; rebuilding from scratch.")
+        return None
+    index = faiss.read_index(str(INDEX_PATH))
+    if index.d != dim:
+        print("Embedding dimension changed; rebuilding from scratch.")
+        return None
+    old = {}
+    for line in open(META_PATH, encoding="utf-8"):
+        m = json.loads(line)
+        old[chunk_faiss_id(m["chunk_id"])] = m.get("content_hash")
+    return index, config, old
+
+def update_index(index, old, vecs, ids, metas):
+    """
+    Bring an existing index in line with the new embeddings by removing stale
+    or changed chunks and adding new or changed ones.
+
+    Args:
+        index (faiss.Index): Index built with stable ids.
+        old (dict): {faiss_id: content_hash} of the chunks currently indexed.
+        vecs (np.ndarray): New vectors, one row per chunk.
+        ids (np.ndarray): Stable FAISS id per row.
+        metas (list[dict]): Metadata per row (with content_hash).
+
+    Returns:
+        dict: Counts of reused, added and deleted chunks.
+    """
+    new = {int(i): m.get("content_hash") for i, m in zip(ids, metas)}
+
+    # A chunk is unchanged only if both sides know its hash and the hashes match
+    def unchanged(i):
+        return i in old and old[i] is not None and old[i] == new.get(i)
+
+    stale = [i for i in old if i not in new or not unchanged(i)]
+    add_rows = [row for row, i in enumerate(ids) if not unchanged(int(i))]
+
+    if stale:
+        index.remove_ids(np.asarray(stale, dtype="int64"))
+    if add_rows:
+        index.add_with_ids(vecs[add_rows], ids[add_rows])
+
+    return {
+        "reused": len(ids) - len(add_rows),
+        "added": len(add_rows),
+        "deleted": sum(1 for i in old if i not in new),
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    vecs, metas = load_embeddings()
+    
+    # Normalize once at build time so inner product equals cosine similarity
+    # (a no-op without copying when the store already holds unit vectors)
+    if args.metric == "ip":
+        vecs = normalized_vectors(vecs)
+    
+    # Stable per-chunk ids let later runs update the index in place
+    ids = np.asarray([chunk_faiss_id(m["chunk_id"]) for m in metas], dtype="int64")
+    
+    existing = load_existing_index(args, vecs.shape[1]) if args.incremental else None
+    if existing:
+        # Incremental update: keep unchanged vectors, swap out the rest
+        index, config, old = existing
+        params = config["params"]
+        counts = update_index(index, old, vecs, ids, metas)
+        print(f"Updated {args.index_type} index: {counts['reused']} chunks reused, "
+              f"{counts['added']} added, {counts['deleted']} deleted ({index.ntotal} vectors)")
+    else:
+        # Build the selected index type (flat = exact search; others are approximate)
+        params = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+        index, params = build_faiss_index(vecs, args.index_type, params, args.metric, ids=ids)
+        print(f"Built {args.index_type} index with {index.ntotal} vectors of dim {vecs.shape[1]}")
+    
+    # Save the FAISS index to disk under a temporary name, then swap it in atomically
+    # (a running app keeps serving the old file until it hot-swaps)
+    tmp_index = INDEX_PATH.with_name(INDEX_PATH.name + ".tmp")
+    faiss.write_index(index, str(tmp_index))
+    os.replace(tmp_index, INDEX_PATH)
+    
+    # Save the index type and search knobs so retrieval applies them automatically
+    save_index_config(args.index_type, params, args.metric, stable_ids=True)
+    
+    # Save corresponding metadata as JSONL plus byte offsets and the id -> row mapping
+    write_meta_store(metas, META_PATH, ids=ids)
+    
+    # Rebuild the BM25 inverted index over the same rows (cheap, so never incremental)
+    lex = build_lexical_index([m["text"] for m in metas], LEXICAL_PATH)
+    print(f"Built BM25 index: {lex['terms']} terms, {lex['postings']} postings")
+    
+    # Record a fresh index version; answer caches keyed to the old one are invalidated
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:8]
+    # Written last: a new version tells running apps every other file is in place
+    tmp_version = VERSION_PATH.with_name(VERSION_PATH.name + ".tmp")
+    tmp_version.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp_version, VERSION_PATH)
     
     # Print confirmation message after successful save
-    print("Saved FAISS index and meta.")
+    print("Saved FAISS index and meta. Index version:", version)
 
 # Entry point for script execution
 if __name__ == "__main__":
@@ -0,0 +1,332 @@
+# src/bulk_embed.py
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+import numpy as np
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Retrieve API key, model name and optional endpoint (e.g. a local stub server)
+OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+# Batching, concurrency and retry settings
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8000"))    # tokens per request
+EMBED_BATCH_ITEMS = int(os.getenv("EMBED_BATCH_ITEMS", "2048"))      # API limit on inputs per request
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))         # requests in flight
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "8"))
+CHECKPOINT_DIR = Path(os.getenv("EMBED_CHECKPOINT_DIR", "data/embed_checkpoints"))
+
+
+def get_encoding(model=EMBED_MODEL):
+    """
+    Return the tiktoken encoding used to count tokens for a model.
+
+    Args:
+        model (str): Embedding model name.
+
+    Returns:
+        tiktoken.Encoding: Tokenizer for the model (cl100k_base if unknown).
+    """
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def make_token_batches(texts, max_tokens=EMBED_BATCH_TOKENS, max_items=EMBED_BATCH_ITEMS, encoding=None):
+    """
+    Split texts into consecutive batches bounded by total token count and item count.
+    A single text longer than max_tokens gets a batch of its own.
+
+    Args:
+        texts (list[str]): Texts to embed.
+        max_tokens (int): Maximum tokens per batch.
+        max_items (int): Maximum texts per batch.
+        encoding (tiktoken.Encoding | None): Tokenizer; defaults to get_encoding().
+
+    Returns:
+        list[tuple]: (start, end, token_count) slices into texts.
+    """
+    encoding = encoding or get_encoding()
+    counts = [len(toks) for toks in encoding.encode_ordinary_batch(texts)]
+
+    batches = []
+    start, tokens = 0, 0
+    for i, n in enumerate(counts):
+        if i > start and (tokens + n > max_tokens or i - start >= max_items):
+            batches.append((start, i, tokens))
+            start, tokens = i, 0
+        tokens += n
+    if start < len(texts):
+        batches.append((start, len(texts), tokens))
+    return batches
+
+
+class BulkEmbedder:
+    """
+    Concurrent, rate-limit-aware OpenAI embedding runner.
+
+    Texts are split into token-bounded batches that run concurrently under a
+    semaphore. 429s and transient server errors are retried with exponential
+    backoff (honouring Retry-After). Every finished batch is checkpointed to disk,
+    keyed by a hash of its texts, so an interrupted run resumes where it stopped.
+
+    Blocking callers (embed(), submit()) share one event loop thread, one
+    AsyncOpenAI client and one semaphore for the whole run, so calls made
+    batch by batch still reuse the connection pool and overlap each other.
+    """
+
+    def __init__(
+        self,
+        model=EMBED_MODEL,
+        concurrency=EMBED_CONCURRENCY,
+        max_tokens=EMBED_BATCH_TOKENS,
+        max_items=EMBED_BATCH_ITEMS,
+        max_retries=EMBED_MAX_RETRIES,
+        checkpoint_dir=CHECKPOINT_DIR,
+        base_url=OPENAI_BASE_URL,
+        api_key=OPENAI_KEY,
+    ):
+        self.model = model
+        self.concurrency = concurrency
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self.max_retries = max_retries
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        self.base_url = base_url
+        self.api_key = api_key
+        self.stats = self._new_stats()
+
+        # Wall-clock span of the run: overlapping calls are counted once
+        self._first_started = None
+
+        # Event loop thread, client and semaphore shared by submit() calls (created on first use)
+        self._loop = None
+        self._client = None
+        self._sem = None
+        self._start_lock = threading.Lock()
+
+    @staticmethod
+    def _new_stats():
+        """Zeroed counters for one run."""
+        return {"chunks": 0, "tokens": 0, "batches": 0, "api_batches": 0, "resumed_batches": 0,
+                "retries": 0, "rate_limited": 0, "seconds": 0.0}
+
+    def _make_client(self):
+        """One AsyncOpenAI client (and HTTP connection pool); retries are handled here, not by the SDK."""
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI(api_key=self.api_key or "stub", base_url=self.base_url, max_retries=0)
+
+    def _ensure_loop(self):
+        """Start the shared event loop thread, client and semaphore on first use."""
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="bulk-embed", daemon=True).start()
+
+                async def setup():
+                    return self._make_client(), asyncio.Semaphore(self.concurrency)
+
+                self._client, self._sem = asyncio.run_coroutine_threadsafe(setup(), loop).result()
+                self._loop = loop
+
+    def _checkpoint_path(self, batch_no, texts):
+        """Checkpoint file for a batch; the name changes whenever its texts or the model change."""
+        h = hashlib.sha1(self.model.encode("utf-8"))
+        for t in texts:
+            h.update(b"\0" + t.encode("utf-8"))
+        return self.checkpoint_dir / f"batch_{batch_no:06d}_{h.hexdigest()[:16]}.npy"
+
+    @staticmethod
+    def _retry_after(error, attempt):
+        """
+        Seconds to wait before retrying: the server's Retry-After if given,
+        otherwise exponential backoff with jitter.
+        """
+        response = getattr(error, "response", None)
+        header = response.headers.get("retry-after") if response is not None else None
+        try:
+            if header is not None:
+                return float(header)
+        except ValueError:
+            pass
+        return min(60.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def _embed_batch(self, client, sem, batch_no, texts):
+        """
+        Embed one batch with retries, using or writing its checkpoint.
+
+        Returns:
+            np.ndarray: 2D float32 array for the batch.
+        """
+        import openai
+
+        ckpt = self._checkpoint_path(batch_no, texts) if self.checkpoint_dir else None
+        if ckpt is not None and ckpt.exists():
+            self.stats["resumed_batches"] += 1
+            return np.load(ckpt)
+
+        async with sem:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    resp = await client.embeddings.create(model=self.model, input=texts)
+                    break
+                except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                    if attempt == self.max_retries:
+                        raise
+                    self.stats["retries"] += 1
+                    if isinstance(e, openai.RateLimitError):
+                        self.stats["rate_limited"] += 1
+                    await asyncio.sleep(self._retry_after(e, attempt))
+
+        data = sorted(resp.data, key=lambda r: r.index)
+        vecs = np.asarray([r.embedding for r in data], dtype="float32")
+
+        # Write the checkpoint atomically so a crash never leaves a partial file
+        if ckpt is not None:
+            tmp = ckpt.with_name(ckpt.stem + ".tmp.npy")
+            np.save(tmp, vecs)
+            os.replace(tmp, ckpt)
+        self.stats["api_batches"] += 1
+        return vecs
+
+    async def embed_async(self, texts, client=None, sem=None):
+        """
+        Embed all texts with concurrent, token-bounded requests.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            client (AsyncOpenAI | None): Shared client; a temporary one is created if None.
+            sem (asyncio.Semaphore | None): Shared limit on requests in flight.
+
+        Returns:
+            np.ndarray: 2D float32 array with one row per text, in input order.
+        """
+        if self._first_started is None:
+            self._first_started = time.perf_counter()
+        batches = make_token_batches(texts, self.max_tokens, self.max_items, get_encoding(self.model))
+        self.stats["chunks"] += len(texts)
+        self.stats["tokens"] += sum(b[2] for b in batches)
+        self.stats["batches"] += len(batches)
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        if self.checkpoint_dir:
+            self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+        # One client (and HTTP connection pool) shared by all concurrent batches
+        own_client = client is None
+        client = client or self._make_client()
+        sem = sem or asyncio.Semaphore(self.concurrency)
+        try:
+            results = await asyncio.gather(*[
+                self._embed_batch(client, sem, n, texts[start:end])
+                for n, (start, end, _) in enumerate(batches)
+            ])
+        finally:
+            if own_client:
+                await client.close()
+
+        # From the first call's start to the latest finish, not the sum of overlapping calls
+        self.stats["seconds"] = max(self.stats["seconds"], time.perf_counter() - self._first_started)
+        return np.concatenate(results)
+
+    def submit(self, texts):
+        """
+        Queue texts on the shared event loop; requests from every pending call
+        run concurrently under the one semaphore.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the 2D float32 array for the texts.
+        """
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self.embed_async(texts, self._client, self._sem), self._loop)
+
+    def embed(self, texts):
+        """
+        Blocking wrapper around embed_async() for scripts, on the shared client.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            np.ndarray: 2D float32 array with one row per text.
+        """
+        return self.submit(texts).result()
+
+    def report(self):
+        """
+        Summarize the counters of every call since the embedder was created.
+
+        Returns:
+            dict: Counts plus chunks and tokens per second of wall-clock time, from the
+            first call's start to the last call's finish.
+        """
+        st = dict(self.stats)
+        st["chunks_per_second"] = st["chunks"] / st["seconds"] if st["seconds"] else None
+        st["tokens_per_second"] = st["tokens"] / st["seconds"] if st["seconds"] else None
+        return st
+
+    def close(self):
+        """Close the shared client and stop its event loop thread."""
+        with self._start_lock:
+            loop, client = self._loop, self._client
+            self._loop = self._client = self._sem = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(client.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    def clear_checkpoints(self):
+        """Delete checkpoint files once their results have been saved elsewhere."""
+        if self.checkpoint_dir and self.checkpoint_dir.exists():
+            for f in self.checkpoint_dir.glob("batch_*.npy"):
+                f.unlink()
+
+
+def main(argv=None):
+    """
+    Embed a chunks file with the bulk runner and print throughput; point
+    --base-url at stub_openai.py to exercise it offline.
+    """
+    parser = argparse.ArgumentParser(description="Bulk-embed chunk texts with the OpenAI API.")
+    parser.add_argument("--input", default="data/chunks.jsonl")
+    parser.add_argument("--base-url", default=OPENAI_BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY)
+    parser.add_argument("--batch-tokens", type=int, default=EMBED_BATCH_TOKENS)
+    parser.add_argument("--no-checkpoint", action="store_true")
+    args = parser.parse_args(argv)
+
+    texts = [json.loads(line)["text"] for line in open(args.input, encoding="utf-8")]
+    embedder = BulkEmbedder(
+        concurrency=args.concurrency,
+        max_tokens=args.batch_tokens,
+        base_url=args.base_url,
+        checkpoint_dir=None if args.no_checkpoint else CHECKPOINT_DIR,
+    )
+    vecs = asyncio.run(embedder.embed_async(texts))
+    print("Embedded", vecs.shape[0], "chunks, dim", vecs.shape[1] if vecs.size else 0)
+    print(json.dumps(embedder.report(), indent=2))
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
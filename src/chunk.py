@@ -1,74 +1,219 @@
+import os
+import re
 import json
+import argparse
+import threading
 from pathlib import Path
-import nltk
-nltk.download('punkt')
-from nltk.tokenize import sent_tokenize
+from concurrent.futures import ProcessPoolExecutor
 
 # Define input and output file paths
 IN = Path("data/kb.jsonl")
 OUT = Path("data/chunks.jsonl")
 
-# Ensure output directory exists
-OUT.parent.mkdir(parents=True, exist_ok=True)
-
 # Parameters for chunking text
-SENTS_PER_CHUNK = 6  # Number of sentences per chunk
-OVERLAP = 1          # Number of overlapping sentences between chunks
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))                  # token budget per chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))   # tokens repeated from the previous chunk
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", str(os.cpu_count() or 1)))
+
+# Chunks are budgeted in the tokens of the answering model, since they end up in its prompt
+TOKENIZER_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+
+# Local directory holding the punkt sentence tokenizer (fill it once with --download-tokenizer)
+NLTK_DATA = Path(os.getenv("NLTK_DATA_DIR", "data/nltk_data"))
+
+# Per-process tokenizer cache, filled on first use
+_tokenizers = {}
+_tokenizers_lock = threading.Lock()
+
+# Fallback sentence boundary when punkt is not available: end punctuation followed by a space
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def _load_sentence_splitter():
+    """
+    Load the punkt sentence tokenizer from the local NLTK data cache.
+    Never downloads; falls back to a punctuation rule if punkt is missing.
+
+    Returns:
+        callable: Function mapping text to a list of sentences.
+    """
+    import nltk
+
+    if str(NLTK_DATA) not in nltk.data.path:
+        nltk.data.path.insert(0, str(NLTK_DATA))
+    try:
+        from nltk.tokenize import PunktTokenizer  # nltk >= 3.8.2 ships punkt_tab
+        return PunktTokenizer("english").tokenize
+    except (ImportError, LookupError):
+        pass
+    try:
+        return nltk.data.load("tokenizers/punkt/english.pickle").tokenize
+    except LookupError:
+        print(f"Warning: punkt not found in {NLTK_DATA}; run `python src/chunk.py --download-tokenizer`. "
+              "Using a punctuation-based sentence splitter.")
+        return lambda text: [s for s in _SENTENCE_END.split(text) if s.strip()]
 
-def chunk_text(text, sents_per_chunk=SENTS_PER_CHUNK, overlap=OVERLAP):
+
+def get_sentence_splitter():
+    """Return the sentence splitter, loading it once per process."""
+    with _tokenizers_lock:
+        if "sentences" not in _tokenizers:
+            _tokenizers["sentences"] = _load_sentence_splitter()
+        return _tokenizers["sentences"]
+
+
+def get_token_encoding():
+    """Return the tiktoken encoding used for chunk budgets, loading it once per process."""
+    with _tokenizers_lock:
+        if "tokens" not in _tokenizers:
+            import tiktoken
+
+            try:
+                _tokenizers["tokens"] = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+            except KeyError:
+                _tokenizers["tokens"] = tiktoken.get_encoding("cl100k_base")
+        return _tokenizers["tokens"]
+
+
+def download_tokenizer(target=NLTK_DATA):
     """
-    Split the given text into overlapping chunks based on sentence count.
-    
+    Download the punkt sentence tokenizer into the local cache directory.
+
+    Args:
+        target (Path): NLTK data directory.
+    """
+    import nltk
+
+    target.mkdir(parents=True, exist_ok=True)
+    for package in ("punkt_tab", "punkt"):
+        nltk.download(package, download_dir=str(target), quiet=True)
+    print("Sentence tokenizer cached in", target)
+
+
+def _split_long_sentence(tokens, max_tokens, encoding):
+    """Cut a sentence longer than the budget into budget-sized token windows."""
+    return [
+        (encoding.decode(tokens[i:i + max_tokens]), len(tokens[i:i + max_tokens]))
+        for i in range(0, len(tokens), max_tokens)
+    ]
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Pack whole sentences into chunks of at most max_tokens tokens. Each chunk
+    starts with the trailing sentences of the previous one, up to overlap_tokens.
+
     Args:
         text (str): The full text to be chunked.
-        sents_per_chunk (int): Number of sentences per chunk.
-        overlap (int): Number of overlapping sentences between consecutive chunks.
-    
+        max_tokens (int): Token budget per chunk.
+        overlap_tokens (int): Maximum tokens repeated from the previous chunk.
+
     Returns:
-        list: A list of text chunks.
+        list[tuple]: (chunk text, token count) pairs.
     """
-    # Tokenize text into individual sentences
-    sents = sent_tokenize(text)
+    encoding = get_token_encoding()
+
+    # Tokenize text into sentences and count the tokens of each in one batch call
+    sents = [s.strip() for s in get_sentence_splitter()(text) if s.strip()]
+    units = []
+    for sent, tokens in zip(sents, encoding.encode_ordinary_batch(sents)):
+        if len(tokens) > max_tokens:
+            units.extend(_split_long_sentence(tokens, max_tokens, encoding))
+        else:
+            units.append((sent, len(tokens)))
+
     chunks = []
-    i = 0
+    current, current_tokens = [], 0
+    for unit in units:
+        if current and current_tokens + unit[1] > max_tokens:
+            chunks.append(current)
+
+            # Carry over trailing sentences that fit in the overlap, leaving room for this one
+            carry, carry_tokens = [], 0
+            for prev in reversed(current):
+                if carry_tokens + prev[1] > overlap_tokens or carry_tokens + prev[1] + unit[1] > max_tokens:
+                    break
+                carry.insert(0, prev)
+                carry_tokens += prev[1]
+            current, current_tokens = carry, carry_tokens
+        current.append(unit)
+        current_tokens += unit[1]
+    if current:
+        chunks.append(current)
+
+    # Count the joined text exactly (joining can merge tokens at sentence boundaries)
+    texts = [" ".join(u[0] for u in c) for c in chunks]
+    return [(t, len(toks)) for t, toks in zip(texts, encoding.encode_ordinary_batch(texts))]
 
-    # Create chunks with specified overlap
-    while i < len(sents):
-        chunk_sents = sents[i:i+sents_per_chunk]
-        chunks.append(" ".join(chunk_sents))
-        i += sents_per_chunk - overlap  # Move index forward with overlap considered
-    return chunks
 
-def main():
+def chunk_document(doc):
     """
-    Read documents from kb.jsonl, split them into chunks, 
-    and write the chunks to chunks.jsonl.
+    Split a knowledge-base document into chunk records.
+    Top-level so it can run in a process pool.
+
+    Args:
+        doc (dict): Document record from kb.jsonl.
+
+    Returns:
+        list[dict]: Chunk records with ids, text, token count and source metadata.
+    """
+    return [
+        {
+            "chunk_id": f"{doc['id']}_c{idx}",
+            "doc_id": doc["id"],
+            "text": ch,
+            "n_tokens": n_tokens,
+            "source_url": doc["source_url"],
+            "fetched_at": doc.get("fetched_at")
+        }
+        for idx, (ch, n_tokens) in enumerate(chunk_text(doc["text"]))
+    ]
+
+
+def iter_documents(path=IN):
+    """Yield knowledge-base documents from a JSONL file."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def main(argv=None):
     """
-    total = 0  # Counter for total number of chunks written
-    
-    # Open input and output files
-    with open(IN, encoding="utf-8") as inf, open(OUT, "w", encoding="utf-8") as outf:
-        for line in inf:
-            # Load each document (JSON object)
-            doc = json.loads(line)
-
-            # Chunk the document text into smaller parts
-            chs = chunk_text(doc["text"])
-
-            # Write each chunk as a separate JSON record
-            for idx, ch in enumerate(chs):
-                rec = {
-                    "chunk_id": f"{doc['id']}_c{idx}",
-                    "doc_id": doc["id"],
-                    "text": ch,
-                    "source_url": doc["source_url"],
-                    "fetched_at": doc.get("fetched_at")
-                }
-                outf.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                total += 1  # Increment chunk count
+    Read documents from kb.jsonl, split them into token-budgeted chunks
+    in parallel, and write the chunks to chunks.jsonl.
+    """
+    parser = argparse.ArgumentParser(description="Split kb.jsonl into token-budgeted chunks.")
+    parser.add_argument("--workers", type=int, default=CHUNK_WORKERS)
+    parser.add_argument("--download-tokenizer", action="store_true",
+                        help=f"Download the punkt sentence tokenizer into {NLTK_DATA} and exit")
+    args = parser.parse_args(argv)
+
+    if args.download_tokenizer:
+        download_tokenizer()
+        return
+
+    total = tokens = 0  # Counters for chunks and tokens written
+
+    # Ensure output directory exists (here, not at import: the web app imports this module)
+    OUT.parent.mkdir(parents=True, exist_ok=True)
+
+    # Chunk documents across worker processes; map() keeps document order
+    pool = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+    try:
+        results = pool.map(chunk_document, iter_documents(), chunksize=8) if pool else map(chunk_document, iter_documents())
+        with open(OUT, "w", encoding="utf-8") as outf:
+            for recs in results:
+                # Write each chunk as a separate JSON record
+                for rec in recs:
+                    outf.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    total += 1
+                    tokens += rec["n_tokens"]
+    finally:
+        if pool:
+            pool.shutdown()
 
     # Print summary message
-    print("Wrote", total, "chunks to", OUT)
+    print("Wrote", total, "chunks to", OUT, f"(avg {tokens / max(total, 1):.0f} tokens, budget {CHUNK_TOKENS})")
 
 # Entry point of the script
 if __name__ == "__main__":
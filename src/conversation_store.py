@@ -0,0 +1,300 @@
+# src/conversation_store.py
+
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict, deque
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Backend: "memory" (per process, LRU + TTL) or "sqlite" (shared by workers, survives restarts)
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_DB = Path(os.getenv("CONVERSATION_DB", "data/conversations.sqlite3"))
+
+# Limits
+CONVERSATION_MAX_MESSAGES = int(os.getenv("CONVERSATION_MAX_MESSAGES", "200"))   # kept per session
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))  # memory backend only
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", str(7 * 24 * 3600)))       # seconds since last message
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+
+# How long a sqlite write waits for another worker's write lock before failing
+CONVERSATION_BUSY_TIMEOUT = float(os.getenv("CONVERSATION_BUSY_TIMEOUT", "5"))   # seconds
+
+
+def page_bounds(total, page, page_size):
+    """
+    Compute the slice of a chronological message list shown on a history page.
+    Page 1 holds the newest messages.
+
+    Args:
+        total (int): Number of stored messages.
+        page (int): 1-based page number.
+        page_size (int): Messages per page.
+
+    Returns:
+        tuple: (start, end) indexes into the chronological list.
+    """
+    end = max(0, total - (page - 1) * page_size)
+    return max(0, end - page_size), end
+
+
+class MemoryConversationStore:
+    """
+    In-process conversation store: an LRU of sessions, each a bounded deque
+    of messages, expired after CONVERSATION_TTL seconds without activity.
+    """
+
+    def __init__(self, max_messages=CONVERSATION_MAX_MESSAGES, max_sessions=CONVERSATION_MAX_SESSIONS,
+                 ttl=CONVERSATION_TTL):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _get(self, session_id):
+        """Return a live session entry (or None), dropping it if it expired."""
+        entry = self._sessions.get(session_id)
+        if entry is not None and time.time() - entry["updated"] > self.ttl:
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+        return entry
+
+    def append(self, session_id, sender, text):
+        """
+        Add a message to a session's history, dropping the oldest beyond the cap.
+
+        Args:
+            session_id (str): Session id from the cookie.
+            sender (str): "user" or "bot".
+            text (str): Message text.
+        """
+        with self._lock:
+            entry = self._get(session_id)
+            if entry is None:
+                entry = {"messages": deque(maxlen=self.max_messages), "updated": 0.0}
+                self._sessions[session_id] = entry
+            entry["messages"].append({"sender": sender, "text": text})
+            entry["updated"] = time.time()
+            self._sessions.move_to_end(session_id)
+
+            # Evict least recently active sessions beyond the size bound
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+
+    def get_page(self, session_id, page=1, page_size=HISTORY_PAGE_SIZE):
+        """
+        Return one page of a session's history in chronological order.
+
+        Args:
+            session_id (str): Session id from the cookie.
+            page (int): 1-based page number; page 1 holds the newest messages.
+            page_size (int): Messages per page.
+
+        Returns:
+            tuple: (list of message dicts, total number of stored messages)
+        """
+        with self._lock:
+            entry = self._get(session_id)
+            if entry is None:
+                return [], 0
+            messages = list(entry["messages"])
+        start, end = page_bounds(len(messages), page, page_size)
+        return messages[start:end], len(messages)
+
+    def clear(self, session_id):
+        """Delete a session's history."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        """
+        Return store size and eviction counters.
+
+        Returns:
+            dict: Store statistics.
+        """
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "messages": sum(len(e["messages"]) for e in self._sessions.values()),
+                "max_messages_per_session": self.max_messages,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SqliteConversationStore:
+    """
+    SQLite conversation store shared by all worker processes. Each session
+    keeps its newest CONVERSATION_MAX_MESSAGES messages; sessions idle for
+    longer than CONVERSATION_TTL are purged periodically.
+    """
+
+    # Purge expired sessions every this many appends
+    PURGE_EVERY = 500
+
+    def __init__(self, path=CONVERSATION_DB, max_messages=CONVERSATION_MAX_MESSAGES, ttl=CONVERSATION_TTL):
+        self.path = Path(path)
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._appends = 0
+        self._db = None
+        self._pid = None
+
+    @property
+    def _conn(self):
+        """
+        The connection for the current process, opened on first use. A
+        connection must not cross a fork, so workers forked from a preloading
+        master each open their own.
+        """
+        if self._db is None or self._pid != os.getpid():
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None,
+                                       timeout=CONVERSATION_BUSY_TIMEOUT)
+            self._pid = os.getpid()
+
+            # Wait for other workers' writes instead of failing with "database is locked" right away
+            self._db.execute(f"PRAGMA busy_timeout={int(CONVERSATION_BUSY_TIMEOUT * 1000)}")
+
+            # WAL lets readers in other workers proceed while one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " sender TEXT NOT NULL,"
+                " text TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        return self._db
+
+    def append(self, session_id, sender, text):
+        """
+        Add a message to a session's history, dropping the oldest beyond the cap.
+
+        Args:
+            session_id (str): Session id from the cookie.
+            sender (str): "user" or "bot".
+            text (str): Message text.
+        """
+        with self._lock:
+            conn = self._conn
+            # Take the write lock up front; on any error roll back so the shared
+            # connection is never left inside an open transaction
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO messages (session_id, sender, text, created_at) VALUES (?, ?, ?, ?)",
+                    (session_id, sender, text, time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND id <= ("
+                    " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, self.max_messages),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            self._appends += 1
+            if self._appends % self.PURGE_EVERY == 0:
+                self._purge_expired()
+
+    def _purge_expired(self):
+        """Delete sessions whose newest message is older than the TTL (caller holds the lock)."""
+        try:
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id IN ("
+                " SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created_at) < ?)",
+                (time.time() - self.ttl,),
+            )
+        except sqlite3.OperationalError as e:
+            # Another worker holds the write lock; the next purge will catch up
+            print("Conversation purge skipped:", e)
+
+    def get_page(self, session_id, page=1, page_size=HISTORY_PAGE_SIZE):
+        """
+        Return one page of a session's history in chronological order.
+
+        Args:
+            session_id (str): Session id from the cookie.
+            page (int): 1-based page number; page 1 holds the newest messages.
+            page_size (int): Messages per page.
+
+        Returns:
+            tuple: (list of message dicts, total number of stored messages)
+        """
+        with self._lock:
+            total, last = self._conn.execute(
+                "SELECT COUNT(*), MAX(created_at) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if not total or time.time() - last > self.ttl:
+                return [], 0
+            rows = self._conn.execute(
+                "SELECT sender, text FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (session_id, page_size, (page - 1) * page_size),
+            ).fetchall()
+        return [{"sender": s, "text": t} for s, t in reversed(rows)], total
+
+    def clear(self, session_id):
+        """Delete a session's history."""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def stats(self):
+        """
+        Return store size.
+
+        Returns:
+            dict: Store statistics.
+        """
+        with self._lock:
+            sessions, messages = self._conn.execute(
+                "SELECT COUNT(DISTINCT session_id), COUNT(*) FROM messages"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "sessions": sessions,
+            "messages": messages,
+            "max_messages_per_session": self.max_messages,
+        }
+
+    def close(self):
+        """Close this process's database connection."""
+        with self._lock:
+            if self._db is not None and self._pid == os.getpid():
+                self._db.close()
+            self._db = None
+
+
+def make_conversation_store(backend=CONVERSATION_STORE):
+    """
+    Create the conversation store selected by CONVERSATION_STORE.
+
+    Args:
+        backend (str): "memory" or "sqlite".
+
+    Returns:
+        MemoryConversationStore | SqliteConversationStore: The store.
+    """
+    if backend == "sqlite":
+        return SqliteConversationStore()
+    if backend == "memory":
+        return MemoryConversationStore()
+    raise ValueError(f"Unknown CONVERSATION_STORE {backend!r}; choose memory or sqlite")
@@ -2,8 +2,18 @@ import os
 import json
 import numpy as np
 from pathlib import Path
+from collections import deque
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from openai import OpenAI
+
+try:
+    from .embedding_engine import get_engine
+    from .embedding_store import EmbeddingCache, EmbeddingStoreWriter, content_hash
+    from .bulk_embed import BulkEmbedder
+except ImportError:  # executed as a script: python src/embed.py
+    from embedding_engine import get_engine
+    from embedding_store import EmbeddingCache, EmbeddingStoreWriter, content_hash
+    from bulk_embed import BulkEmbedder
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,87 +22,223 @@ load_dotenv()
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 
-# Define input and output file paths
+# Define input and output paths (OUT is a binary embedding store directory)
 IN = Path("data/chunks.jsonl")
-OUT = Path("data/embeddings.jsonl")
+OUT = Path("data/embeddings")
+
+# Number of chunks embedded and written per batch
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
 
 # Ensure output directory exists
 OUT.parent.mkdir(parents=True, exist_ok=True)
 
+# Bulk runner for OpenAI: token-bounded concurrent batches, 429 backoff, checkpoints
+bulk_embedder = BulkEmbedder(model=EMBED_MODEL)
+
 def embed_openai(texts):
     """
-    Generate embeddings using the OpenAI API.
+    Generate embeddings using the OpenAI API through the bulk runner
+    (one shared client and event loop for the whole run).
     
     Args:
         texts (list[str]): List of text strings to embed.
     
     Returns:
-        list[list[float]]: List of embedding vectors.
+        np.ndarray: 2D float32 array of embedding vectors.
+    """
+    return bulk_embedder.embed(texts)
+
+
+def embed_now(embed_fn):
+    """
+    Wrap a blocking embed function so it returns a finished future, like BulkEmbedder.submit.
+
+    Args:
+        embed_fn (callable): texts -> 2D array.
+
+    Returns:
+        callable: texts -> concurrent.futures.Future holding the embeddings.
     """
-    # Initialize OpenAI client with provided API key
-    client = OpenAI(api_key=OPENAI_KEY)
+    def submit(texts):
+        fut = Future()
+        fut.set_result(embed_fn(texts))
+        return fut
+    return submit
 
-    # Request embeddings for all input texts
-    resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
 
-    # Extract embedding vectors from response
-    return [r.embedding for r in resp.data]
+def print_openai_stats():
+    """Print the bulk runner's throughput for the run."""
+    st = bulk_embedder.report()
+    if not st["chunks"]:
+        return
+    print(f"  {st['chunks']} chunks / {st['tokens']} tokens in {st['seconds']:.2f}s "
+          f"({st['chunks_per_second']:.1f} chunks/s, {st['tokens_per_second']:.0f} tokens/s, "
+          f"{st['api_batches']} requests, {st['resumed_batches']} resumed, {st['retries']} retries)")
 
 
 def embed_local(texts):
     """
-    Generate embeddings locally using SentenceTransformer.
+    Generate embeddings locally using the shared SentenceTransformer engine.
     Used as a fallback when no OpenAI API key is available.
     
     Args:
         texts (list[str]): List of text strings to embed.
     
     Returns:
-        list[list[float]]: List of embedding vectors.
+        np.ndarray: 2D float32 array of embedding vectors.
     """
-    from sentence_transformers import SentenceTransformer
-
-    # Load a lightweight local embedding model
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    # Use the same engine (and model) that serves query embeddings
+    engine = get_engine()
 
     # Encode texts into embeddings
-    embs = model.encode(texts, show_progress_bar=True)
+    return engine.encode(texts, show_progress_bar=True)
 
-    # Convert embeddings to standard Python lists
-    return [emb.tolist() for emb in embs]
 
+def iter_chunk_batches(path=IN, batch_size=EMBED_BATCH_SIZE):
+    """
+    Read chunk records from the chunks JSONL file in batches.
 
-def main():
+    Args:
+        path (Path): Chunks file written by chunk.py.
+        batch_size (int): Records per batch.
+
+    Yields:
+        list[dict]: A batch of chunk records.
     """
-    Main function to read text chunks, generate embeddings (OpenAI or local),
-    and write them to a JSONL output file.
+    batch = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def normalize_rows(embs):
     """
-    texts = []  # Stores text data for embedding
-    recs = []   # Stores original records for later merging
+    L2-normalize embedding rows so inner product equals cosine similarity.
 
-    # Read all text chunks from input file
-    with open(IN, encoding="utf-8") as f:
-        for line in f:
-            r = json.loads(line)
-            recs.append(r)
-            texts.append(r["text"])
+    Args:
+        embs (np.ndarray): 2D float32 array.
 
+    Returns:
+        np.ndarray: Normalized copy.
+    """
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    return embs / np.maximum(norms, 1e-12)
+
+
+def select_embedder():
+    """
+    Choose OpenAI embeddings when an API key is set, local ones otherwise.
+
+    Returns:
+        tuple: (embed function, model name)
+    """
+    if OPENAI_KEY:
+        return embed_openai, EMBED_MODEL
+    return embed_local, get_engine().model_name
+
+
+def lookup_cached(recs, model, cache):
+    """
+    Attach content hashes to a batch of chunk records and fetch cached vectors.
+
+    Args:
+        recs (list[dict]): Chunk records (modified in place with "content_hash").
+        model (str): Embedding model name.
+        cache (EmbeddingCache): Vectors from the previous run.
+
+    Returns:
+        tuple: (list of vectors with None for misses, list of missing positions)
+    """
+    for r in recs:
+        r["content_hash"] = content_hash(model, r["text"])
+    vecs = [cache.get(r["content_hash"]) for r in recs]
+    missing = [i for i, v in enumerate(vecs) if v is None]
+    return vecs, missing
+
+
+def fill_missing(vecs, missing, embs):
+    """
+    Insert freshly computed embeddings into the gaps left by cache misses.
+
+    Args:
+        vecs (list): Vectors from lookup_cached() (None for misses).
+        missing (list[int]): Positions of the misses.
+        embs (np.ndarray): New embeddings for the misses, in the same order.
+
+    Returns:
+        np.ndarray: 2D float32 array for the whole batch.
+    """
+    if missing:
+        embs = normalize_rows(embs)
+        for j, i in enumerate(missing):
+            vecs[i] = embs[j]
+    return np.stack(vecs)
+
+
+def main():
+    """
+    Main function to read text chunks in batches, generate embeddings (OpenAI or local),
+    and stream them into the binary embedding store.
+
+    Vectors from the previous run are reused when a chunk's content hash
+    (model + text) is unchanged, so only new or edited chunks are embedded.
+    With OpenAI, each batch's misses are submitted to the bulk runner and up to
+    EMBED_CONCURRENCY batches are in flight at once; every batch is appended to
+    the store as soon as it is done, so the corpus never sits in memory.
+    """
     # Decide which embedding method to use
+    embed_fn, model = select_embedder()
+    print("Using", "OpenAI" if OPENAI_KEY else "local sentence-transformers", "embeddings...")
+
+    # The previous store acts as a persistent cache keyed by content hash
+    cache = EmbeddingCache(OUT)
+    reused = embedded = 0
+
+    # OpenAI batches overlap on the bulk runner's shared client; local encoding runs inline
     if OPENAI_KEY:
-        print("Using OpenAI embeddings...")
-        embs = embed_openai(texts)
+        submit, max_inflight = bulk_embedder.submit, max(2, bulk_embedder.concurrency)
     else:
-        print("Using local sentence-transformers embeddings...")
-        embs = embed_local(texts)
-
-    # Write output file with original metadata + embeddings
-    with open(OUT, "w", encoding="utf-8") as outf:
-        for r, e in zip(recs, embs):
-            outrec = {**r, "embedding": e}
-            outf.write(json.dumps(outrec, ensure_ascii=False) + "\n")
+        submit, max_inflight = embed_now(embed_fn), 1
+    inflight = deque()
+
+    with EmbeddingStoreWriter(OUT, model=model, normalized=True) as writer:
+        def finish(entry):
+            """Wait for a batch's embeddings and append it (normalized for cosine search) to the store."""
+            nonlocal reused, embedded
+            recs, vecs, missing, fut = entry
+            embs = fut.result() if fut is not None else None
+            writer.append(fill_missing(vecs, missing, embs), recs)
+            reused += len(recs) - len(missing)
+            embedded += len(missing)
+
+        # Only chunks that are new or whose text changed need embedding
+        for recs in iter_chunk_batches():
+            vecs, missing = lookup_cached(recs, model, cache)
+            fut = submit([recs[i]["text"] for i in missing]) if missing else None
+            inflight.append((recs, vecs, missing, fut))
+            # Batches are appended in chunk order; the oldest is written once the window is full
+            if len(inflight) >= max_inflight:
+                finish(inflight.popleft())
+        while inflight:
+            finish(inflight.popleft())
+
+    if embedded and not OPENAI_KEY:
+        print("Embedding engine stats:", get_engine().stats())
+
+    # The store is safely written, so resume checkpoints are no longer needed
+    if OPENAI_KEY:
+        print_openai_stats()
+        bulk_embedder.close()
+        bulk_embedder.clear_checkpoints()
 
-    # Print success message
-    print("✅ Wrote embeddings to", OUT)
+    # Print success message with incremental statistics
+    print(f"Chunks reused: {reused}, embedded: {embedded}, deleted: {cache.unused()}")
+    print("✅ Wrote", writer.count, "embeddings to", OUT)
 
 
 # Entry point of the script
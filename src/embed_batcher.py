@@ -0,0 +1,179 @@
+# src/embed_batcher.py
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# How long to wait for more queries before flushing a batch, and the batch size cap
+BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler for query embeddings.
+
+    Callers submit single texts; a background thread collects texts that
+    arrive within `window_ms` of the first one (up to `max_batch` texts),
+    runs one batched embedding call and hands each vector back to its caller.
+    """
+
+    def __init__(self, embed_batch_fn, window_ms=BATCH_WINDOW_MS, max_batch=BATCH_MAX_SIZE):
+        """
+        Args:
+            embed_batch_fn (callable): Function mapping list[str] to a 2D array of vectors.
+            window_ms (float): Collection window in milliseconds.
+            max_batch (int): Maximum number of texts per batched call.
+        """
+        self.embed_batch_fn = embed_batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.batch_size_hist = {}
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.embed_seconds_total = 0.0
+
+    def _ensure_started(self):
+        """Start the background worker thread on first use."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="embed-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, text):
+        """
+        Queue a text for embedding.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the 1D embedding vector.
+        """
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def embed(self, text):
+        """
+        Embed a single text, blocking until its batch has been processed.
+
+        Args:
+            text (str): The text to embed.
+
+        Returns:
+            np.ndarray: 1D embedding vector.
+        """
+        return self.submit(text).result()
+
+    def _collect(self):
+        """
+        Block for the first queued item, then gather more until the window
+        closes or the batch is full.
+
+        Returns:
+            list[tuple]: Queued (text, future, enqueued_at) items.
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Worker loop: collect a batch, embed it, resolve the futures."""
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except BaseException as e:
+                # Never let one batch kill the worker: later submits would hang forever
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _process(self, batch):
+        """Embed one batch and resolve its futures, skipping callers that gave up."""
+        # Callers awaiting through asyncio.wrap_future cancel the future on disconnect or timeout
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        texts = [text for text, _, _ in batch]
+        try:
+            vecs = self.embed_batch_fn(texts)
+        except Exception as e:
+            # Propagate the failure to every caller in this batch
+            for _, fut, _ in batch:
+                fut.set_exception(e)
+            return
+        elapsed = time.perf_counter() - started
+
+        self._record(batch, started, elapsed)
+        if len(vecs) != len(batch):
+            error = RuntimeError(f"Embedding call returned {len(vecs)} vectors for {len(batch)} texts")
+            for _, fut, _ in batch:
+                fut.set_exception(error)
+            return
+        for (_, fut, _), vec in zip(batch, vecs):
+            fut.set_result(vec)
+
+    def _record(self, batch, started, elapsed):
+        """Update batch-size and queue-wait metrics for a processed batch."""
+        waits = [started - enqueued_at for _, _, enqueued_at in batch]
+        size = len(batch)
+        with self._metrics_lock:
+            self.batches += 1
+            self.items += size
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            self.batch_size_hist[size] = self.batch_size_hist.get(size, 0) + 1
+            self.queue_wait_total += sum(waits)
+            self.queue_wait_max = max(self.queue_wait_max, max(waits))
+            self.embed_seconds_total += elapsed
+
+    def stats(self):
+        """
+        Return batch-size and queue-wait metrics.
+
+        Returns:
+            dict: Batcher statistics.
+        """
+        with self._metrics_lock:
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": self.items / self.batches if self.batches else None,
+                "max_batch_size": self.max_batch_seen,
+                "batch_size_hist": dict(sorted(self.batch_size_hist.items())),
+                "avg_queue_wait_seconds": self.queue_wait_total / self.items if self.items else None,
+                "max_queue_wait_seconds": self.queue_wait_max,
+                "avg_embed_seconds": self.embed_seconds_total / self.batches if self.batches else None,
+            }
@@ -0,0 +1,129 @@
+# src/embedding_engine.py
+
+import os
+import time
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Local sentence-transformers model shared by indexing and querying
+LOCAL_EMBED_MODEL = os.getenv("LOCAL_EMBED_MODEL", "all-MiniLM-L6-v2")
+
+
+class EmbeddingEngine:
+    """
+    Process-wide wrapper around a SentenceTransformer model.
+
+    The model is loaded once (lazily on first use or explicitly via warmup())
+    and reused for every encode call. Load time and per-encode latency are
+    tracked so they can be reported by the app and scripts.
+    """
+
+    def __init__(self, model_name=LOCAL_EMBED_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+        # Timing statistics
+        self.load_seconds = None
+        self.encode_calls = 0
+        self.encoded_texts = 0
+        self.encode_seconds_total = 0.0
+        self.last_encode_seconds = None
+
+    @property
+    def loaded(self):
+        """Return True once the underlying model has been loaded."""
+        return self._model is not None
+
+    def _load(self):
+        """
+        Load the SentenceTransformer model if it is not loaded yet.
+        Guarded by a lock so concurrent callers only load it once.
+        """
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+
+                start = time.perf_counter()
+                self._model = SentenceTransformer(self.model_name)
+                self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def warmup(self):
+        """
+        Load the model and run one dummy encode so the first real query
+        does not pay model load or first-call initialisation cost.
+
+        Returns:
+            dict: Current engine statistics.
+        """
+        self._load()
+        self.encode(["warmup"])
+        return self.stats()
+
+    def encode(self, texts, show_progress_bar=False):
+        """
+        Encode a list of texts into float32 embedding vectors.
+
+        Args:
+            texts (list[str]): Texts to embed.
+            show_progress_bar (bool): Show a progress bar for large batches.
+
+        Returns:
+            np.ndarray: 2D float32 array of shape (len(texts), dim).
+        """
+        model = self._load()
+        start = time.perf_counter()
+        embs = model.encode(texts, show_progress_bar=show_progress_bar)
+        elapsed = time.perf_counter() - start
+
+        # Record per-encode latency
+        self.encode_calls += 1
+        self.encoded_texts += len(texts)
+        self.encode_seconds_total += elapsed
+        self.last_encode_seconds = elapsed
+        return np.asarray(embs, dtype="float32")
+
+    def stats(self):
+        """
+        Return load time and encode latency statistics.
+
+        Returns:
+            dict: Engine statistics.
+        """
+        avg = self.encode_seconds_total / self.encode_calls if self.encode_calls else None
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "encode_calls": self.encode_calls,
+            "encoded_texts": self.encoded_texts,
+            "avg_encode_seconds": avg,
+            "last_encode_seconds": self.last_encode_seconds,
+        }
+
+
+# Single engine instance shared by the whole process
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the process-wide EmbeddingEngine, creating it on first use.
+
+    Returns:
+        EmbeddingEngine: Shared engine instance.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine()
+    return _engine
@@ -0,0 +1,305 @@
+# src/embedding_store.py
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import numpy as np
+from pathlib import Path
+
+# Store layout: a directory holding contiguous float32 vectors plus separate metadata
+VECTORS_FILE = "vectors.f32"     # row-major float32, count x dim, no header
+META_FILE = "meta.jsonl"         # one JSON record per row, same order as the vectors
+MANIFEST_FILE = "manifest.json"  # dim, count, dtype and producer details
+FORMAT_VERSION = 1
+
+# Rows converted per batch when reading the legacy JSONL format
+CONVERT_BATCH = 1024
+
+
+class EmbeddingStoreWriter:
+    """
+    Streaming writer for the binary embedding store.
+
+    Batches are appended as they are produced, so the full corpus never has to
+    sit in memory. Files are written to a temporary directory that replaces the
+    target directory on close(), so readers never see a half-written store.
+    """
+
+    def __init__(self, path, model=None, normalized=False):
+        """
+        Args:
+            path (str | Path): Target store directory.
+            model (str | None): Embedding model name, recorded in the manifest.
+            normalized (bool): Whether the vectors written are L2-normalized.
+        """
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.model = model
+        self.normalized = normalized
+        self.dim = None
+        self.count = 0
+
+        # Start from an empty temporary directory
+        if self.tmp_path.exists():
+            shutil.rmtree(self.tmp_path)
+        self.tmp_path.mkdir(parents=True)
+        self._vec_f = open(self.tmp_path / VECTORS_FILE, "wb")
+        self._meta_f = open(self.tmp_path / META_FILE, "w", encoding="utf-8")
+
+    def append(self, vecs, recs):
+        """
+        Append a batch of vectors and their metadata records.
+
+        Args:
+            vecs (array-like): 2D array of shape (len(recs), dim).
+            recs (list[dict]): Metadata for each vector (without the embedding).
+        """
+        vecs = np.ascontiguousarray(vecs, dtype="float32")
+        if vecs.ndim != 2 or len(vecs) != len(recs):
+            raise ValueError(f"Expected {len(recs)} vectors, got array of shape {vecs.shape}")
+        if self.dim is None:
+            self.dim = vecs.shape[1]
+        elif vecs.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension changed from {self.dim} to {vecs.shape[1]}")
+
+        self._vec_f.write(vecs.tobytes())
+        for r in recs:
+            self._meta_f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        self.count += len(recs)
+
+    def close(self):
+        """Write the manifest and atomically move the store into place."""
+        self._vec_f.close()
+        self._meta_f.close()
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "dtype": "float32",
+            "dim": self.dim,
+            "count": self.count,
+            "normalized": self.normalized,
+            "model": self.model,
+        }
+        with open(self.tmp_path / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Swap the finished store into place
+        if self.path.exists():
+            old = self.path.with_name(self.path.name + ".old")
+            if old.exists():
+                shutil.rmtree(old)
+            os.replace(self.path, old)
+            os.replace(self.tmp_path, self.path)
+            shutil.rmtree(old)
+        else:
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Discard everything written so far."""
+        self._vec_f.close()
+        self._meta_f.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def read_manifest(path):
+    """
+    Read a store's manifest.
+
+    Args:
+        path (str | Path): Store directory.
+
+    Returns:
+        dict: Manifest contents.
+    """
+    with open(Path(path) / MANIFEST_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_vectors(path):
+    """
+    Memory-map the vectors of a store without copying them into RAM.
+
+    Args:
+        path (str | Path): Store directory.
+
+    Returns:
+        np.ndarray: Read-only float32 array of shape (count, dim).
+    """
+    manifest = read_manifest(path)
+    if manifest["count"] == 0:
+        return np.zeros((0, manifest["dim"] or 0), dtype="float32")
+    return np.memmap(
+        Path(path) / VECTORS_FILE,
+        dtype=manifest["dtype"],
+        mode="r",
+        shape=(manifest["count"], manifest["dim"]),
+    )
+
+
+def iter_meta(path):
+    """
+    Iterate over a store's metadata records in row order.
+
+    Args:
+        path (str | Path): Store directory.
+
+    Yields:
+        dict: Metadata record.
+    """
+    with open(Path(path) / META_FILE, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def content_hash(model, text):
+    """
+    Hash a chunk's text together with the embedding model that encodes it.
+
+    Args:
+        model (str): Embedding model name.
+        text (str): Chunk text.
+
+    Returns:
+        str: Hex digest used as the embedding cache key.
+    """
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Read-only view of an existing store used to reuse vectors by content hash.
+    Vectors stay memory-mapped; only the hash -> row mapping is held in memory.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str | Path): Store directory from a previous run (may not exist).
+        """
+        self._rows = {}
+        self._vecs = None
+        self.used = set()
+        path = Path(path)
+        if not (path / MANIFEST_FILE).exists():
+            return
+        for row, r in enumerate(iter_meta(path)):
+            h = r.get("content_hash")
+            if h:
+                self._rows[h] = row
+        self._vecs = load_vectors(path)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, h):
+        """
+        Return the cached vector for a content hash.
+
+        Args:
+            h (str): Content hash from content_hash().
+
+        Returns:
+            np.ndarray | None: The cached vector, or None on a miss.
+        """
+        row = self._rows.get(h)
+        if row is None:
+            return None
+        self.used.add(h)
+        return np.array(self._vecs[row])
+
+    def unused(self):
+        """Number of cached vectors whose chunk no longer exists."""
+        return len(self._rows) - len(self.used)
+
+
+def iter_jsonl_batches(path, batch_size=CONVERT_BATCH):
+    """
+    Read the legacy embeddings JSONL format in batches.
+
+    Args:
+        path (str | Path): JSONL file with an "embedding" field per record.
+        batch_size (int): Records per batch.
+
+    Yields:
+        tuple: (2D float32 array, list of metadata records without the embedding)
+    """
+    vecs, recs = [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            r = json.loads(line)
+            vecs.append(r.pop("embedding"))
+            recs.append(r)
+            if len(recs) >= batch_size:
+                yield np.asarray(vecs, dtype="float32"), recs
+                vecs, recs = [], []
+    if recs:
+        yield np.asarray(vecs, dtype="float32"), recs
+
+
+def load_embeddings_any(path):
+    """
+    Load embeddings from either the binary store directory or legacy JSONL.
+
+    Args:
+        path (str | Path): Store directory or JSONL file.
+
+    Returns:
+        tuple: (2D float32 array of vectors, list of metadata records).
+        Store vectors are memory-mapped; JSONL vectors are parsed into memory.
+    """
+    path = Path(path)
+    if path.is_dir():
+        return load_vectors(path), list(iter_meta(path))
+
+    batches = list(iter_jsonl_batches(path))
+    if not batches:
+        return np.zeros((0, 0), dtype="float32"), []
+    vecs = np.concatenate([b[0] for b in batches])
+    metas = [r for b in batches for r in b[1]]
+    return vecs, metas
+
+
+def convert_jsonl(src, dst):
+    """
+    Convert a legacy embeddings JSONL file into the binary store format.
+
+    Args:
+        src (str | Path): Input JSONL file.
+        dst (str | Path): Output store directory.
+
+    Returns:
+        int: Number of rows converted.
+    """
+    with EmbeddingStoreWriter(dst) as writer:
+        for vecs, recs in iter_jsonl_batches(src):
+            writer.append(vecs, recs)
+    return writer.count
+
+
+def main(argv=None):
+    """
+    Command-line converter:
+        python src/embedding_store.py convert data/embeddings.jsonl data/embeddings
+    """
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 3 or args[0] != "convert":
+        print("Usage: python src/embedding_store.py convert <embeddings.jsonl> <store_dir>")
+        raise SystemExit(2)
+    n = convert_jsonl(args[1], args[2])
+    print("Converted", n, "embeddings to", args[2])
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
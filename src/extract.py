@@ -0,0 +1,251 @@
+# src/extract.py
+
+import os
+import re
+
+# Extractor backend: "bs4", "lxml", "selectolax", or "auto" (fastest one installed)
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "auto")
+
+# Tags that never hold page content
+BOILERPLATE_TAGS = ["script", "style", "header", "footer", "nav", "aside", "noscript",
+                    "form", "iframe", "svg", "button"]
+
+# class/id fragments used by the BoM page templates for menus, banners and widgets
+BOILERPLATE_PATTERN = re.compile(
+    r"(^|[\s_-])(breadcrumb|menu|navbar|mega-?menu|top-?bar|footer|sidebar|social|share|"
+    r"cookie|skip|modal|popup|banner-slider|quick-?links|back-to-top|sitemap|search)([\s_-]|$)",
+    re.IGNORECASE,
+)
+
+# Preferred order when HTML_EXTRACTOR=auto
+AUTO_ORDER = ("selectolax", "lxml", "bs4")
+
+
+def is_boilerplate(class_attr, id_attr):
+    """
+    Decide from class and id attributes whether an element is template boilerplate.
+
+    Args:
+        class_attr (str | None): Space-separated class names.
+        id_attr (str | None): Element id.
+
+    Returns:
+        bool: True if the element should be removed.
+    """
+    return bool(BOILERPLATE_PATTERN.search(f"{class_attr or ''} {id_attr or ''}"))
+
+
+def normalize_text(text):
+    """
+    Strip each line and drop empty ones, so every backend produces the same layout.
+
+    Args:
+        text (str): Extracted text with newline separators.
+
+    Returns:
+        str: Cleaned text.
+    """
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    return "\n".join(lines)
+
+
+def extract_bs4(html):
+    """
+    Extract main text with BeautifulSoup's pure-Python html.parser (reference backend).
+
+    Args:
+        html (str): Raw HTML content.
+
+    Returns:
+        str: Cleaned text extracted from the HTML.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Remove non-content or noisy HTML elements
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(lambda t: is_boilerplate(" ".join(t.get("class", [])), t.get("id"))):
+        if not tag.decomposed:
+            tag.decompose()
+
+    # Heuristically select the main content section (if available)
+    main = soup.find("main") or soup.find("article") or soup
+    return normalize_text(main.get_text(separator="\n"))
+
+
+def extract_lxml(html):
+    """
+    Extract main text with lxml's C HTML parser.
+
+    Args:
+        html (str): Raw HTML content.
+
+    Returns:
+        str: Cleaned text extracted from the HTML.
+    """
+    import lxml.html
+
+    if not html.strip():
+        return ""
+    doc = lxml.html.document_fromstring(html)
+
+    # Drop comments, boilerplate tags and template widgets (drop_tree keeps tail text)
+    for el in doc.xpath("//comment()"):
+        el.drop_tree()
+    for el in list(doc.iter(*BOILERPLATE_TAGS)):
+        el.drop_tree()
+    for el in doc.xpath("//*[@class or @id]"):
+        if el.getparent() is not None and is_boilerplate(el.get("class"), el.get("id")):
+            el.drop_tree()
+
+    main = doc.find(".//main")
+    if main is None:
+        main = doc.find(".//article")
+    if main is None:
+        main = doc
+    return normalize_text("\n".join(main.itertext()))
+
+
+def extract_selectolax(html):
+    """
+    Extract main text with selectolax (Lexbor engine), the fastest backend.
+
+    Args:
+        html (str): Raw HTML content.
+
+    Returns:
+        str: Cleaned text extracted from the HTML.
+    """
+    from selectolax.parser import HTMLParser
+
+    tree = HTMLParser(html)
+    tree.strip_tags(BOILERPLATE_TAGS)
+
+    # Remove only the outermost matching widgets so no node is freed twice
+    removed = set()
+    for node in tree.css("[class], [id]"):
+        if not is_boilerplate(node.attributes.get("class"), node.attributes.get("id")):
+            continue
+        parent, nested = node.parent, False
+        while parent is not None:
+            if parent.mem_id in removed:
+                nested = True
+                break
+            parent = parent.parent
+        if not nested:
+            removed.add(node.mem_id)
+    for node in tree.css("[class], [id]"):
+        if node.mem_id in removed:
+            node.decompose()
+
+    main = tree.css_first("main") or tree.css_first("article") or tree.root
+    if main is None:
+        return ""
+    return normalize_text(main.text(separator="\n"))
+
+
+# Registered backends
+EXTRACTORS = {
+    "bs4": extract_bs4,
+    "lxml": extract_lxml,
+    "selectolax": extract_selectolax,
+}
+
+# Module each backend needs at import time
+_BACKEND_MODULES = {"bs4": "bs4", "lxml": "lxml.html", "selectolax": "selectolax.parser"}
+
+
+def available_backends():
+    """
+    List the backends whose parser library is installed.
+
+    Returns:
+        list[str]: Backend names.
+    """
+    import importlib
+
+    names = []
+    for name, module in _BACKEND_MODULES.items():
+        try:
+            importlib.import_module(module)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+def hrefs_bs4(html):
+    """Return the href values of all links, parsed with BeautifulSoup."""
+    from bs4 import BeautifulSoup
+
+    return [a["href"] for a in BeautifulSoup(html, "html.parser").find_all("a", href=True)]
+
+
+def hrefs_lxml(html):
+    """Return the href values of all links, parsed with lxml."""
+    import lxml.html
+
+    if not html.strip():
+        return []
+    return lxml.html.document_fromstring(html).xpath("//a/@href")
+
+
+def hrefs_selectolax(html):
+    """Return the href values of all links, parsed with selectolax."""
+    from selectolax.parser import HTMLParser
+
+    return [a.attributes["href"] for a in HTMLParser(html).css("a[href]") if a.attributes.get("href")]
+
+
+# Link extractors matching each backend
+HREF_EXTRACTORS = {
+    "bs4": hrefs_bs4,
+    "lxml": hrefs_lxml,
+    "selectolax": hrefs_selectolax,
+}
+
+
+def resolve_backend(name=HTML_EXTRACTOR):
+    """
+    Resolve "auto" to the fastest installed backend.
+
+    Args:
+        name (str): Backend name or "auto".
+
+    Returns:
+        str: Concrete backend name.
+    """
+    if name == "auto":
+        installed = available_backends()
+        name = next(n for n in AUTO_ORDER if n in installed)
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown HTML extractor {name!r}; choose from {', '.join(EXTRACTORS)} or auto")
+    return name
+
+
+def get_href_extractor(name=HTML_EXTRACTOR):
+    """
+    Return the link extraction function for a backend name.
+
+    Args:
+        name (str): Backend name or "auto".
+
+    Returns:
+        callable: Function mapping HTML to a list of href strings.
+    """
+    return HREF_EXTRACTORS[resolve_backend(name)]
+
+
+def get_extractor(name=HTML_EXTRACTOR):
+    """
+    Return the extraction function for a backend name.
+
+    Args:
+        name (str): Backend name or "auto".
+
+    Returns:
+        callable: Function mapping HTML to cleaned text.
+    """
+    return EXTRACTORS[resolve_backend(name)]
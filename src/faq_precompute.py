@@ -0,0 +1,262 @@
+# src/faq_precompute.py
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import argparse
+from pathlib import Path
+from collections import Counter
+from dotenv import load_dotenv
+
+try:
+    from . import retrieve_and_answer as ra
+    from .answer_cache import FAQ_CACHE_PATH, SemanticAnswerCache, normalize_question, read_index_version
+    from .batch_answer import BATCH_CONCURRENCY, BATCH_RPM, AsyncRateLimiter, normalize_items
+    from .conversation_store import CONVERSATION_DB
+except ImportError:  # executed as a script: python src/faq_precompute.py
+    import retrieve_and_answer as ra
+    from answer_cache import FAQ_CACHE_PATH, SemanticAnswerCache, normalize_question, read_index_version
+    from batch_answer import BATCH_CONCURRENCY, BATCH_RPM, AsyncRateLimiter, normalize_items
+    from conversation_store import CONVERSATION_DB
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configured FAQ list (JSONL with "question" per line, or plain text with one question per line)
+FAQ_PATH = Path(os.getenv("FAQ_PATH", "data/faqs.jsonl"))
+
+# Content hashes of the snippets behind each answer, used to regenerate only what changed
+FAQ_MANIFEST_PATH = Path(os.getenv("FAQ_MANIFEST_PATH", "indexes/faq_manifest.json"))
+
+# Frequent recent questions added from the conversation history
+FAQ_TOP_QUERIES = int(os.getenv("FAQ_TOP_QUERIES", "0"))
+FAQ_QUERY_DAYS = float(os.getenv("FAQ_QUERY_DAYS", "7"))
+FAQ_MIN_COUNT = int(os.getenv("FAQ_MIN_COUNT", "3"))
+
+
+def load_faqs(path=FAQ_PATH):
+    """
+    Read the configured FAQ questions.
+
+    Args:
+        path (Path): JSONL file (see batch_answer.normalize_items) or plain text, one question per line.
+
+    Returns:
+        list[str]: Questions in file order.
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+    if path.suffix.lower() == ".jsonl":
+        return [item["question"] for item in normalize_items([json.loads(line) for line in lines])]
+    return lines
+
+
+def frequent_questions(db_path=CONVERSATION_DB, days=FAQ_QUERY_DAYS, limit=FAQ_TOP_QUERIES, min_count=FAQ_MIN_COUNT):
+    """
+    Find the most frequent recent user questions in the SQLite conversation store.
+
+    Args:
+        db_path (Path): Conversation database (CONVERSATION_STORE=sqlite).
+        days (float): Only questions asked within this many days count.
+        limit (int): Maximum number of questions to return.
+        min_count (int): Minimum number of times a question must have been asked.
+
+    Returns:
+        list[str]: Questions, most frequent first (one wording per normalized question).
+    """
+    if limit <= 0 or not Path(db_path).exists():
+        return []
+    with sqlite3.connect(str(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT text FROM messages WHERE sender = 'user' AND created_at >= ?",
+            (time.time() - days * 86400,),
+        ).fetchall()
+
+    counts, wording = Counter(), {}
+    for (text,) in rows:
+        key = normalize_question(text)
+        if key:
+            counts[key] += 1
+            wording.setdefault(key, text.strip())
+    return [wording[k] for k, n in counts.most_common(limit) if n >= min_count]
+
+
+def snippet_hashes(retrieved, prompt_report):
+    """
+    Hash the text of every snippet that went into an answer's prompt.
+
+    Args:
+        retrieved (list[dict]): Retrieved chunks.
+        prompt_report (dict): Report from assemble_prompt() listing the snippets used.
+
+    Returns:
+        dict: chunk_id -> short content hash.
+    """
+    used = set(prompt_report["snippets"])
+    return {
+        r["chunk_id"]: hashlib.sha256((r.get("text") or "").encode("utf-8")).hexdigest()[:16]
+        for r in retrieved if r.get("chunk_id") in used
+    }
+
+
+def load_previous(cache_path=FAQ_CACHE_PATH, manifest_path=FAQ_MANIFEST_PATH):
+    """
+    Read the answers and snippet hashes of the previous run, whatever index version they were made for.
+
+    Returns:
+        dict: normalized question -> {"result", "top_k", "hashes"}.
+    """
+    if not Path(cache_path).exists() or not Path(manifest_path).exists():
+        return {}
+    with open(cache_path, encoding="utf-8") as f:
+        entries = {e["key"]: e for e in json.load(f).get("entries", [])}
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f).get("entries", {})
+    return {
+        key: {"result": entries[key]["result"], "top_k": entries[key].get("top_k"), "hashes": m["hashes"]}
+        for key, m in manifest.items() if key in entries
+    }
+
+
+async def precompute(questions, top_k=5, concurrency=BATCH_CONCURRENCY, rpm=BATCH_RPM, force=False):
+    """
+    Retrieve and answer every FAQ for the current index. Answers whose
+    snippets have the same content as in the previous run are reused; only
+    the rest go to the LLM.
+
+    Args:
+        questions (list[str]): FAQ questions (duplicates after normalization are dropped).
+        top_k (int): Number of snippets retrieved per question.
+        concurrency (int): Maximum LLM calls in flight.
+        rpm (float): Maximum LLM calls started per minute (0 = unlimited).
+        force (bool): Regenerate every answer.
+
+    Returns:
+        tuple: (SemanticAnswerCache with the answers, manifest dict, counts dict)
+    """
+    # Keep the first wording of each distinct question
+    unique = {}
+    for q in questions:
+        unique.setdefault(normalize_question(q), q)
+    questions = list(unique.values())
+
+    # One embedding call and one FAISS search for the whole list
+    queries = ra.embed_queries(questions)
+    ranked = ra.rank_candidates_batch(questions, queries, top_k)
+
+    previous = {} if force else load_previous()
+    cache = SemanticAnswerCache(max_entries=len(questions) + 1, ttl=float("inf"), persist_path=None)
+    manifest = {"index_version": read_index_version(), "top_k": top_k, "entries": {}}
+    counts = {"questions": len(questions), "reused": 0, "generated": 0, "no_context": 0, "errors": 0}
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    limiter = AsyncRateLimiter(rpm)
+
+    async def generate(question, qv, retrieved, prompt, prompt_report, rerank_info, hashes):
+        try:
+            async with sem:
+                await limiter.wait()
+                answer = await ra.call_llm_async(prompt)
+        except Exception as e:
+            print(f"Failed to answer {question!r}: {e}")
+            counts["errors"] += 1
+            return
+        store(question, qv, {"answer": answer, "retrieved": retrieved, "prompt": prompt_report,
+                             "rerank": rerank_info}, hashes)
+        counts["generated"] += 1
+
+    def store(question, qv, result, hashes):
+        cache.store(question, qv, result, top_k)
+        manifest["entries"][normalize_question(question)] = {"question": question, "hashes": hashes}
+
+    tasks = []
+    for question, qv, (retrieved, rerank_info) in zip(questions, queries, ranked):
+        # Nothing passes the similarity cutoff: the live path answers these without the LLM anyway
+        if not retrieved:
+            counts["no_context"] += 1
+            continue
+        prompt, prompt_report = ra.assemble_prompt(question, retrieved)
+        hashes = snippet_hashes(retrieved, prompt_report)
+
+        # Same snippets with the same text as last time: the answer is still valid
+        prev = previous.get(normalize_question(question))
+        if prev is not None and prev["hashes"] == hashes and prev["top_k"] == top_k:
+            store(question, qv, {**prev["result"], "retrieved": retrieved, "prompt": prompt_report,
+                                 "rerank": rerank_info}, hashes)
+            counts["reused"] += 1
+        else:
+            tasks.append(generate(question, qv, retrieved, prompt, prompt_report, rerank_info, hashes))
+
+    await asyncio.gather(*tasks)
+    return cache, manifest, counts
+
+
+def write_manifest(manifest, path=FAQ_MANIFEST_PATH):
+    """Write the snippet-hash manifest atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    """
+    Precompute answers for the FAQ list (and frequent recent questions) after build_index.py:
+        python src/faq_precompute.py [--top-queries 50] [--force]
+
+    Returns:
+        dict | None: Counts for the run, or None if there was nothing to do.
+    """
+    parser = argparse.ArgumentParser(description="Precompute FAQ answers for the current index.")
+    parser.add_argument("--faqs", type=Path, default=FAQ_PATH)
+    parser.add_argument("--top-queries", type=int, default=FAQ_TOP_QUERIES,
+                        help="Add this many frequent recent questions from the SQLite conversation store")
+    parser.add_argument("--days", type=float, default=FAQ_QUERY_DAYS)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, default=BATCH_RPM)
+    parser.add_argument("--force", action="store_true", help="Regenerate every answer")
+    args = parser.parse_args(argv)
+
+    questions = load_faqs(args.faqs) + frequent_questions(days=args.days, limit=args.top_queries)
+    if not questions:
+        print(f"No FAQ questions found (looked in {args.faqs}); nothing to precompute.")
+        return
+    if not ra.async_openai_client:
+        print("OPENAI_API_KEY not set; FAQ answers need the LLM. Skipping.")
+        return
+    try:
+        ra.retriever.load()
+    except ra.RetrieverNotReady as e:
+        print(e)
+        raise SystemExit(1)
+
+    async def run():
+        try:
+            return await precompute(questions, args.top_k, args.concurrency, args.rpm, args.force)
+        finally:
+            await ra.close_async_clients()
+
+    started = time.perf_counter()
+    cache, manifest, counts = asyncio.run(run())
+
+    # Manifest first: the answers file is what serving processes watch
+    write_manifest(manifest)
+    cache.save(FAQ_CACHE_PATH)
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    print(f"Saved {len(manifest['entries'])} FAQ answers for index {manifest['index_version']} "
+          f"to {FAQ_CACHE_PATH}:", json.dumps(counts))
+    return counts
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
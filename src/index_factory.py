@@ -0,0 +1,265 @@
+# src/index_factory.py
+
+import os
+import json
+import math
+import hashlib
+import faiss
+import numpy as np
+from pathlib import Path
+
+# Build settings written next to the index so retrieval can pick them up
+CONFIG_PATH = Path("indexes/index_config.json")
+
+# Supported index types
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq8")
+
+# Supported metrics: "ip" = inner product on L2-normalized vectors (cosine), "l2" = Euclidean
+METRICS = {"ip": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+
+# Default build and search parameters
+DEFAULT_PARAMS = {
+    "nlist": 100,           # IVF: number of coarse clusters
+    "nprobe": 10,           # IVF: clusters visited per query
+    "hnsw_m": 32,           # HNSW: neighbours per node
+    "ef_construction": 200, # HNSW: build-time candidate list size
+    "ef_search": 64,        # HNSW: query-time candidate list size
+    "pq_m": 16,             # PQ: number of sub-quantizers (must divide dim)
+    "pq_nbits": 8,          # PQ: bits per sub-quantizer code
+}
+
+
+def chunk_faiss_id(chunk_id):
+    """
+    Derive a stable 63-bit FAISS id from a chunk id, so a chunk keeps its id
+    across rebuilds and can be removed or replaced in place.
+
+    Args:
+        chunk_id (str): Chunk identifier such as "doc_3f9a1c2b7d4e_c3" (the doc part hashes the page URL).
+
+    Returns:
+        int: Non-negative int64 id.
+    """
+    digest = hashlib.sha1(chunk_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
+
+def supports_incremental(index_type):
+    """Return True if indexes of this type can remove ids and add new ones in place."""
+    return index_type != "hnsw"
+
+
+def normalized_vectors(vecs, tol=1e-3):
+    """
+    Return L2-normalized vectors, copying only when normalization is needed.
+
+    Args:
+        vecs (np.ndarray): 2D float32 array (may be a read-only memory map).
+        tol (float): Allowed deviation of squared norms from 1.
+
+    Returns:
+        np.ndarray: Unit-length vectors.
+    """
+    sq_norms = np.einsum("ij,ij->i", vecs, vecs)
+    if np.all(np.abs(sq_norms - 1.0) <= tol):
+        return vecs
+    out = np.array(vecs, dtype="float32", copy=True)
+    faiss.normalize_L2(out)
+    return out
+
+
+def build_faiss_index(vecs, index_type="flat", params=None, metric="ip", ids=None):
+    """
+    Build and train a FAISS index of the requested type.
+    For the "ip" metric, vectors are expected to be L2-normalized already.
+
+    Args:
+        vecs (np.ndarray): 2D float32 array of vectors to index.
+        index_type (str): One of INDEX_TYPES.
+        params (dict | None): Overrides for DEFAULT_PARAMS.
+        metric (str): One of METRICS.
+        ids (np.ndarray | None): int64 ids for the vectors; when given, search
+            returns these ids instead of row numbers.
+
+    Returns:
+        tuple: (faiss.Index with vectors added, dict of effective parameters)
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; choose from {', '.join(INDEX_TYPES)}")
+
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; choose from {', '.join(METRICS)}")
+
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    n, dim = vecs.shape
+    m = METRICS[metric]
+
+    # IVF needs at least one training point per cluster
+    if index_type in ("ivf_flat", "ivf_pq") and p["nlist"] > n:
+        print(f"nlist={p['nlist']} exceeds {n} vectors; using nlist={n}")
+        p["nlist"] = n
+
+    if index_type == "flat":
+        index = faiss.IndexFlat(dim, m)
+    elif index_type == "ivf_flat":
+        quantizer = faiss.IndexFlat(dim, m)
+        index = faiss.IndexIVFFlat(quantizer, dim, p["nlist"], m)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, p["hnsw_m"], m)
+        index.hnsw.efConstruction = p["ef_construction"]
+    elif index_type == "ivf_pq":
+        if dim % p["pq_m"]:
+            raise ValueError(f"pq_m={p['pq_m']} must divide the vector dimension {dim}")
+        # PQ training needs at least 2**nbits points per sub-quantizer
+        max_nbits = max(1, int(math.log2(n))) if n > 1 else 1
+        if p["pq_nbits"] > max_nbits:
+            print(f"pq_nbits={p['pq_nbits']} too large for {n} vectors; using pq_nbits={max_nbits}")
+            p["pq_nbits"] = max_nbits
+        quantizer = faiss.IndexFlat(dim, m)
+        index = faiss.IndexIVFPQ(quantizer, dim, p["nlist"], p["pq_m"], p["pq_nbits"], m)
+    else:  # sq8
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, m)
+
+    # Train (no-op for flat and HNSW) and add vectors
+    if not index.is_trained:
+        index.train(vecs)
+    if ids is None:
+        index.add(vecs)
+    else:
+        # IVF indexes store ids natively; the others need an id map around them
+        if index_type not in ("ivf_flat", "ivf_pq"):
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(vecs, np.asarray(ids, dtype="int64"))
+
+    apply_search_params(index, index_type, p)
+    return index, p
+
+
+def apply_search_params(index, index_type, params):
+    """
+    Apply search-time knobs (nprobe, efSearch) to an index.
+
+    Args:
+        index (faiss.Index): Index to configure.
+        index_type (str): Index type the index was built with.
+        params (dict): Parameters containing nprobe / ef_search.
+    """
+    ps = faiss.ParameterSpace()
+    if index_type in ("ivf_flat", "ivf_pq") and params.get("nprobe"):
+        ps.set_index_parameter(index, "nprobe", int(params["nprobe"]))
+    elif index_type == "hnsw" and params.get("ef_search"):
+        ps.set_index_parameter(index, "efSearch", int(params["ef_search"]))
+
+
+def save_index_config(index_type, params, metric="ip", stable_ids=False, path=CONFIG_PATH):
+    """
+    Save the index type, metric and parameters next to the index.
+
+    Args:
+        index_type (str): Index type that was built.
+        params (dict): Effective build and search parameters.
+        metric (str): Metric the index was built with.
+        stable_ids (bool): Whether the index returns chunk_faiss_id() ids instead of row numbers.
+        path (Path): Output location.
+    """
+    config = {"index_type": index_type, "metric": metric, "stable_ids": stable_ids, "params": params}
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_index_config(path=CONFIG_PATH):
+    """
+    Load the saved index configuration.
+
+    Args:
+        path (Path): Location of the config file.
+
+    Returns:
+        dict: {"index_type", "metric", "params"}; indexes built before the config
+        file existed are plain flat L2 indexes.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {"index_type": "flat", "metric": "l2", "stable_ids": False, "params": dict(DEFAULT_PARAMS)}
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    config.setdefault("metric", "l2")
+    config.setdefault("stable_ids", False)
+    return config
+
+
+def index_memory_bytes(index):
+    """
+    Measure the serialized size of an index, a close proxy for its memory footprint.
+
+    Args:
+        index (faiss.Index): Index to measure.
+
+    Returns:
+        int: Size in bytes.
+    """
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def mapped_part(index, in_place_codes=False):
+    """
+    Describe which part of a loaded index FAISS actually serves from the mapped file.
+
+    IO_FLAG_MMAP only maps IVF inverted lists; flat and HNSW indexes are still
+    copied onto the heap unless IO_FLAG_MMAP_IFC maps their codes in place
+    (the HNSW graph itself is always read into memory).
+
+    Args:
+        index (faiss.Index): Index returned by faiss.read_index.
+        in_place_codes (bool): Whether it was read with IO_FLAG_MMAP_IFC.
+
+    Returns:
+        str | None: "inverted_lists", "codes", "codes (graph on heap)", or None if nothing is mapped.
+    """
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexIVF):
+        return "inverted_lists"
+    flat_codes = getattr(faiss, "IndexFlatCodes", None)
+    if in_place_codes and flat_codes is not None:
+        if isinstance(index, flat_codes):
+            return "codes"
+        if isinstance(index, faiss.IndexHNSW) and isinstance(faiss.downcast_index(index.storage), flat_codes):
+            return "codes (graph on heap)"
+    return None
+
+
+def read_faiss_index(path, mmap=False):
+    """
+    Read an index from disk, optionally memory-mapped.
+
+    A memory-mapped part of an index is backed by the file's pages in the OS
+    page cache, so several worker processes serving the same file share one
+    copy. FAISS maps IVF inverted lists, and with IO_FLAG_MMAP_IFC (newer
+    FAISS releases) the codes of flat-code indexes; everything else is read
+    into each process's heap.
+
+    Args:
+        path (str | Path): Index file written by build_index.py.
+        mmap (bool): Map the index file instead of reading it.
+
+    Returns:
+        tuple: (faiss.Index, str | None naming the memory-mapped part, see mapped_part())
+    """
+    if mmap:
+        ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        for flags in ([faiss.IO_FLAG_MMAP | ifc] if ifc else []) + [faiss.IO_FLAG_MMAP]:
+            try:
+                index = faiss.read_index(str(path), flags | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                err = e
+                continue
+            mapped = mapped_part(index, in_place_codes=bool(flags & ifc))
+            if mapped is None:
+                print(f"FAISS cannot memory-map this index type; {path} is held in each process's memory.")
+            return index, mapped
+        print(f"Memory-mapping {path} is not supported for this index type ({err}); reading it instead.")
+    return faiss.read_index(str(path)), None
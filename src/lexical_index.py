@@ -0,0 +1,173 @@
+# src/lexical_index.py
+
+import os
+import re
+import numpy as np
+from pathlib import Path
+from collections import Counter
+
+# Inverted index written next to indexes/faiss.index by build_index.py
+LEXICAL_PATH = Path("indexes/bm25.npz")
+
+# BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Words, and numbers with an optional decimal part and percent sign (8.35%, 30, 7.5)
+_TOKEN = re.compile(r"\d+(?:\.\d+)?%?|[a-z][a-z0-9]*")
+
+# Very common words that carry no lexical signal for loan questions
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it its me my of on or "
+    "our the their there this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms, keeping numbers such as 8.35%
+    whole and dropping stopwords.
+
+    Args:
+        text (str): Chunk or query text.
+
+    Returns:
+        list[str]: Terms in text order.
+    """
+    terms = []
+    for t in _TOKEN.findall(text.lower()):
+        if t in STOPWORDS:
+            continue
+        terms.append(t)
+        if t.endswith("%"):
+            terms.append(t[:-1])  # "8.35%" also matches a query for "8.35"
+    return terms
+
+
+def build_lexical_index(texts, path=LEXICAL_PATH, k1=BM25_K1, b=BM25_B):
+    """
+    Build a BM25 inverted index over chunk texts and save it as one .npz file.
+
+    Postings are stored term by term in two flat arrays (row numbers as uint32 and
+    precomputed BM25 weights as float32), with an offsets array marking where each
+    term's postings start. A query is then a few array slices and one bincount.
+
+    Args:
+        texts (list[str]): Chunk texts; position i is metadata row i.
+        path (Path): Output .npz file.
+        k1 (float): BM25 term-frequency saturation.
+        b (float): BM25 length normalization.
+
+    Returns:
+        dict: Number of documents, terms and postings.
+    """
+    postings = {}
+    doc_len = np.zeros(len(texts), dtype="uint32")
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_len[row] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((row, tf))
+
+    n_docs = len(texts)
+    avgdl = float(doc_len.mean()) if n_docs else 0.0
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype="uint64")
+    rows_out, weights_out = [], []
+    for t_no, term in enumerate(terms):
+        plist = postings[term]
+        rows = np.fromiter((r for r, _ in plist), dtype="uint32", count=len(plist))
+        tf = np.fromiter((f for _, f in plist), dtype="float32", count=len(plist))
+
+        # Precompute the full BM25 contribution of the term to each document
+        idf = np.log(1.0 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+        norm = k1 * (1.0 - b + b * doc_len[rows] / max(avgdl, 1e-9))
+        rows_out.append(rows)
+        weights_out.append((idf * tf * (k1 + 1.0) / (tf + norm)).astype("float32"))
+        offsets[t_no + 1] = offsets[t_no] + len(plist)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez(
+            f,
+            terms=np.asarray(terms, dtype=str),
+            offsets=offsets,
+            rows=np.concatenate(rows_out) if rows_out else np.zeros(0, dtype="uint32"),
+            weights=np.concatenate(weights_out) if weights_out else np.zeros(0, dtype="float32"),
+            doc_len=doc_len,
+            params=np.asarray([k1, b, avgdl], dtype="float64"),
+        )
+    os.replace(tmp, path)
+    return {"documents": n_docs, "terms": len(terms), "postings": int(offsets[-1])}
+
+
+class LexicalIndex:
+    """Read-only BM25 index loaded from the file written by build_lexical_index()."""
+
+    def __init__(self, path=LEXICAL_PATH):
+        """
+        Args:
+            path (Path): .npz file written by build_lexical_index().
+        """
+        self.path = Path(path)
+        with np.load(self.path) as data:
+            self.offsets = data["offsets"]
+            self.rows = data["rows"]
+            self.weights = data["weights"]
+            self.n_docs = len(data["doc_len"])
+            terms = data["terms"]
+        self.term_ids = {str(t): i for i, t in enumerate(terms)}
+
+    def __len__(self):
+        return self.n_docs
+
+    def search(self, query, top_k=20):
+        """
+        Rank chunks by BM25 score for a query.
+
+        Args:
+            query (str): Query text.
+            top_k (int): Number of results to return.
+
+        Returns:
+            list[tuple]: (metadata row, BM25 score) pairs, best first.
+        """
+        slices = []
+        for term in set(tokenize(query)):
+            t = self.term_ids.get(term)
+            if t is not None:
+                slices.append((int(self.offsets[t]), int(self.offsets[t + 1])))
+        if not slices:
+            return []
+
+        # Sum precomputed weights per document over the query terms' postings
+        rows = np.concatenate([self.rows[s:e] for s, e in slices])
+        weights = np.concatenate([self.weights[s:e] for s, e in slices])
+        uniq, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        k = min(top_k, len(uniq))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(uniq[i]), float(scores[i])) for i in best]
+
+
+def rrf_fuse(rankings, k=60):
+    """
+    Combine ranked lists with reciprocal rank fusion: each item scores
+    sum(1 / (k + rank)) over the lists it appears in.
+
+    Args:
+        rankings (list[list]): Ranked item keys, best first.
+        k (int): Damping constant; larger values flatten the rank differences.
+
+    Returns:
+        list[tuple]: (key, fused score) pairs, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, 1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,184 @@
+# src/meta_store.py
+
+import os
+import mmap
+import json
+import numpy as np
+from pathlib import Path
+
+
+def offsets_path(meta_path):
+    """Return the offsets file that belongs to a metadata JSONL file."""
+    meta_path = Path(meta_path)
+    return meta_path.with_name(meta_path.stem + ".offsets.npy")
+
+
+def ids_path(meta_path):
+    """Return the sorted FAISS id -> row mapping file for a metadata JSONL file."""
+    meta_path = Path(meta_path)
+    return meta_path.with_name(meta_path.stem + ".ids.npy")
+
+
+def write_meta_store(metas, meta_path, ids=None):
+    """
+    Write chunk metadata as JSONL plus a byte-offset index.
+
+    Args:
+        metas (iterable[dict]): Metadata records, one per row.
+        meta_path (str | Path): Output JSONL path; offsets go next to it.
+        ids (np.ndarray | None): FAISS id of each row. When omitted, FAISS
+            returns row numbers and no id mapping is written.
+
+    Returns:
+        int: Number of records written.
+    """
+    meta_path = Path(meta_path)
+
+    # Write every file under a temporary name and swap it in with os.replace, so a
+    # serving process that has the old files memory-mapped keeps reading intact data
+    tmp = meta_path.with_name(meta_path.name + ".tmp")
+    offsets = [0]
+    with open(tmp, "wb") as f:
+        for m in metas:
+            line = (json.dumps(m, ensure_ascii=False) + "\n").encode("utf-8")
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    _save_npy(offsets_path(meta_path), np.asarray(offsets, dtype="uint64"))
+
+    # Sorted (id, row) pairs so readers can binary-search a FAISS id
+    if ids is not None:
+        ids = np.asarray(ids, dtype="int64")
+        order = np.argsort(ids, kind="stable")
+        _save_npy(ids_path(meta_path), np.stack([ids[order], order.astype("int64")]))
+    elif ids_path(meta_path).exists():
+        ids_path(meta_path).unlink()
+    os.replace(tmp, meta_path)
+    return len(offsets) - 1
+
+
+def _save_npy(path, arr):
+    """Save an array atomically (temporary file, then rename)."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def scan_offsets(buf):
+    """
+    Compute line offsets of a JSONL buffer without parsing any JSON.
+    Used for metadata files written before the offsets file existed.
+
+    Args:
+        buf (bytes | mmap.mmap): File contents.
+
+    Returns:
+        np.ndarray: uint64 offsets with one entry per line plus the end offset.
+    """
+    offsets = [0]
+    pos = buf.find(b"\n")
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = buf.find(b"\n", pos + 1)
+    if offsets[-1] != len(buf):
+        offsets.append(len(buf))  # last line without a trailing newline
+    return np.asarray(offsets, dtype="uint64")
+
+
+class MetaStore:
+    """
+    Read-only chunk metadata keyed by FAISS row (or stable id, see get_by_label).
+
+    The JSONL file and its offsets are memory-mapped, so startup parses
+    nothing, only the requested rows are decoded, and every worker process
+    shares the same pages through the OS page cache.
+    """
+
+    def __init__(self, meta_path):
+        """
+        Args:
+            meta_path (str | Path): JSONL metadata file written by build_index.py.
+        """
+        self.meta_path = Path(meta_path)
+        self._file = open(self.meta_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        off_path = offsets_path(self.meta_path)
+        if off_path.exists() and off_path.stat().st_mtime >= self.meta_path.stat().st_mtime:
+            self._offsets = np.load(off_path, mmap_mode="r")
+        else:
+            self._offsets = scan_offsets(self._buf)
+
+        # Optional id -> row mapping for indexes built with stable ids
+        id_file = ids_path(self.meta_path)
+        self._ids = np.load(id_file, mmap_mode="r") if id_file.exists() else None
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        """
+        Decode a single metadata record.
+
+        Args:
+            row (int): FAISS row id.
+
+        Returns:
+            dict: The chunk's metadata.
+        """
+        row = int(row)
+        if row < 0 or row >= len(self):
+            raise IndexError(row)
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._buf[start:end])
+
+    def row_for_label(self, label):
+        """
+        Map a label returned by FAISS to a metadata row.
+
+        Args:
+            label (int): FAISS search result label.
+
+        Returns:
+            int | None: Row number, or None if the label is unknown.
+        """
+        label = int(label)
+        if self._ids is None:
+            return label if 0 <= label < len(self) else None
+        sorted_ids = self._ids[0]
+        pos = int(np.searchsorted(sorted_ids, label))
+        if pos < len(sorted_ids) and int(sorted_ids[pos]) == label:
+            return int(self._ids[1][pos])
+        return None
+
+    def get_by_label(self, label):
+        """
+        Decode the metadata record for a FAISS search result label.
+
+        Args:
+            label (int): FAISS search result label (-1 for empty slots).
+
+        Returns:
+            dict | None: Metadata record, or None if the label is unknown.
+        """
+        row = self.row_for_label(label)
+        return self[row] if row is not None else None
+
+    def get_many(self, rows):
+        """
+        Decode several metadata records.
+
+        Args:
+            rows (iterable[int]): FAISS row ids.
+
+        Returns:
+            list[dict]: Metadata records in the same order.
+        """
+        return [self[r] for r in rows]
+
+    def close(self):
+        """Release the memory map and file handle."""
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
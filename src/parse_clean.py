@@ -1,9 +1,12 @@
-import json, glob
+import json, glob, hashlib
 from pathlib import Path
 
 # Define output path for the cleaned knowledge base file
 OUT = Path("data/kb.jsonl")
 
+# Raw scraped files written by scrape.py
+RAW_GLOB = "data/raw/*.json"
+
 # Ensure the output directory exists
 OUT.parent.mkdir(parents=True, exist_ok=True)
 
@@ -21,32 +24,60 @@ def simple_clean(text):
     lines = [l.strip() for l in text.splitlines() if l.strip()]
     return "\n".join(lines)
 
+def doc_id_for(url, n):
+    """
+    Derive a document id from the page URL, so a page keeps its id (and its
+    chunks their FAISS ids) when other pages are added or removed.
+    
+    Args:
+        url (str | None): Source URL of the page.
+        n (int): Document number, used only for records without a URL.
+    
+    Returns:
+        str: Document id such as "doc_3f9a1c2b7d4e".
+    """
+    if not url:
+        return f"doc_{n}"
+    return "doc_" + hashlib.sha1(url.strip().rstrip("/").encode("utf-8")).hexdigest()[:12]
+
+def clean_document(raw, n):
+    """
+    Turn a raw scraped record into a standardized knowledge-base document.
+    
+    Args:
+        raw (dict): Record written by scrape.py.
+        n (int): Document number, used for the id of records without a URL.
+    
+    Returns:
+        dict: Cleaned document record.
+    """
+    # Clean the 'raw_text' field
+    text = simple_clean(raw.get("raw_text", ""))
+    
+    # Build a standardized record for each document
+    return {
+        "id": doc_id_for(raw.get("url"), n),
+        "title": (text.splitlines()[0] if text else ""),  # Use first line as title
+        "text": text,
+        "source_url": raw.get("url"),
+        "fetched_at": raw.get("fetched_at")
+    }
+
 def main():
     """
     Read raw JSON files from 'data/raw', clean their text,
     and combine them into a single JSONL knowledge base file.
     """
-    # Find all JSON files in data/raw directory
-    files = glob.glob("data/raw/*.json")
+    # Find all JSON files in data/raw directory (sorted so the output order is stable)
+    files = sorted(glob.glob(RAW_GLOB))
     cnt = 0  # Counter for processed documents
 
     # Open the output JSONL file for writing
     with open(OUT, "w", encoding="utf-8") as outf:
         for f in files:
-            # Load each raw JSON document
+            # Load each raw JSON document and build a cleaned record
             j = json.load(open(f, encoding="utf-8"))
-            
-            # Clean the 'raw_text' field
-            text = simple_clean(j.get("raw_text", ""))
-            
-            # Build a standardized record for each document
-            rec = {
-                "id": f"doc_{cnt}",
-                "title": (text.splitlines()[0] if text else ""),  # Use first line as title
-                "text": text,
-                "source_url": j.get("url"),
-                "fetched_at": j.get("fetched_at")
-            }
+            rec = clean_document(j, cnt)
 
             # Write record as a single JSON line
             outf.write(json.dumps(rec, ensure_ascii=False) + "\n")
@@ -0,0 +1,400 @@
+# src/pipeline.py
+
+import os
+import json
+import glob
+import time
+import queue
+import argparse
+import threading
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from . import build_index
+    from .parse_clean import RAW_GLOB, clean_document
+    from .chunk import chunk_document
+    from .embed import (
+        EMBED_BATCH_SIZE, OPENAI_KEY, OUT as EMBED_OUT, bulk_embedder, embed_local,
+        fill_missing, lookup_cached, print_openai_stats, select_embedder,
+    )
+    from .embedding_store import EmbeddingCache, EmbeddingStoreWriter
+except ImportError:  # executed as a script: python src/pipeline.py
+    import build_index
+    from parse_clean import RAW_GLOB, clean_document
+    from chunk import chunk_document
+    from embed import (
+        EMBED_BATCH_SIZE, OPENAI_KEY, OUT as EMBED_OUT, bulk_embedder, embed_local,
+        fill_missing, lookup_cached, print_openai_stats, select_embedder,
+    )
+    from embedding_store import EmbeddingCache, EmbeddingStoreWriter
+
+# Capacity of the queue between two stages; bounds memory use
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+
+# Worker processes for CPU-bound stages
+CHUNK_WORKERS = int(os.getenv("PIPELINE_CHUNK_WORKERS", str(os.cpu_count() or 1)))
+EMBED_WORKERS = int(os.getenv("PIPELINE_EMBED_WORKERS", "1"))
+
+# Sentinel marking the end of a stage's output
+_DONE = object()
+
+
+class StageStats:
+    """Throughput and wait-time counters for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.wait_in = 0.0    # time spent waiting for the upstream stage
+        self.wait_out = 0.0   # time spent blocked on a full downstream queue
+        self.started = None
+        self.finished = None
+
+    def report(self):
+        """
+        Summarize the stage's counters.
+
+        Returns:
+            dict: Items, throughput, waiting and busy time.
+        """
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "seconds": round(elapsed, 3),
+            "items_per_second": round(self.items_out / elapsed, 1) if elapsed > 0 else None,
+            "wait_upstream_seconds": round(self.wait_in, 3),
+            "wait_downstream_seconds": round(self.wait_out, 3),
+            "busy_seconds": round(max(0.0, elapsed - self.wait_in - self.wait_out), 3),
+        }
+
+
+class _StageError:
+    """Wraps an exception raised inside a stage thread so the consumer can re-raise it."""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _timed(iterable, stats):
+    """Iterate upstream output, recording how long each item took to arrive."""
+    it = iter(iterable)
+    while True:
+        t = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        stats.wait_in += time.perf_counter() - t
+        stats.items_in += 1
+        yield item
+
+
+def run_stage(name, fn, source, all_stats, maxsize=QUEUE_SIZE):
+    """
+    Run a generator stage in its own thread, feeding a bounded output queue.
+
+    Args:
+        name (str): Stage name for reporting.
+        fn (callable): Generator function taking an iterator of inputs and yielding outputs.
+        source (iterable): Upstream items.
+        all_stats (list[StageStats]): Collects this stage's statistics.
+        maxsize (int): Output queue capacity.
+
+    Returns:
+        iterator: Items produced by the stage, in order.
+    """
+    stats = StageStats(name)
+    all_stats.append(stats)
+    q = queue.Queue(maxsize)
+
+    def worker():
+        stats.started = time.perf_counter()
+        try:
+            for out in fn(_timed(source, stats)):
+                t = time.perf_counter()
+                q.put(out)
+                stats.wait_out += time.perf_counter() - t
+                stats.items_out += 1
+        except BaseException as e:
+            q.put(_StageError(e))
+        finally:
+            stats.finished = time.perf_counter()
+            q.put(_DONE)
+
+    threading.Thread(target=worker, name=f"stage-{name}", daemon=True).start()
+
+    def drain():
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.exc
+            yield item
+
+    return drain()
+
+
+def ordered_pool_map(pool, fn, items, max_inflight):
+    """
+    Map fn over items in a process pool, keeping at most max_inflight tasks
+    queued and yielding results in input order.
+
+    Args:
+        pool (concurrent.futures.Executor | None): Executor, or None to run inline.
+        fn (callable): Picklable function.
+        items (iterable): Inputs.
+        max_inflight (int): Maximum submitted but unconsumed tasks.
+
+    Yields:
+        Results of fn, in input order.
+    """
+    if pool is None:
+        for item in items:
+            yield fn(item)
+        return
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max_inflight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def read_raw(paths):
+    """Stage source: yield raw scraped records from data/raw."""
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            yield json.load(f)
+
+
+def clean_stage(raws):
+    """Stage: turn raw records into knowledge-base documents."""
+    for n, raw in enumerate(raws):
+        yield clean_document(raw, n)
+
+
+def make_chunk_stage(pool, max_inflight):
+    """Stage factory: split documents into chunks across the process pool."""
+    def chunk_stage(docs):
+        for chunks in ordered_pool_map(pool, chunk_document, docs, max_inflight):
+            yield from chunks
+    return chunk_stage
+
+
+def batch_stage(batch_size):
+    """Stage factory: group chunk records into embedding batches."""
+    def stage(chunks):
+        batch = []
+        for c in chunks:
+            batch.append(c)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    return stage
+
+
+def make_embed_stage(embed_fn, model, cache, submit, max_inflight, counts):
+    """
+    Stage factory: look up cached vectors and embed the rest.
+    Misses go to `submit` (texts -> future) when given, so up to max_inflight
+    batches are embedded at once: in the process pool for local encoding, or
+    on the bulk runner's shared client and semaphore for OpenAI.
+    """
+    def embed_stage(batches):
+        pending = deque()
+
+        def finish(entry):
+            recs, vecs, missing, fut = entry
+            embs = fut.result() if fut is not None else None
+            counts["reused"] += len(recs) - len(missing)
+            counts["embedded"] += len(missing)
+            return fill_missing(vecs, missing, embs), recs
+
+        for recs in batches:
+            vecs, missing = lookup_cached(recs, model, cache)
+            texts = [recs[i]["text"] for i in missing]
+            fut = None
+            if missing:
+                if submit is not None:
+                    fut = submit(texts)
+                else:
+                    fut = _Immediate(embed_fn(texts))
+            pending.append((recs, vecs, missing, fut))
+            if len(pending) >= max_inflight:
+                yield finish(pending.popleft())
+        while pending:
+            yield finish(pending.popleft())
+
+    return embed_stage
+
+
+class _Immediate:
+    """Future-like wrapper for a value computed inline."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+class DebugWriter:
+    """Optionally tee stage output into JSONL files for inspection."""
+
+    def __init__(self, debug_dir, name):
+        self.f = None
+        if debug_dir:
+            Path(debug_dir).mkdir(parents=True, exist_ok=True)
+            self.f = open(Path(debug_dir) / name, "w", encoding="utf-8")
+
+    def tee(self, items):
+        for item in items:
+            if self.f:
+                self.f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            yield item
+
+    def close(self):
+        if self.f:
+            self.f.close()
+
+
+def run_pipeline(raw_glob=RAW_GLOB, debug_dir=None, chunk_workers=CHUNK_WORKERS,
+                 embed_workers=EMBED_WORKERS, batch_size=EMBED_BATCH_SIZE, index_args=(), faq_args=None):
+    """
+    Stream raw documents through cleaning, chunking and embedding into the
+    embedding store, build the FAISS index, then precompute the FAQ answers.
+
+    Args:
+        raw_glob (str): Glob for raw scraped files.
+        debug_dir (str | None): If set, write kb.jsonl and chunks.jsonl there.
+        chunk_workers (int): Processes for chunking (1 = inline).
+        embed_workers (int): Processes for local encoding (1 = inline; ignored for OpenAI).
+        batch_size (int): Chunks per embedding batch.
+        index_args (list[str]): Extra arguments for build_index.main().
+        faq_args (list[str] | None): Arguments for faq_precompute.main(), or None to skip it.
+
+    Returns:
+        list[dict]: Per-stage reports.
+    """
+    paths = sorted(glob.glob(raw_glob))
+    embed_fn, model = select_embedder()
+    cache = EmbeddingCache(EMBED_OUT)
+    counts = {"reused": 0, "embedded": 0}
+    all_stats = []
+
+    chunk_pool = ProcessPoolExecutor(chunk_workers) if chunk_workers > 1 else None
+    embed_pool = ProcessPoolExecutor(embed_workers) if embed_workers > 1 and not OPENAI_KEY else None
+    if OPENAI_KEY:
+        submit, embed_inflight = bulk_embedder.submit, max(2, bulk_embedder.concurrency)
+    elif embed_pool is not None:
+        submit, embed_inflight = (lambda texts: embed_pool.submit(embed_local, texts)), max(2, embed_workers)
+    else:
+        submit, embed_inflight = None, 2
+    kb_debug = DebugWriter(debug_dir, "kb.jsonl")
+    chunk_debug = DebugWriter(debug_dir, "chunks.jsonl")
+    try:
+        # Wire the stages together; each runs in its own thread behind a bounded queue
+        docs = run_stage("read", read_raw, paths, all_stats)
+        docs = run_stage("clean", lambda it: kb_debug.tee(clean_stage(it)), docs, all_stats)
+        chunks = run_stage("chunk", make_chunk_stage(chunk_pool, 2 * chunk_workers), docs, all_stats)
+        batches = run_stage("batch", lambda it: batch_stage(batch_size)(chunk_debug.tee(it)), chunks, all_stats)
+        embedded = run_stage(
+            "embed",
+            make_embed_stage(embed_fn, model, cache, submit, embed_inflight, counts),
+            batches,
+            all_stats,
+        )
+
+        # Sink: append each batch to the embedding store as soon as it is ready
+        write_stats = StageStats("write")
+        all_stats.append(write_stats)
+        write_stats.started = time.perf_counter()
+        with EmbeddingStoreWriter(EMBED_OUT, model=model, normalized=True) as writer:
+            for vecs, recs in _timed(embedded, write_stats):
+                writer.append(vecs, recs)
+                write_stats.items_out += len(recs)
+        write_stats.finished = time.perf_counter()
+    finally:
+        kb_debug.close()
+        chunk_debug.close()
+        for pool in (chunk_pool, embed_pool):
+            if pool is not None:
+                pool.shutdown()
+        if OPENAI_KEY:
+            bulk_embedder.close()
+
+    if OPENAI_KEY:
+        print_openai_stats()
+        bulk_embedder.clear_checkpoints()
+    print(f"Chunks reused: {counts['reused']}, embedded: {counts['embedded']}, deleted: {cache.unused()}")
+
+    # The index needs every vector (IVF training), so it is built once the store is complete
+    index_stats = StageStats("index")
+    index_stats.started = time.perf_counter()
+    build_index.main(list(index_args))
+    index_stats.finished = time.perf_counter()
+    index_stats.items_out = writer.count
+    all_stats.append(index_stats)
+
+    # Answer the top FAQs against the new index; unchanged snippets reuse last run's answers
+    if faq_args is not None:
+        try:
+            from . import faq_precompute
+        except ImportError:
+            import faq_precompute
+        faq_stats = StageStats("faqs")
+        faq_stats.started = time.perf_counter()
+        faq_counts = faq_precompute.main(list(faq_args)) or {}
+        faq_stats.finished = time.perf_counter()
+        faq_stats.items_in = faq_counts.get("questions", 0)
+        faq_stats.items_out = faq_counts.get("reused", 0) + faq_counts.get("generated", 0)
+        all_stats.append(faq_stats)
+
+    return [s.report() for s in all_stats]
+
+
+def main(argv=None):
+    """
+    Single entry point replacing parse_clean -> chunk -> embed -> build_index -> faq_precompute:
+        python src/pipeline.py [--debug-dir data/debug] [--skip-faqs] [-- --index-type hnsw]
+    """
+    parser = argparse.ArgumentParser(description="Run the clean/chunk/embed/index pipeline.")
+    parser.add_argument("--raw-glob", default=RAW_GLOB)
+    parser.add_argument("--debug-dir", help="Write intermediate kb.jsonl / chunks.jsonl here")
+    parser.add_argument("--chunk-workers", type=int, default=CHUNK_WORKERS)
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--skip-faqs", action="store_true", help="Do not precompute FAQ answers")
+    parser.add_argument("--faq-top-queries", type=int,
+                        help="Also precompute this many frequent recent questions (see faq_precompute.py)")
+    parser.add_argument("index_args", nargs=argparse.REMAINDER,
+                        help="Arguments passed to build_index.py after --")
+    args = parser.parse_args(argv)
+    index_args = [a for a in args.index_args if a != "--"]
+    faq_args = None
+    if not args.skip_faqs:
+        faq_args = [] if args.faq_top_queries is None else ["--top-queries", str(args.faq_top_queries)]
+
+    reports = run_pipeline(
+        args.raw_glob, args.debug_dir, args.chunk_workers, args.embed_workers, args.batch_size, index_args,
+        faq_args,
+    )
+
+    # Print per-stage throughput and waiting time
+    print("\n--- Pipeline stages ---")
+    for r in reports:
+        print(json.dumps(r))
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# src/prompt_assembler.py
+
+import os
+import re
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+try:
+    from .chunk import get_token_encoding
+except ImportError:  # executed as a script: python src/<file>.py
+    from chunk import get_token_encoding
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Token budget for the context snippets (the instructions and question come on top)
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "1200"))
+
+# A snippet is a near-duplicate when this share of its word shingles already appears in the prompt
+PROMPT_DEDUP_THRESHOLD = float(os.getenv("PROMPT_DEDUP_THRESHOLD", "0.8"))
+SHINGLE_SIZE = 5
+
+# Shortest repeated text worth trimming between neighbouring chunks
+MIN_OVERLAP_CHARS = 20
+
+_CHUNK_NO = re.compile(r"_c(\d+)$")
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Return the set of word n-grams of a text, used for near-duplicate detection.
+
+    Args:
+        text (str): Snippet text.
+        size (int): Words per shingle.
+
+    Returns:
+        set[tuple]: Word shingles (a single shingle for texts shorter than size).
+    """
+    words = text.lower().split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def chunk_number(chunk_id):
+    """Return the position of a chunk within its document, parsed from ids like doc_3_c7."""
+    m = _CHUNK_NO.search(chunk_id or "")
+    return int(m.group(1)) if m else None
+
+
+def trim_overlap(first, second):
+    """
+    Remove from second the text that repeats the end of first, as produced by
+    chunk overlap between consecutive chunks of a document.
+
+    Args:
+        first (str): Text of the earlier chunk.
+        second (str): Text of the following chunk.
+
+    Returns:
+        str: second without its repeated prefix (unchanged if nothing repeats).
+    """
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return second
+    pos = first.find(probe)
+    while pos != -1:
+        tail = first[pos:]
+        if second.startswith(tail):
+            return second[len(tail):].lstrip()
+        pos = first.find(probe, pos + 1)
+    return second
+
+
+def trim_overlap_suffix(first, second):
+    """
+    Remove from first the text that repeats the start of second
+    (the earlier chunk ranked below the later one).
+
+    Args:
+        first (str): Text of the earlier chunk.
+        second (str): Text of the following chunk.
+
+    Returns:
+        str: first without its repeated suffix.
+    """
+    trimmed = trim_overlap(first, second)
+    if trimmed is second:
+        return first
+    overlap = len(second) - len(trimmed)
+    return first[: len(first) - len(second[:overlap].rstrip())].rstrip()
+
+
+class PromptStats:
+    """Recent per-request prompt sizes, for the /stats/prompt route."""
+
+    def __init__(self, maxlen=1000):
+        self.recent = deque(maxlen=maxlen)
+        self.lock = threading.Lock()
+
+    def record(self, report):
+        with self.lock:
+            self.recent.append(report)
+
+    def stats(self):
+        """
+        Summarize recent prompt sizes.
+
+        Returns:
+            dict: Request count, p50/max prompt tokens and the latest reports.
+        """
+        with self.lock:
+            reports = list(self.recent)
+        tokens = sorted(r["prompt_tokens"] for r in reports)
+        return {
+            "requests": len(reports),
+            "context_budget_tokens": PROMPT_CONTEXT_TOKENS,
+            "p50_prompt_tokens": tokens[len(tokens) // 2] if tokens else None,
+            "max_prompt_tokens": tokens[-1] if tokens else None,
+            "recent": reports[-20:],
+        }
+
+
+# Shared collector for the app
+prompt_stats = PromptStats()
+
+
+def select_snippets(retrieved, budget=PROMPT_CONTEXT_TOKENS, threshold=PROMPT_DEDUP_THRESHOLD,
+                    header_fn=None):
+    """
+    Pick the snippets for a prompt in relevance order: drop near-duplicates,
+    trim text repeated from a neighbouring chunk already chosen, and stop
+    adding snippets once the token budget is used up.
+
+    Args:
+        retrieved (list[dict]): Retrieved chunks, most relevant first.
+        budget (int): Token budget for snippet text and headers.
+        threshold (float): Shingle containment at which a snippet counts as a duplicate.
+        header_fn (callable | None): Maps (position, snippet) to the header line
+            build_prompt() puts above it, so headers are counted too.
+
+    Returns:
+        tuple: (selected snippet dicts, report dict with token counts and drop reasons)
+    """
+    encoding = get_token_encoding()
+    selected, seen_shingles = [], []
+    context_tokens = duplicates = trimmed = 0
+    over_budget = []
+
+    for r in retrieved:
+        text = r.get("text") or ""
+
+        # Near-duplicate of something already in the prompt
+        sh = shingles(text)
+        if any(len(sh & prev) / len(sh) >= threshold for prev in seen_shingles):
+            duplicates += 1
+            continue
+
+        # Neighbouring chunk of a chosen one: keep only the text it does not repeat
+        no = chunk_number(r.get("chunk_id"))
+        for s in selected:
+            if no is None or s.get("doc_id") != r.get("doc_id"):
+                continue
+            s_no = chunk_number(s.get("chunk_id"))
+            if s_no == no - 1:
+                text = trim_overlap(s["text"], text)
+            elif s_no == no + 1:
+                text = trim_overlap_suffix(text, s["text"])
+        if not text:
+            duplicates += 1
+            continue
+
+        # Chunk token counts come from the metadata unless the text was trimmed
+        if text == r.get("text") and r.get("n_tokens") is not None:
+            n_tokens = r["n_tokens"]
+        else:
+            n_tokens = len(encoding.encode_ordinary(text))
+            trimmed += text != r.get("text")
+        snippet = dict(r, text=text, n_tokens=n_tokens)
+        if header_fn is not None:
+            n_tokens += len(encoding.encode_ordinary(header_fn(len(selected) + 1, snippet)))
+
+        # Fill the budget by relevance; a smaller, less relevant snippet may still fit
+        if context_tokens + n_tokens > budget:
+            over_budget.append(r.get("chunk_id"))
+            continue
+        selected.append(snippet)
+        seen_shingles.append(sh)
+        context_tokens += n_tokens
+
+    report = {
+        "snippets": [s.get("chunk_id") for s in selected],
+        "context_tokens": context_tokens,
+        "duplicates_removed": duplicates,
+        "overlaps_trimmed": trimmed,
+        "over_budget": over_budget,
+    }
+    return selected, report
+
+
+def count_tokens(text):
+    """Count tokens of a text with the same encoding used for chunk budgets."""
+    return len(get_token_encoding().encode_ordinary(text))
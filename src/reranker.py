@@ -0,0 +1,247 @@
+# src/reranker.py
+
+import os
+import time
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Cross-encoder reranking settings (off by default)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))     # hits fetched from the index for reranking
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))    # skip reranking if predicted to take longer
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))    # tokens per (question, snippet) pair
+RERANK_PROBE_SECONDS = float(os.getenv("RERANK_PROBE_SECONDS", "30"))  # re-measure an over-budget estimate this often
+
+# Weight of the newest measurement in the latency estimate
+EWMA_ALPHA = 0.2
+
+
+class CrossEncoderReranker:
+    """
+    Process-wide wrapper around a sentence-transformers CrossEncoder.
+
+    The model is loaded once and scores (question, snippet) pairs in batches on
+    CPU. Per-pair latency is tracked as an exponentially weighted moving
+    average, so a request whose rerank is predicted to exceed the latency
+    budget keeps the retrieval order instead. While over budget, one request
+    every `probe_seconds` is reranked anyway to re-measure, so a slow early
+    measurement (e.g. during startup) does not disable reranking for good.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, budget_ms=RERANK_BUDGET_MS,
+                 batch_size=RERANK_BATCH_SIZE, max_length=RERANK_MAX_LENGTH,
+                 probe_seconds=RERANK_PROBE_SECONDS):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.probe_seconds = probe_seconds
+        self._model = None
+        self._lock = threading.Lock()
+        self._loading = False
+        self._last_measured = 0.0
+        self._load_failed_at = None
+        self.load_error = None
+
+        # Latency model: fixed cost per call plus cost per pair
+        self.call_overhead_ms = None
+        self.per_pair_ms = None
+
+        # Statistics
+        self.load_seconds = None
+        self.calls = 0
+        self.reranked = 0
+        self.fallbacks = {}
+        self.timings = deque(maxlen=1000)
+
+    @property
+    def loaded(self):
+        """Return True once the underlying model has been loaded."""
+        return self._model is not None
+
+    def _load(self):
+        """Load the CrossEncoder if it is not loaded yet (once, under a lock)."""
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                start = time.perf_counter()
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+                self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def warmup(self):
+        """
+        Load the model and calibrate the latency estimate with one small
+        and one full-size batch.
+
+        Returns:
+            dict: Current reranker statistics.
+        """
+        model = self._load()
+        pairs = [("warmup question", "warmup snippet " * 40)] * RERANK_CANDIDATES
+        small = self._timed_predict(model, pairs[:1])
+        large = self._timed_predict(model, pairs)
+        self.per_pair_ms = max(0.0, (large - small) / max(1, len(pairs) - 1))
+        self.call_overhead_ms = max(0.0, small - self.per_pair_ms)
+        self._last_measured = time.monotonic()
+        return self.stats()
+
+    def warmup_in_background(self):
+        """
+        Start warmup() in a daemon thread unless it is already running. After
+        a failed load, it is retried no sooner than probe_seconds later.
+        """
+        with self._lock:
+            if self._loading or self._model is not None:
+                return
+            if self._load_failed_at is not None and time.monotonic() - self._load_failed_at < self.probe_seconds:
+                return
+            self._loading = True
+
+        def run():
+            try:
+                self.warmup()
+                self._load_failed_at, self.load_error = None, None
+            except Exception as e:
+                self._load_failed_at, self.load_error = time.monotonic(), f"{type(e).__name__}: {e}"
+                print("Reranker load failed:", self.load_error)
+            finally:
+                self._loading = False
+
+        threading.Thread(target=run, name="rerank-load", daemon=True).start()
+
+    def _timed_predict(self, model, pairs):
+        """Score pairs and return the elapsed milliseconds."""
+        start = time.perf_counter()
+        model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return (time.perf_counter() - start) * 1000
+
+    def predicted_ms(self, n_pairs):
+        """
+        Estimate how long scoring n_pairs would take.
+
+        Args:
+            n_pairs (int): Number of (question, snippet) pairs.
+
+        Returns:
+            float | None: Milliseconds, or None before the first measurement.
+        """
+        if self.per_pair_ms is None:
+            return None
+        return (self.call_overhead_ms or 0.0) + self.per_pair_ms * n_pairs
+
+    def _observe(self, n_pairs, elapsed_ms):
+        """Fold a measured call into the per-pair latency estimate."""
+        per_pair = max(0.0, elapsed_ms - (self.call_overhead_ms or 0.0)) / max(1, n_pairs)
+        if self.per_pair_ms is None:
+            self.per_pair_ms = per_pair
+        else:
+            self.per_pair_ms = (1 - EWMA_ALPHA) * self.per_pair_ms + EWMA_ALPHA * per_pair
+        self._last_measured = time.monotonic()
+
+    def _fallback(self, candidates, top_k, reason, predicted=None):
+        """Keep retrieval order and record why reranking was skipped."""
+        self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+        return candidates[:top_k], {"reranked": False, "reason": reason, "predicted_ms": predicted, "rerank_ms": 0.0}
+
+    def rerank(self, question, candidates, top_k=5):
+        """
+        Reorder retrieved chunks by cross-encoder relevance to the question.
+
+        Args:
+            question (str): The user question.
+            candidates (list[dict]): Retrieved chunks in retrieval order.
+            top_k (int): Number of chunks to keep.
+
+        Returns:
+            tuple: (top_k chunks, info dict with "reranked", "rerank_ms" and the predicted time)
+        """
+        self.calls += 1
+        if len(candidates) <= 1:
+            return self._fallback(candidates, top_k, "too_few_candidates")
+
+        # Never block a request on model loading; load in the background and skip for now
+        if not self.loaded:
+            self.warmup_in_background()
+            return self._fallback(candidates, top_k, "loading")
+
+        # Over budget: keep retrieval order, except for a periodic probe that refreshes the estimate
+        predicted = self.predicted_ms(len(candidates))
+        probe = False
+        if predicted is not None and predicted > self.budget_ms:
+            with self._lock:
+                probe = time.monotonic() - self._last_measured >= self.probe_seconds
+                if probe:
+                    self._last_measured = time.monotonic()  # one probe at a time
+            if not probe:
+                return self._fallback(candidates, top_k, "over_budget", predicted)
+
+        # Score all pairs in batches on CPU
+        start = time.perf_counter()
+        scores = self._model.predict(
+            [(question, c.get("text") or "") for c in candidates],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._observe(len(candidates), elapsed_ms)
+        self.reranked += 1
+        self.timings.append(elapsed_ms)
+
+        order = sorted(range(len(candidates)), key=lambda i: float(scores[i]), reverse=True)
+        results = [{**candidates[i], "rerank_score": float(scores[i])} for i in order[:top_k]]
+        return results, {"reranked": True, "probe": probe, "predicted_ms": predicted, "rerank_ms": elapsed_ms}
+
+    def stats(self):
+        """
+        Return load time, rerank latency and fallback counters.
+
+        Returns:
+            dict: Reranker statistics.
+        """
+        timings = sorted(self.timings)
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "loading": self._loading,
+            "load_error": self.load_error,
+            "load_seconds": self.load_seconds,
+            "budget_ms": self.budget_ms,
+            "calls": self.calls,
+            "reranked": self.reranked,
+            "fallbacks": dict(self.fallbacks),
+            "per_pair_ms": self.per_pair_ms,
+            "p50_rerank_ms": timings[len(timings) // 2] if timings else None,
+            "p95_rerank_ms": timings[int(len(timings) * 0.95)] if timings else None,
+        }
+
+
+# Single reranker instance shared by the whole process
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """
+    Return the process-wide reranker, or None when RERANK_ENABLED is off.
+
+    Returns:
+        CrossEncoderReranker | None: The shared reranker.
+    """
+    global _reranker
+    if not RERANK_ENABLED:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = CrossEncoderReranker()
+    return _reranker
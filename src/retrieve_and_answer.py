@@ -1,33 +1,72 @@
 # src/retrieve_and_answer.py
 
+import time
+
+# Measure how long importing this module takes (reported by the app's /readyz)
+_import_started = time.perf_counter()
+
 import os
 import json
+import asyncio
+import contextvars
 import numpy as np
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+try:
+    from .embedding_engine import get_engine
+except ImportError:  # executed as a script: python src/retrieve_and_answer.py
+    from embedding_engine import get_engine
+
+try:
+    from .embed_batcher import EmbeddingBatcher
+except ImportError:
+    from embed_batcher import EmbeddingBatcher
+
+try:
+    from .retriever import MIN_SCORE, HYBRID_CANDIDATES, Retriever, RetrieverNotReady
+except ImportError:
+    from retriever import MIN_SCORE, HYBRID_CANDIDATES, Retriever, RetrieverNotReady
+
+try:
+    from .answer_cache import ANSWER_CACHE_ENABLED, FAQ_ENABLED, PrecomputedAnswers, SemanticAnswerCache
+except ImportError:
+    from answer_cache import ANSWER_CACHE_ENABLED, FAQ_ENABLED, PrecomputedAnswers, SemanticAnswerCache
+
+try:
+    from .reranker import RERANK_CANDIDATES, get_reranker
+except ImportError:
+    from reranker import RERANK_CANDIDATES, get_reranker
+
+try:
+    from .prompt_assembler import count_tokens, prompt_stats, select_snippets
+except ImportError:
+    from prompt_assembler import count_tokens, prompt_stats, select_snippets
+
+try:
+    from .tracing import annotate, record_cache, record_retrieval, record_stage, record_usage, stage
+except ImportError:
+    from tracing import annotate, record_cache, record_retrieval, record_stage, record_usage, stage
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Paths to FAISS index and metadata files
-INDEX_PATH = Path("indexes/faiss.index")
-META_PATH = Path("indexes/meta.jsonl")
-
 # Load configuration from environment variables
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
 
-# Import FAISS for vector similarity search
-import faiss
+# Concurrency settings for the async answer path
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(8, os.cpu_count() or 1))))
 
-# Ensure FAISS index exists before proceeding
-if not INDEX_PATH.exists():
-    raise SystemExit(f"FAISS index not found at {INDEX_PATH}. Run build_index.py first.")
+# Answer returned without an LLM call when no chunk passes the cutoff
+NO_ANSWER = "I don't know — please check the Bank of Maharashtra website"
 
-# Load FAISS index and metadata (list of document chunks)
-index = faiss.read_index(str(INDEX_PATH))
-metas = [json.loads(l) for l in open(META_PATH, encoding="utf-8")]
+# FAISS index, metadata and BM25 index; nothing is read from disk until first use
+# (or retriever.load() / load_in_background()), and a rebuilt index can be hot-swapped in
+retriever = Retriever()
 
 # Initialize OpenAI client (if API key is available)
 openai_client = None
@@ -35,6 +74,35 @@ if OPENAI_KEY:
     from openai import OpenAI
     openai_client = OpenAI(api_key=OPENAI_KEY)
 
+# Async OpenAI client; all requests in the process share its HTTP connection pool
+async_openai_client = None
+if OPENAI_KEY:
+    import httpx
+    from openai import AsyncOpenAI
+    async_openai_client = AsyncOpenAI(
+        api_key=OPENAI_KEY,
+        timeout=OPENAI_TIMEOUT,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            ),
+            timeout=OPENAI_TIMEOUT,
+        ),
+    )
+
+# Bounded executor for CPU-bound work (FAISS search) off the event loop
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+
+# Optional cross-encoder reranker (None unless RERANK_ENABLED=1)
+reranker = get_reranker()
+
+# Semantic answer cache in front of answer_question (None when disabled)
+answer_cache = SemanticAnswerCache(version_fn=lambda: retriever.version) if ANSWER_CACHE_ENABLED else None
+
+# FAQ answers precomputed for the current index by faq_precompute.py (None when disabled)
+faq_answers = PrecomputedAnswers(version_fn=lambda: retriever.version) if FAQ_ENABLED else None
+
 
 def embed_query_openai(text):
     """
@@ -54,8 +122,9 @@ def embed_query_openai(text):
 
 def embed_query_local(text):
     """
-    Create an embedding vector for a query using a local model (SentenceTransformer).
-    Used as a fallback when no OpenAI key is set.
+    Create an embedding vector for a query using the shared local embedding engine.
+    Used as a fallback when no OpenAI key is set. The model is loaded once per
+    process and reused for every query.
     
     Args:
         text (str): The query text.
@@ -63,13 +132,239 @@ def embed_query_local(text):
     Returns:
         np.ndarray: 1D NumPy array representing the query embedding.
     """
-    from sentence_transformers import SentenceTransformer
-
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    emb = model.encode([text])[0].astype("float32")
+    emb = get_engine().encode([text])[0]
     return emb
 
 
+def embed_queries_openai(texts):
+    """
+    Create embedding vectors for several queries with a single OpenAI API call.
+
+    Args:
+        texts (list[str]): The query texts.
+
+    Returns:
+        np.ndarray: 2D float32 array with one row per query.
+    """
+    resp = openai_client.embeddings.create(model=EMBED_MODEL, input=texts)
+    record_usage("embedding", resp.usage)
+    # The API may return items out of order, so sort by their index
+    data = sorted(resp.data, key=lambda r: r.index)
+    return np.array([r.embedding for r in data]).astype("float32")
+
+
+def embed_queries_local(texts):
+    """
+    Create embedding vectors for several queries with one local encode call.
+
+    Args:
+        texts (list[str]): The query texts.
+
+    Returns:
+        np.ndarray: 2D float32 array with one row per query.
+    """
+    return get_engine().encode(texts)
+
+
+# Micro-batching scheduler: concurrent questions share one embedding call
+query_batcher = EmbeddingBatcher(
+    embed_queries_openai if openai_client else embed_queries_local
+)
+
+
+def embed_queries(texts, batch_size=2048):
+    """
+    Embed many queries at once, bypassing the micro-batcher (bulk question runs).
+    OpenAI accepts at most 2048 inputs per request, so larger lists are split.
+
+    Args:
+        texts (list[str]): The query texts.
+        batch_size (int): Maximum texts per embedding call.
+
+    Returns:
+        np.ndarray: 2D float32 array with one row per query.
+    """
+    embed_fn = embed_queries_openai if openai_client else embed_queries_local
+    with stage("embed"):
+        parts = [embed_fn(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    return np.concatenate(parts).astype("float32")
+
+
+def embed_query(text):
+    """
+    Embed a query through the shared micro-batching scheduler.
+
+    Args:
+        text (str): The query text.
+
+    Returns:
+        np.ndarray: 1D NumPy array representing the query embedding.
+    """
+    return query_batcher.embed(text)
+
+
+async def embed_query_async(text):
+    """
+    Embed a query through the micro-batching scheduler without blocking the event loop.
+
+    Args:
+        text (str): The query text.
+
+    Returns:
+        np.ndarray: 1D NumPy array representing the query embedding.
+    """
+    return await asyncio.wrap_future(query_batcher.submit(text))
+
+
+def lexical_search(query, top_k=HYBRID_CANDIDATES):
+    """
+    Rank chunks by BM25 for the query text.
+
+    Args:
+        query (str): The user question.
+        top_k (int): Number of hits to return.
+
+    Returns:
+        list[tuple] | None: (metadata row, BM25 score) pairs, or None when hybrid search is off.
+    """
+    return retriever.current().lexical_search(query, top_k)
+
+
+def search_index(qv, top_k=5, lexical_hits=None):
+    """
+    Retrieve chunks for a query embedding from the serving index snapshot,
+    fused with BM25 hits when given.
+
+    Args:
+        qv (np.ndarray): 1D query embedding.
+        top_k (int): Number of results to return.
+        lexical_hits (list[tuple] | None): Output of lexical_search() for the same question.
+
+    Returns:
+        list[dict]: Metadata for the top_k retrieved chunks, each with its
+        similarity "score" (or "distance" for L2 indexes) when the vector search
+        found it, plus "bm25" and "rrf" in hybrid mode.
+    """
+    return retriever.current().search(qv, top_k, lexical_hits)
+
+
+def rank_candidates(question, qv, top_k=5, lexical_hits=None):
+    """
+    Search the index and, when the reranker is enabled, over-fetch candidates
+    and reorder them with the cross-encoder within its latency budget.
+
+    Args:
+        question (str): The user question.
+        qv (np.ndarray): 1D query embedding.
+        top_k (int): Number of results to return.
+        lexical_hits (list[tuple] | None): BM25 hits to fuse with the vector results.
+
+    Returns:
+        tuple: (list of retrieved chunk dicts, rerank info dict or None)
+    """
+    if reranker is None:
+        with stage("search"):
+            retrieved = search_index(qv, top_k, lexical_hits)
+        record_retrieval(retrieved)
+        return retrieved, None
+    with stage("search"):
+        candidates = search_index(qv, max(top_k, RERANK_CANDIDATES), lexical_hits)
+    with stage("rerank"):
+        retrieved, rerank_info = reranker.rerank(question, candidates, top_k)
+    record_retrieval(retrieved)
+    annotate(reranked=rerank_info["reranked"])
+    return retrieved, rerank_info
+
+
+def rank_candidates_batch(questions, queries, top_k=5):
+    """
+    Retrieve (and rerank) chunks for many questions with a single FAISS search
+    over the query matrix. BM25 lookups run per question against the same snapshot.
+
+    Args:
+        questions (list[str]): The user questions.
+        queries (np.ndarray): Query embeddings, one row per question.
+        top_k (int): Number of results per question.
+
+    Returns:
+        list[tuple]: Per question, (list of retrieved chunk dicts, rerank info dict or None).
+    """
+    snapshot = retriever.current()
+    with stage("lexical"):
+        lexical_hits = [snapshot.lexical_search(q, HYBRID_CANDIDATES) for q in questions]
+    fetch = top_k if reranker is None else max(top_k, RERANK_CANDIDATES)
+    with stage("search"):
+        candidates = snapshot.search_batch(queries, fetch, lexical_hits)
+    if reranker is None:
+        return [(c, None) for c in candidates]
+    with stage("rerank"):
+        return [reranker.rerank(q, c, top_k) for q, c in zip(questions, candidates)]
+
+
+async def rank_candidates_async(question, qv, top_k=5, lexical_hits=None):
+    """
+    Run rank_candidates() (FAISS search and reranking) on the bounded CPU executor,
+    in a copy of the caller's context so stage timings reach the request trace.
+
+    Args:
+        question (str): The user question.
+        qv (np.ndarray): 1D query embedding.
+        top_k (int): Number of results to return.
+        lexical_hits (list[tuple] | None): BM25 hits to fuse with the vector results.
+
+    Returns:
+        tuple: (list of retrieved chunk dicts, rerank info dict or None)
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor, ctx.run, rank_candidates, question, qv, top_k, lexical_hits)
+
+
+def embed_with_lexical(query):
+    """
+    Embed a query and run the BM25 lookup while the embedding is in flight.
+
+    Args:
+        query (str): The user question.
+
+    Returns:
+        tuple: (1D query embedding, lexical hits or None)
+    """
+    started = time.perf_counter()
+    future = query_batcher.submit(query)
+    with stage("lexical"):
+        lexical_hits = lexical_search(query)
+    qv = future.result()
+    # Wall time from submission: includes waiting for the batch window and the API call
+    record_stage("embed", time.perf_counter() - started)
+    return qv, lexical_hits
+
+
+async def embed_with_lexical_async(query):
+    """
+    Async version of embed_with_lexical(); the BM25 lookup takes microseconds,
+    so it runs inline while the batcher thread embeds the query.
+
+    Args:
+        query (str): The user question.
+
+    Returns:
+        tuple: (1D query embedding, lexical hits or None)
+
+    Raises:
+        RetrieverNotReady: If the index has not finished loading; the event
+        loop never waits for it.
+    """
+    snapshot = retriever.require()
+    started = time.perf_counter()
+    future = query_batcher.submit(query)
+    with stage("lexical"):
+        lexical_hits = snapshot.lexical_search(query, HYBRID_CANDIDATES)
+    qv = await asyncio.wrap_future(future)
+    record_stage("embed", time.perf_counter() - started)
+    return qv, lexical_hits
+
+
 def retrieve(query, top_k=5):
     """
     Retrieve the top_k most relevant text chunks for a given query.
@@ -81,22 +376,47 @@ def retrieve(query, top_k=5):
     Returns:
         list[dict]: Metadata for the top_k retrieved chunks.
     """
-    # Generate embedding for the query (OpenAI or local)
-    if openai_client:
-        qv = embed_query_openai(query)
-    else:
-        qv = embed_query_local(query)
-    
-    # Perform similarity search on FAISS index
-    D, I = index.search(np.array([qv]), top_k)
-    
-    results = []
-    for idx in I[0]:
-        # Skip invalid indexes
-        if idx < 0 or idx >= len(metas):
-            continue
-        results.append(metas[idx])
-    return results
+    # Generate embedding for the query (OpenAI or local), batched with concurrent queries
+    qv, lexical_hits = embed_with_lexical(query)
+    return rank_candidates(query, qv, top_k, lexical_hits)[0]
+
+
+async def retrieve_async(query, top_k=5):
+    """
+    Async version of retrieve(). The embedding runs on the batcher thread and
+    the FAISS search on the bounded CPU executor, so the event loop never blocks.
+
+    Args:
+        query (str): The user question or search text.
+        top_k (int): Number of most similar results to return.
+
+    Returns:
+        list[dict]: Metadata for the top_k retrieved chunks.
+    """
+    qv, lexical_hits = await embed_with_lexical_async(query)
+    return (await rank_candidates_async(query, qv, top_k, lexical_hits))[0]
+
+
+async def search_index_async(qv, top_k=5, lexical_hits=None):
+    """
+    Run search_index() on the bounded CPU executor.
+
+    Args:
+        qv (np.ndarray): 1D query embedding.
+        top_k (int): Number of most similar results to return.
+        lexical_hits (list[tuple] | None): BM25 hits to fuse with the vector results.
+
+    Returns:
+        list[dict]: Metadata for the top_k retrieved chunks.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor, ctx.run, search_index, qv, top_k, lexical_hits)
+
+
+def snippet_header(i, r):
+    """Header line placed above snippet number i in the prompt."""
+    return f"[SNIPPET {i}] (source: {r.get('source_url')}, fetched_at: {r.get('fetched_at', 'unknown')})\n"
 
 
 def build_prompt(question, retrieved):
@@ -113,9 +433,7 @@ def build_prompt(question, retrieved):
     """
     snippets = []
     for i, r in enumerate(retrieved, 1):
-        snippets.append(
-            f"[SNIPPET {i}] (source: {r.get('source_url')}, fetched_at: {r.get('fetched_at', 'unknown')})\n{r.get('text')}"
-        )
+        snippets.append(snippet_header(i, r) + f"{r.get('text')}")
     # Join all snippets with double newlines
     context = "\n\n".join(snippets) if snippets else "No context available."
 
@@ -134,6 +452,26 @@ Answer concisely (2-4 sentences). For each factual claim, include the source URL
     return prompt
 
 
+def assemble_prompt(question, retrieved):
+    """
+    Build the prompt from deduplicated snippets that fit the context token budget.
+
+    Args:
+        question (str): The user's question.
+        retrieved (list[dict]): Retrieved chunks, most relevant first.
+
+    Returns:
+        tuple: (prompt text, report dict with prompt token counts and the snippets used)
+    """
+    with stage("prompt"):
+        snippets, report = select_snippets(retrieved, header_fn=snippet_header)
+        prompt = build_prompt(question, snippets)
+        report["prompt_tokens"] = count_tokens(prompt)
+    prompt_stats.record(report)
+    annotate(prompt_tokens=report["prompt_tokens"], snippets=len(report["snippets"]))
+    return prompt, report
+
+
 def call_llm(prompt):
     """
     Send a prompt to the OpenAI Chat Completion API and return the model's response.
@@ -150,17 +488,116 @@ def call_llm(prompt):
         )
 
     # Call the LLM model using the latest OpenAI SDK
-    resp = openai_client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=400,
-        temperature=0.0,
-    )
+    with stage("llm"):
+        resp = openai_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=400,
+            temperature=0.0,
+        )
+    record_usage("llm", resp.usage)
 
     # Extract model output text
     return resp.choices[0].message.content
 
 
+async def call_llm_async(prompt):
+    """
+    Async version of call_llm() using the shared AsyncOpenAI client.
+
+    Args:
+        prompt (str): The prompt text containing context and question.
+
+    Returns:
+        str: Model-generated answer.
+    """
+    if not async_openai_client:
+        raise RuntimeError(
+            "OPENAI_API_KEY not set. Set it or run without generation to only see retrieved snippets."
+        )
+
+    with stage("llm"):
+        resp = await async_openai_client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=400,
+            temperature=0.0,
+        )
+    record_usage("llm", resp.usage)
+    return resp.choices[0].message.content
+
+
+def cache_lookup(question, qv=None, top_k=None):
+    """
+    Look up a precomputed FAQ answer, then a cached answer.
+
+    Args:
+        question (str): User's question.
+        qv (np.ndarray | None): Query embedding for semantic matching.
+        top_k (int | None): Number of snippets the caller wants.
+
+    Returns:
+        dict | None: Cached result or None.
+    """
+    # Precomputed answers always match the serving index version
+    if faq_answers is not None:
+        cached = faq_answers.lookup(question, qv, top_k)
+        if cached:
+            record_cache("faq_hit")
+            return cached
+
+    if answer_cache is None:
+        return None
+    cached = answer_cache.lookup(question, qv, top_k)
+    # Only the semantic lookup (with an embedding) is final, so only it counts a miss
+    if cached:
+        record_cache("exact_hit" if qv is None else "semantic_hit")
+    elif qv is not None:
+        record_cache("miss")
+    return cached
+
+
+def cache_store(question, qv, result, top_k=None, version=None):
+    """
+    Store an LLM answer in the answer cache (if enabled).
+
+    Args:
+        question (str): User's question.
+        qv (np.ndarray): Query embedding.
+        result (dict): Answer dictionary.
+        top_k (int | None): Number of snippets used.
+        version (str | None): retriever.version read before retrieval ran; the answer
+            is dropped if a different index is serving when it is stored.
+    """
+    if answer_cache is not None and result.get("answer"):
+        answer_cache.store(question, qv, result, top_k, version)
+
+
+def no_answer_result():
+    """
+    Result returned when no retrieved chunk passes the similarity cutoff.
+
+    Returns:
+        dict: Answer dictionary with the fixed "I don't know" reply.
+    """
+    return {
+        "answer": NO_ANSWER,
+        "retrieved": [],
+        "note": f"No snippet scored above RETRIEVAL_MIN_SCORE={MIN_SCORE}; LLM not called.",
+    }
+
+
+def source_list(retrieved, prompt_report=None):
+    """Return the source URLs and chunk ids of the snippets used for an answer."""
+    if prompt_report is not None:
+        used = set(prompt_report["snippets"])
+        retrieved = [r for r in retrieved if r.get("chunk_id") in used]
+    return [
+        {"source_url": r.get("source_url"), "chunk_id": r.get("chunk_id"), "score": r.get("score")}
+        for r in retrieved
+    ]
+
+
 def answer_question(question, top_k=5):
     """
     Retrieve relevant snippets for a question and generate an answer using the LLM.
@@ -172,25 +609,155 @@ def answer_question(question, top_k=5):
     Returns:
         dict: Dictionary containing the final answer, retrieved snippets, and optional note.
     """
-    retrieved = retrieve(question, top_k)
+    # Exact-text cache hit skips the embedding call as well
+    cached = cache_lookup(question, top_k=top_k)
+    if cached:
+        return cached
+
+    qv, lexical_hits = embed_with_lexical(question)
+    cached = cache_lookup(question, qv, top_k)
+    if cached:
+        return cached
+
+    # Read before the search: the answer is cached only if this index is still serving afterwards
+    version = retriever.version
+    retrieved, rerank_info = rank_candidates(question, qv, top_k, lexical_hits)
+
+    # Nothing relevant enough: answer immediately without an LLM call
+    if not retrieved:
+        return no_answer_result()
     
-    # Use top 3 snippets to keep prompt short
-    prompt = build_prompt(question, retrieved[:3])
+    # Deduplicate snippets and fill the context token budget by relevance
+    prompt, prompt_report = assemble_prompt(question, retrieved)
 
     # If OpenAI key is missing, return retrieved snippets only
     if not openai_client:
         return {
             "answer": None,
             "retrieved": retrieved,
+            "prompt": prompt_report,
+            "rerank": rerank_info,
             "note": "OPENAI_API_KEY not set — only retrieval performed."
         }
 
     # Otherwise, generate an answer using the LLM
     answer_text = call_llm(prompt)
-    return {"answer": answer_text, "retrieved": retrieved}
+    result = {"answer": answer_text, "retrieved": retrieved, "prompt": prompt_report, "rerank": rerank_info}
+    cache_store(question, qv, result, top_k, version)
+    return result
+
+
+async def call_llm_stream_async(prompt):
+    """
+    Stream the model's answer token by token using the shared AsyncOpenAI client.
+
+    Args:
+        prompt (str): The prompt text containing context and question.
+
+    Yields:
+        str: Pieces of the model-generated answer as they arrive.
+    """
+    if not async_openai_client:
+        raise RuntimeError(
+            "OPENAI_API_KEY not set. Set it or run without generation to only see retrieved snippets."
+        )
+
+    started = time.perf_counter()
+    first_token = False
+    stream = await async_openai_client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=400,
+        temperature=0.0,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+        # The last chunk carries token usage and no choices
+        if getattr(chunk, "usage", None) is not None:
+            record_usage("llm", chunk.usage)
+        # Some chunks (e.g. the final one) carry no content delta
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if not first_token:
+                first_token = True
+                record_stage("llm_first_token", time.perf_counter() - started)
+            yield delta
+    record_stage("llm", time.perf_counter() - started)
+
+
+async def answer_question_async(question, top_k=5):
+    """
+    Async version of answer_question() for the web app.
+
+    Args:
+        question (str): User's question.
+        top_k (int): Number of top snippets to retrieve.
+
+    Returns:
+        dict: Dictionary containing the final answer, retrieved snippets, and optional note.
+    """
+    cached = cache_lookup(question, top_k=top_k)
+    if cached:
+        return cached
+
+    qv, lexical_hits = await embed_with_lexical_async(question)
+    cached = cache_lookup(question, qv, top_k)
+    if cached:
+        return cached
+
+    version = retriever.version
+    retrieved, rerank_info = await rank_candidates_async(question, qv, top_k, lexical_hits)
+
+    if not retrieved:
+        return no_answer_result()
+
+    # Deduplicate snippets and fill the context token budget by relevance
+    prompt, prompt_report = assemble_prompt(question, retrieved)
+
+    if not async_openai_client:
+        return {
+            "answer": None,
+            "retrieved": retrieved,
+            "prompt": prompt_report,
+            "rerank": rerank_info,
+            "note": "OPENAI_API_KEY not set — only retrieval performed."
+        }
+
+    answer_text = await call_llm_async(prompt)
+    result = {"answer": answer_text, "retrieved": retrieved, "prompt": prompt_report, "rerank": rerank_info}
+    cache_store(question, qv, result, top_k, version)
+    return result
+
+
+async def close_async_clients():
+    """Close the shared async HTTP connection pool and the CPU executor, and persist the cache."""
+    if answer_cache is not None:
+        answer_cache.save()
+    if async_openai_client is not None:
+        await async_openai_client.close()
+    cpu_executor.shutdown(wait=False)
+
+
+# Time spent importing this module (the index is loaded separately)
+IMPORT_SECONDS = time.perf_counter() - _import_started
 
 
 if __name__ == "__main__":
+    # Load the index up front; a missing index is reported instead of a traceback
+    try:
+        retriever.load()
+    except RetrieverNotReady as e:
+        print(e)
+        raise SystemExit(1)
+    print(f"Imported in {IMPORT_SECONDS:.2f}s, index loaded in {retriever.status()['load_seconds']:.2f}s")
+
+    # Load the reranker up front so the first question is reranked too
+    if reranker is not None:
+        reranker.warmup()
+
     # Allow interactive testing from the command line
     q = input("Question: ").strip()
     if not q:
@@ -202,7 +769,21 @@ if __name__ == "__main__":
     # Display retrieved sources
     print("\n--- Retrieved sources (top results) ---")
     for r in out["retrieved"]:
-        print("-", r.get("source_url"), f"(chunk_id: {r.get('chunk_id','?')})")
+        score = f", score: {r['score']:.3f}" if "score" in r else ""
+        if "bm25" in r:
+            score += f", bm25: {r['bm25']:.2f}"
+        print("-", r.get("source_url"), f"(chunk_id: {r.get('chunk_id','?')}{score})")
+
+    # Display rerank outcome
+    if out.get("rerank"):
+        info = out["rerank"]
+        print("\nRerank:", f"{info['rerank_ms']:.1f} ms" if info["reranked"] else f"skipped ({info['reason']})")
+
+    # Display prompt size
+    if out.get("prompt"):
+        p = out["prompt"]
+        print(f"\nPrompt: {p['prompt_tokens']} tokens ({p['context_tokens']} context) from "
+              f"{len(p['snippets'])} snippets; {p['duplicates_removed']} duplicates removed")
 
     # Display generated answer (if any)
     print("\n--- Answer ---")
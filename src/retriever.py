@@ -0,0 +1,408 @@
+# src/retriever.py
+
+import os
+import time
+import threading
+import numpy as np
+from pathlib import Path
+from dotenv import load_dotenv
+
+try:
+    from .index_factory import CONFIG_PATH, apply_search_params, load_index_config, read_faiss_index
+    from .meta_store import MetaStore
+    from .lexical_index import LEXICAL_PATH, LexicalIndex, rrf_fuse
+    from .answer_cache import INDEX_VERSION_PATH, read_index_version
+except ImportError:  # executed as a script: python src/<file>.py
+    from index_factory import CONFIG_PATH, apply_search_params, load_index_config, read_faiss_index
+    from meta_store import MetaStore
+    from lexical_index import LEXICAL_PATH, LexicalIndex, rrf_fuse
+    from answer_cache import INDEX_VERSION_PATH, read_index_version
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Paths to FAISS index and metadata files
+INDEX_PATH = Path("indexes/faiss.index")
+META_PATH = Path("indexes/meta.jsonl")
+
+# Memory-map the FAISS index so worker processes share its pages through the page cache
+INDEX_MMAP = os.getenv("INDEX_MMAP", "0") == "1"
+
+# Minimum cosine similarity for a chunk to be sent to the LLM (cosine indexes only)
+MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.2"))
+
+# Hybrid retrieval: fuse BM25 and vector rankings with reciprocal rank fusion
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") != "0"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))   # hits taken from each ranking
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def sidecar_path(index_path, default):
+    """
+    Locate a file build_index.py writes next to the FAISS index (config, BM25, version).
+
+    Args:
+        index_path (Path): FAISS index file.
+        default (Path): The file's default location, whose name is kept.
+
+    Returns:
+        Path: The file in the index's directory.
+    """
+    return Path(index_path).parent / Path(default).name
+
+
+class RetrieverNotReady(RuntimeError):
+    """Raised when the index cannot be loaded (e.g. build_index.py has not run yet)."""
+
+
+class LexicalHits(list):
+    """BM25 hits tagged with the generation of the index snapshot that produced them."""
+
+    def __init__(self, hits, generation):
+        super().__init__(hits)
+        self.generation = generation
+
+
+class IndexSnapshot:
+    """
+    One consistent, read-only set of FAISS index, chunk metadata, index config
+    and BM25 index. Requests hold a reference for their whole search, so a
+    newer snapshot can replace it without affecting them.
+    """
+
+    def __init__(self, generation, index_path=INDEX_PATH, meta_path=META_PATH, mmap=INDEX_MMAP):
+        started = time.perf_counter()
+        if not Path(index_path).exists():
+            raise RetrieverNotReady(f"FAISS index not found at {index_path}. Run build_index.py first.")
+        self.generation = generation
+        self.version = read_index_version(sidecar_path(index_path, INDEX_VERSION_PATH))
+
+        # Load (or memory-map) the FAISS index and open the memory-mapped metadata store.
+        # Under gunicorn --preload this runs once in the master, and forked workers share the pages.
+        self.index, self.mmapped = read_faiss_index(index_path, mmap=mmap)
+        self.metas = MetaStore(meta_path)
+
+        # Apply the search-time knobs saved by build_index.py; FAISS_NPROBE / FAISS_EF_SEARCH override them
+        self.config = load_index_config(sidecar_path(index_path, CONFIG_PATH))
+        params = dict(self.config["params"])
+        if os.getenv("FAISS_NPROBE"):
+            params["nprobe"] = int(os.getenv("FAISS_NPROBE"))
+        if os.getenv("FAISS_EF_SEARCH"):
+            params["ef_search"] = int(os.getenv("FAISS_EF_SEARCH"))
+        apply_search_params(self.index, self.config["index_type"], params)
+        self.cosine = self.config["metric"] == "ip"
+
+        # BM25 inverted index over the same metadata rows (absent for indexes built before it existed)
+        self.lexical = None
+        lexical_path = sidecar_path(index_path, LEXICAL_PATH)
+        if HYBRID_SEARCH and lexical_path.exists():
+            self.lexical = LexicalIndex(lexical_path)
+            if len(self.lexical) != len(self.metas):
+                print(f"Warning: {lexical_path} does not match {meta_path}; rebuild the index. "
+                      "Using vector search only.")
+                self.lexical = None
+
+        self.load_seconds = time.perf_counter() - started
+
+    def dense_search(self, qv, top_k):
+        """
+        Search the FAISS index with a query embedding.
+
+        Args:
+            qv (np.ndarray): 1D query embedding.
+            top_k (int): Number of nearest chunks to fetch.
+
+        Returns:
+            list[tuple]: (metadata row, similarity or L2 distance) pairs, best first.
+            Chunks scoring below RETRIEVAL_MIN_SCORE are left out.
+        """
+        return self.dense_search_batch([qv], top_k)[0]
+
+    def dense_search_batch(self, queries, top_k):
+        """
+        Search the FAISS index with several query embeddings in one call.
+
+        Args:
+            queries (np.ndarray | list): Query embeddings, one per row.
+            top_k (int): Number of nearest chunks to fetch per query.
+
+        Returns:
+            list[list[tuple]]: Per query, (metadata row, similarity or L2 distance) pairs, best first.
+        """
+        import faiss
+
+        # Copy: normalization below works in place
+        q = np.array(queries, dtype="float32")
+
+        # Cosine indexes store normalized vectors, so normalize the queries the same way
+        if self.cosine:
+            faiss.normalize_L2(q)
+
+        # Perform similarity search on FAISS index
+        D, I = self.index.search(q, top_k)
+
+        results = []
+        for dists, labels in zip(D, I):
+            hits = []
+            for dist, label in zip(dists, labels):
+                # Skip empty result slots
+                if label < 0:
+                    continue
+                # Inner product of unit vectors is the cosine similarity; drop weak matches
+                if self.cosine and dist < MIN_SCORE:
+                    continue
+                # Map the FAISS label (row number or stable chunk id) to its metadata row
+                row = self.metas.row_for_label(label)
+                if row is not None:
+                    hits.append((row, float(dist)))
+            results.append(hits)
+        return results
+
+    def lexical_search(self, query, top_k=HYBRID_CANDIDATES):
+        """
+        Rank chunks by BM25 for the query text.
+
+        Args:
+            query (str): The user question.
+            top_k (int): Number of hits to return.
+
+        Returns:
+            LexicalHits | None: (metadata row, BM25 score) pairs, or None when hybrid search is off.
+        """
+        if self.lexical is None:
+            return None
+        return LexicalHits(self.lexical.search(query, top_k), self.generation)
+
+    def search(self, qv, top_k=5, lexical_hits=None):
+        """
+        Retrieve chunks for a query embedding, fused with BM25 hits when given.
+
+        Args:
+            qv (np.ndarray): 1D query embedding.
+            top_k (int): Number of results to return.
+            lexical_hits (LexicalHits | None): Output of lexical_search() for the same question.
+
+        Returns:
+            list[dict]: Metadata for the top_k retrieved chunks, each with its
+            similarity "score" (or "distance" for L2 indexes) when the vector search
+            found it, plus "bm25" and "rrf" in hybrid mode.
+        """
+        return self.search_batch([qv], top_k, [lexical_hits])[0]
+
+    def search_batch(self, queries, top_k=5, lexical_hits=None):
+        """
+        Retrieve chunks for several query embeddings with a single FAISS search.
+
+        Args:
+            queries (np.ndarray | list): Query embeddings, one per row.
+            top_k (int): Number of results per query.
+            lexical_hits (list | None): Per query, the output of lexical_search() or None.
+
+        Returns:
+            list[list[dict]]: Per query, the same results search() returns.
+        """
+        # Rows from a snapshot swapped out since the lookup would point at the wrong chunks
+        lexical_hits = [
+            h if h is not None and getattr(h, "generation", None) == self.generation else None
+            for h in (lexical_hits or [None] * len(queries))
+        ]
+        hybrid = any(h is not None for h in lexical_hits)
+        dense = self.dense_search_batch(queries, max(top_k, HYBRID_CANDIDATES) if hybrid else top_k)
+        return [self._merge(d, h, top_k) for d, h in zip(dense, lexical_hits)]
+
+    def _merge(self, dense, lexical_hits, top_k):
+        """Turn one query's dense hits (fused with its BM25 hits, if any) into result dicts."""
+        key = "score" if self.cosine else "distance"  # legacy L2 index: lower is better
+
+        if lexical_hits is None:
+            return [{**self.metas[row], key: dist} for row, dist in dense[:top_k]]
+
+        # Nothing semantically close enough: keep the no-answer behaviour even if words match
+        if not dense:
+            return []
+
+        dense_scores, bm25_scores = dict(dense), dict(lexical_hits)
+        fused = rrf_fuse([[row for row, _ in dense], [row for row, _ in lexical_hits]], RRF_K)
+        results = []
+        for row, rrf in fused[:top_k]:
+            r = {**self.metas[row], "rrf": rrf}
+            if row in dense_scores:
+                r[key] = dense_scores[row]
+            if row in bm25_scores:
+                r["bm25"] = bm25_scores[row]
+            results.append(r)
+        return results
+
+
+class Retriever:
+    """
+    Owns the current IndexSnapshot and its lifecycle: lazy or background
+    loading, readiness reporting, and atomic hot-swap to a rebuilt index.
+
+    Swapping replaces a single reference, so requests already searching the old
+    snapshot finish on it while new requests see the new one. The old snapshot's
+    memory is released once the last request holding it returns.
+    """
+
+    def __init__(self, index_path=INDEX_PATH, meta_path=META_PATH, mmap=INDEX_MMAP):
+        self.index_path = Path(index_path)
+        self.meta_path = Path(meta_path)
+        self.version_path = sidecar_path(self.index_path, INDEX_VERSION_PATH)
+        self.mmap = mmap
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._generation = 0
+        self.state = "not_loaded"    # not_loaded -> loading -> ready (or failed)
+        self.error = None
+        self.reloads = 0
+        self.last_reload_at = None
+
+    @property
+    def ready(self):
+        """Return True once an index snapshot is serving."""
+        return self._snapshot is not None
+
+    @property
+    def version(self):
+        """Return the index version of the serving snapshot, or None before the first load."""
+        snapshot = self._snapshot
+        return snapshot.version if snapshot is not None else None
+
+    def _build_snapshot(self):
+        """Load a fresh snapshot, retrying if build_index.py replaces files midway."""
+        for _ in range(3):
+            version = read_index_version(self.version_path)
+            self._generation += 1
+            snapshot = IndexSnapshot(self._generation, self.index_path, self.meta_path, self.mmap)
+            if read_index_version(self.version_path) == version:
+                return snapshot
+        return snapshot
+
+    def load(self):
+        """
+        Load the index if no snapshot is serving yet (blocking). Concurrent
+        callers wait for the same load instead of starting their own.
+
+        Returns:
+            IndexSnapshot: The serving snapshot.
+
+        Raises:
+            RetrieverNotReady: If the index files are missing or unreadable.
+        """
+        with self._load_lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            self.state = "loading"
+            try:
+                self._snapshot = self._build_snapshot()
+            except RetrieverNotReady as e:
+                self.state, self.error = "failed", str(e)
+                raise
+            except Exception as e:
+                self.state, self.error = "failed", str(e)
+                raise RetrieverNotReady(str(e)) from e
+            self.state, self.error = "ready", None
+            return self._snapshot
+
+    def load_in_background(self):
+        """Start load() in a daemon thread; failures are kept in .error for /readyz."""
+        def run():
+            try:
+                self.load()
+            except RetrieverNotReady as e:
+                print("Index load failed:", e)
+
+        with self._state_lock:
+            if self._snapshot is not None or self.state == "loading":
+                return
+            self.state = "loading"
+        threading.Thread(target=run, name="retriever-load", daemon=True).start()
+
+    def current(self):
+        """
+        Return the serving snapshot, loading it on first use.
+
+        Returns:
+            IndexSnapshot: Snapshot to run one request against.
+        """
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None else self.load()
+
+    def require(self):
+        """
+        Return the serving snapshot without waiting for a load in progress.
+        Used on the event loop, where blocking on the initial load would stall
+        every other request; a background load is started if none is running.
+
+        Returns:
+            IndexSnapshot: Snapshot to run one request against.
+
+        Raises:
+            RetrieverNotReady: If the index is still loading or failed to load.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        if self.state == "failed":
+            raise RetrieverNotReady(self.error)
+        self.load_in_background()
+        raise RetrieverNotReady("The loan knowledge base is still loading; please try again in a moment.")
+
+    def reload(self):
+        """
+        Load the index from disk again and swap it in atomically. The current
+        snapshot keeps serving until the new one is fully loaded; if loading
+        fails, it stays in place.
+
+        Returns:
+            dict: Retriever status after the swap.
+        """
+        with self._load_lock:
+            snapshot = self._build_snapshot()
+            self._snapshot = snapshot  # single reference assignment: in-flight requests keep the old one
+            self.state, self.error = "ready", None
+            self.reloads += 1
+            self.last_reload_at = time.time()
+        return self.status()
+
+    def reload_if_changed(self):
+        """
+        Hot-swap when build_index.py has written a new index version, or
+        retry a failed initial load once the index exists.
+
+        Returns:
+            bool: True if a new snapshot was swapped in.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            if self.state != "failed" or not self.index_path.exists():
+                return False
+            self.load()
+            return True
+        if read_index_version(self.version_path) in (None, snapshot.version):
+            return False
+        self.reload()
+        return True
+
+    def status(self):
+        """
+        Describe the loading state and the serving snapshot.
+
+        Returns:
+            dict: State, error, index version, size and load time.
+        """
+        snapshot = self._snapshot
+        status = {"state": self.state, "error": self.error, "reloads": self.reloads,
+                  "last_reload_at": self.last_reload_at}
+        if snapshot is not None:
+            status.update({
+                "index_version": snapshot.version,
+                "index_type": snapshot.config["index_type"],
+                "vectors": int(snapshot.index.ntotal),
+                "chunks": len(snapshot.metas),
+                "hybrid": snapshot.lexical is not None,
+                "index_mmapped": snapshot.mmapped,
+                "load_seconds": round(snapshot.load_seconds, 4),
+            })
+        return status
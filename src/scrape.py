@@ -1,16 +1,39 @@
 # src/scrape.py
-import requests, time, json, os
-from bs4 import BeautifulSoup
+import time, json, os
+import re
+import gzip
+import hashlib
+import asyncio
+import argparse
+from urllib.parse import urljoin, urldefrag, urlparse
 from pathlib import Path
 from datetime import datetime
 
+try:
+    from .extract import get_extractor, get_href_extractor
+except ImportError:  # executed as a script: python src/scrape.py
+    from extract import get_extractor, get_href_extractor
+
 # Directory where raw scraped data will be stored
 OUT = Path("data/raw")
 OUT.mkdir(parents=True, exist_ok=True)
 
+# Raw HTML is kept gzip-compressed, apart from the extracted text
+HTML_DIR = OUT / "html"
+
 # Custom user-agent to identify the scraping bot
 HEADERS = {"User-Agent": "LoanAssistantBot/1.0 (+contact)"}
 
+# Crawl state (ETag / Last-Modified per URL) used for conditional requests
+STATE_PATH = Path("data/crawl_state.json")
+
+# Crawler settings
+CRAWL_DEPTH = int(os.getenv("CRAWL_DEPTH", "0"))                  # link hops from the seed URLs (0 = seeds only)
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "16"))     # requests in flight overall
+PER_HOST_CONCURRENCY = int(os.getenv("CRAWL_PER_HOST", "2"))      # requests in flight per host
+PER_HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", "1.0"))      # min seconds between requests to a host
+LINK_PATTERN = os.getenv("CRAWL_LINK_PATTERN", r"loan")           # only follow links whose path matches
+
 # List of Bank of Maharashtra loan-related URLs to scrape
 URLS = [
     "https://bankofmaharashtra.bank.in/personal-banking/loans/home-loan",
@@ -18,89 +41,307 @@ URLS = [
     "https://bankofmaharashtra.bank.in/personal-banking/loans/personal-loan"
 ]
 
-def fetch(url):
+def extract_main_text(html):
     """
-    Send an HTTP GET request and return the HTML content.
+    Extract the main textual content from an HTML page by removing unwanted tags.
+    The parser backend is chosen with HTML_EXTRACTOR (see extract.py).
     
     Args:
-        url (str): Target webpage URL.
+        html (str): Raw HTML content.
     
     Returns:
-        str: Raw HTML content of the page.
+        str: Cleaned text extracted from the HTML.
     """
-    r = requests.get(url, headers=HEADERS, timeout=20)
-    r.raise_for_status()  # Raise an error if the request fails
-    return r.text
+    return get_extractor()(html)
 
-def extract_main_text(html):
+def extract_links(html, base_url, allowed_hosts, pattern=LINK_PATTERN):
     """
-    Extract the main textual content from an HTML page by removing unwanted tags.
+    Collect in-domain links whose path matches the loan link pattern.
     
     Args:
         html (str): Raw HTML content.
+        base_url (str): URL the HTML was fetched from.
+        allowed_hosts (set[str]): Hostnames the crawl may visit.
+        pattern (str): Regular expression matched against the link path.
     
     Returns:
-        str: Cleaned text extracted from the HTML.
+        set[str]: Absolute URLs without fragments.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    rx = re.compile(pattern, re.IGNORECASE)
+    links = set()
+    for href in get_href_extractor()(html):
+        url, _ = urldefrag(urljoin(base_url, href))
+        parsed = urlparse(url)
+        if parsed.scheme in ("http", "https") and parsed.hostname in allowed_hosts and rx.search(parsed.path):
+            links.add(url)
+    return links
 
-    # Remove non-content or noisy HTML elements
-    for tag in soup(["script", "style", "header", "footer", "nav", "aside", "noscript"]):
-        tag.decompose()
+def slug_for(url):
+    """Create a safe filename based on the URL."""
+    parsed = urlparse(url)
+    return (parsed.netloc + parsed.path).replace("/", "_").replace(":", "_")[:120]
 
-    # Heuristically select the main content section (if available)
-    main = soup.find("main") or soup.find("article") or soup
+def save_html(path, html):
+    """Write raw HTML gzip-compressed, atomically."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(html)
+    os.replace(tmp, path)
 
-    # Extract visible text and clean up whitespace
-    text = main.get_text(separator="\n")
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    return "\n".join(lines)
+def load_raw_html(rec):
+    """
+    Return the raw HTML belonging to a saved page record.
+    
+    Args:
+        rec (dict): Record from data/raw/*.json.
+    
+    Returns:
+        str | None: HTML from the compressed file, or inline raw_html of older records.
+    """
+    html_path = rec.get("html_path")
+    if html_path and Path(html_path).exists():
+        with gzip.open(html_path, "rt", encoding="utf-8") as f:
+            return f.read()
+    return rec.get("raw_html")
 
-def main():
+class HostLimiter:
     """
-    Scrape loan-related pages from the Bank of Maharashtra website.
-    Extracts clean text and saves both raw HTML and text to JSON files.
+    Per-host politeness: caps concurrent requests to a host and enforces a
+    minimum delay between the starts of consecutive requests.
     """
-    meta = []  # Track saved file paths for logging
 
-    for url in URLS:
-        try:
-            print("Fetching:", url)
+    def __init__(self, concurrency=PER_HOST_CONCURRENCY, delay=PER_HOST_DELAY):
+        self.sem = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self):
+        await self.sem.acquire()
+        # Reserve the next start slot for this host, then wait for it
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.delay
+        await asyncio.sleep(start - now)
+        return self
 
-            # Fetch HTML content
-            html = fetch(url)
+    async def __aexit__(self, *exc):
+        self.sem.release()
+        return False
 
-            # Extract readable text
-            text = extract_main_text(html)
+class Crawler:
+    """
+    Async crawler with a shared connection pool, per-host limits, conditional
+    GETs (ETag / If-Modified-Since) and in-domain link following.
+    """
+
+    def __init__(self, seeds=URLS, max_depth=CRAWL_DEPTH, concurrency=CRAWL_CONCURRENCY,
+                 per_host=PER_HOST_CONCURRENCY, delay=PER_HOST_DELAY,
+                 out_dir=OUT, state_path=STATE_PATH, link_pattern=LINK_PATTERN, html_dir=None):
+        self.seeds = list(seeds)
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.out_dir = Path(out_dir)
+        self.html_dir = Path(html_dir) if html_dir else self.out_dir / "html"
+        self.state_path = Path(state_path)
+        self.link_pattern = link_pattern
+        self.allowed_hosts = {urlparse(u).hostname for u in self.seeds}
+        self.state = self._load_state()
+        self._limiters = {}
+        self.stats = {"fetched": 0, "not_modified": 0, "errors": 0, "bytes": 0}
 
-            # Create a safe filename based on the URL
-            slug = url.replace("https://", "").replace("/", "_")[:120]
-            out_file = OUT / f"{slug}.json"
+    def _load_state(self):
+        """Load ETag / Last-Modified values from the previous crawl."""
+        if self.state_path.exists():
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
 
-            # Build a structured record with metadata
-            rec = {
-                "url": url,
-                "fetched_at": datetime.utcnow().isoformat() + "Z",
-                "raw_html": html,
-                "raw_text": text
-            }
+    def _save_state(self):
+        """Write the crawl state atomically."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
 
-            # Save the record as a JSON file
-            with open(out_file, "w", encoding="utf-8") as f:
-                json.dump(rec, f, ensure_ascii=False, indent=2)
+    def _limiter(self, url):
+        """Return the politeness limiter for a URL's host."""
+        host = urlparse(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = HostLimiter(self.per_host, self.delay)
+        return self._limiters[host]
 
-            # Add path to metadata log
-            meta.append(str(out_file))
+    def _remove_stale_records(self):
+        """
+        Delete raw records of pages that are now saved under another file name
+        (e.g. written by the old sequential scraper), so parse_clean.py does not
+        ingest a page twice.
+        
+        Returns:
+            int: Number of files removed.
+        """
+        removed = 0
+        for path in self.out_dir.glob("*.json"):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    url = json.load(f).get("url")
+            except (OSError, ValueError):
+                continue
+            current = self.state.get(url, {}).get("out_file")
+            if current and Path(current).exists() and Path(current).resolve() != path.resolve():
+                path.unlink()
+                removed += 1
+        return removed
+
+    def _saved_html(self, url):
+        """Return the HTML saved by an earlier crawl, or None if it is missing or unreadable."""
+        out_file = self.state.get(url, {}).get("out_file")
+        if not out_file or not Path(out_file).exists():
+            return None
+        try:
+            with open(out_file, encoding="utf-8") as f:
+                return load_raw_html(json.load(f))
+        except (OSError, ValueError):
+            return None
 
-            # Be polite — add a short delay between requests
-            time.sleep(1.0)
+    async def fetch_page(self, client, global_sem, url):
+        """
+        Fetch one page with a conditional GET and save it if it changed.
+        
+        Returns:
+            str | None: The page HTML (fresh or previously saved), or None on error.
+        """
+        # Validators are only worth sending while the copy they vouch for is still on disk;
+        # otherwise a 304 would leave the page out of the corpus
+        prev = self.state.get(url, {})
+        saved = self._saved_html(url)
+        headers = {}
+        if saved is not None and prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if saved is not None and prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
 
+        try:
+            async with global_sem, self._limiter(url):
+                print("Fetching:", url)
+                r = await client.get(url, headers=headers)
+                if r.status_code == 304 and saved is None:
+                    # Not modified, but there is no saved copy to keep: download it in full
+                    r = await client.get(url)
+            if r.status_code == 304:
+                # Unchanged since the last crawl: nothing downloaded, nothing rewritten
+                self.stats["not_modified"] += 1
+                return saved
+            r.raise_for_status()
         except Exception as e:
-            # Handle network or parsing errors gracefully
+            # Handle network or HTTP errors gracefully
+            self.stats["errors"] += 1
             print("Error for", url, e)
+            return None
+
+        html = r.text
+        self.stats["fetched"] += 1
+        self.stats["bytes"] += len(r.content)
+
+        # Store the HTML compressed on its own; the JSON record keeps only the text
+        slug = slug_for(url)
+        html_file = self.html_dir / f"{slug}.html.gz"
+        save_html(html_file, html)
+
+        # Build a structured record with metadata and save it
+        out_file = self.out_dir / f"{slug}.json"
+        raw_text = extract_main_text(html)
+        rec = {
+            "url": url,
+            "fetched_at": datetime.utcnow().isoformat() + "Z",
+            "html_path": str(html_file),
+            "content_hash": hashlib.sha256(raw_text.encode("utf-8")).hexdigest(),
+            "raw_text": raw_text
+        }
+        with open(out_file, "w", encoding="utf-8") as f:
+            json.dump(rec, f, ensure_ascii=False, indent=2)
+
+        # Remember validators for the next conditional request
+        self.state[url] = {
+            "etag": r.headers.get("etag"),
+            "last_modified": r.headers.get("last-modified"),
+            "fetched_at": rec["fetched_at"],
+            "content_hash": rec["content_hash"],
+            "out_file": str(out_file),
+        }
+        return html
+
+    async def run(self):
+        """
+        Crawl breadth-first from the seed URLs up to max_depth link hops.
+        
+        Returns:
+            dict: Crawl statistics.
+        """
+        import httpx
+
+        started = time.perf_counter()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        seen = set(self.seeds)
+        frontier = list(self.seeds)
+        global_sem = asyncio.Semaphore(self.concurrency)
+
+        # One client and connection pool for the whole crawl
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(headers=HEADERS, timeout=20, follow_redirects=True, limits=limits) as client:
+            for depth in range(self.max_depth + 1):
+                pages = await asyncio.gather(*[self.fetch_page(client, global_sem, u) for u in frontier])
+                if depth == self.max_depth:
+                    break
+
+                # Queue unseen in-domain loan links for the next level
+                next_frontier = []
+                for url, html in zip(frontier, pages):
+                    if not html:
+                        continue
+                    for link in sorted(extract_links(html, url, self.allowed_hosts, self.link_pattern)):
+                        if link not in seen:
+                            seen.add(link)
+                            next_frontier.append(link)
+                frontier = next_frontier
+                if not frontier:
+                    break
+
+        self._save_state()
+        self.stats["stale_removed"] = self._remove_stale_records()
+        self.stats["pages_seen"] = len(seen)
+        self.stats["seconds"] = round(time.perf_counter() - started, 2)
+        return self.stats
+
+def main(argv=None):
+    """
+    Crawl loan-related pages from the Bank of Maharashtra website.
+    Extracts clean text to JSON files and keeps the raw HTML gzip-compressed;
+    pages unchanged since the last crawl are skipped via conditional requests.
+    Only the seed URLs are fetched unless --depth is given.
+    """
+    parser = argparse.ArgumentParser(description="Crawl loan pages.")
+    parser.add_argument("seeds", nargs="*", default=URLS, help="Seed URLs (default: scrape.URLS)")
+    parser.add_argument("--depth", type=int, default=CRAWL_DEPTH)
+    parser.add_argument("--concurrency", type=int, default=CRAWL_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY)
+    parser.add_argument("--delay", type=float, default=PER_HOST_DELAY)
+    parser.add_argument("--out-dir", default=str(OUT))
+    parser.add_argument("--state", default=str(STATE_PATH))
+    args = parser.parse_args(argv)
+
+    crawler = Crawler(args.seeds, args.depth, args.concurrency, args.per_host, args.delay,
+                      args.out_dir, args.state)
+    stats = asyncio.run(crawler.run())
 
-    # Print summary of saved files
-    print("Saved files:", meta)
+    # Print summary of the crawl
+    print("Crawl stats:", stats)
 
 # Entry point for standalone execution
 if __name__ == "__main__":
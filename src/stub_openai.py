@@ -0,0 +1,263 @@
+# src/stub_openai.py
+
+import re
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Defaults for the stub's behaviour
+STUB_DIM = 1536
+STUB_ANSWER_TOKENS = 60
+
+_WORD = re.compile(r"\w+")
+
+
+def _text_seed(text):
+    """Stable 64-bit seed for a string."""
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "big")
+
+
+def stub_vector(text, dim=STUB_DIM):
+    """
+    Deterministic pseudo-embedding for a text: a hashed bag of words, so the
+    same text always maps to the same unit vector and texts sharing words map
+    to nearby vectors. An index built through the stub then gives sensible
+    retrieval results, and stub runs are reproducible.
+
+    Args:
+        text (str): Input text.
+        dim (int): Vector dimension.
+
+    Returns:
+        list[float]: Unit-length vector.
+    """
+    vec = np.zeros(dim, dtype="float32")
+    for word in _WORD.findall(text.lower()):
+        h = _text_seed(word)
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vec)
+    if norm == 0:
+        # No words at all: fall back to a random direction seeded by the text
+        vec = np.random.default_rng(_text_seed(text)).standard_normal(dim).astype("float32")
+        norm = np.linalg.norm(vec)
+    return (vec / norm).tolist()
+
+
+def stub_answer(prompt, n_tokens=STUB_ANSWER_TOKENS):
+    """
+    Deterministic chat answer for a prompt: cites the first source URL in the
+    prompt and is padded to n_tokens words.
+
+    Args:
+        prompt (str): Prompt text (last user message).
+        n_tokens (int): Number of words to return.
+
+    Returns:
+        list[str]: Answer pieces, one per streamed token.
+    """
+    source = re.search(r"source: (\S+?)[,)]", prompt)
+    words = ["Stub", "answer"] + ([f"({source.group(1)})"] if source else [])
+    filler = ["lorem", "ipsum", "dolor", "sit", "amet"]
+    words += [filler[i % len(filler)] for i in range(max(0, n_tokens - len(words)))]
+    return [w if i == 0 else " " + w for i, w in enumerate(words[:max(1, n_tokens)])]
+
+
+class StubState:
+    """Settings and counters shared by all request handler threads."""
+
+    def __init__(self, dim=STUB_DIM, latency=0.0, rate_limit_every=0,
+                 llm_latency=0.0, token_latency=0.0, answer_tokens=STUB_ANSWER_TOKENS):
+        self.dim = dim
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.llm_latency = llm_latency        # seconds before the first chat token
+        self.token_latency = token_latency    # seconds between chat tokens
+        self.answer_tokens = answer_tokens
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible handler for POST /v1/embeddings and /v1/chat/completions."""
+
+    state = StubState()
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _rate_limited(self):
+        """Return True (and send a 429) every Nth request when rate limiting is simulated."""
+        st = self.state
+        with st.lock:
+            st.requests += 1
+            n = st.requests
+        if st.rate_limit_every and n % st.rate_limit_every == 0:
+            self._send_json(
+                429,
+                {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_exceeded"}},
+                {"Retry-After": "0.05"},
+            )
+            return True
+        return False
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if path.endswith("/embeddings"):
+            self.handle_embeddings()
+        elif path.endswith("/chat/completions"):
+            self.handle_chat()
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def handle_embeddings(self):
+        req = self._read_json()
+        if self._rate_limited():
+            return
+        time.sleep(self.state.latency)
+        inputs = req.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": stub_vector(t, self.state.dim)}
+            for i, t in enumerate(inputs)
+        ]
+        tokens = sum(len(t.split()) for t in inputs)
+        self._send_json(200, {
+            "object": "list",
+            "data": data,
+            "model": req.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+
+    def handle_chat(self):
+        req = self._read_json()
+        if self._rate_limited():
+            return
+        st = self.state
+        messages = req.get("messages") or [{}]
+        prompt = messages[-1].get("content") or ""
+        pieces = stub_answer(prompt, st.answer_tokens)
+        prompt_tokens = len(prompt.split())
+        model = req.get("model", "stub")
+        completion_id = "chatcmpl-stub-" + uuid.uuid4().hex[:12]
+        created = int(time.time())
+        time.sleep(st.llm_latency)
+
+        if not req.get("stream"):
+            time.sleep(st.token_latency * len(pieces))
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(pieces)}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                          "total_tokens": prompt_tokens + len(pieces)},
+            })
+            return
+
+        # Server-Sent Events: one chunk per token, then [DONE]; the connection closes at the end
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                       "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(st.token_latency)
+            chunk({"content": piece})
+        chunk({}, "stop")
+        if (req.get("stream_options") or {}).get("include_usage"):
+            usage = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [], "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                                              "total_tokens": prompt_tokens + len(pieces)}}
+            self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def serve(host="127.0.0.1", port=8001, dim=STUB_DIM, latency=0.0, rate_limit_every=0,
+          llm_latency=0.0, token_latency=0.0, answer_tokens=STUB_ANSWER_TOKENS):
+    """
+    Start the stub server in a background thread.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind (0 picks a free port).
+        dim (int): Embedding dimension to return.
+        latency (float): Seconds to sleep per embeddings request.
+        rate_limit_every (int): Return a 429 on every Nth request (0 = never).
+        llm_latency (float): Seconds before the first chat completion token.
+        token_latency (float): Seconds between chat completion tokens.
+        answer_tokens (int): Tokens per chat answer.
+
+    Returns:
+        ThreadingHTTPServer: The running server; use server.server_address and server.shutdown().
+        Settings can be changed while it runs through server.RequestHandlerClass.state.
+    """
+    handler = type("BoundStubHandler", (StubHandler,), {
+        "state": StubState(dim, latency, rate_limit_every, llm_latency, token_latency, answer_tokens),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    """
+    Run the stub in the foreground, e.g.:
+        python src/stub_openai.py --port 8001 --latency 0.05 --rate-limit-every 10
+        OPENAI_BASE_URL=http://127.0.0.1:8001/v1 python src/bulk_embed.py
+    """
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--dim", type=int, default=STUB_DIM)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds before the first chat token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between chat tokens")
+    parser.add_argument("--answer-tokens", type=int, default=STUB_ANSWER_TOKENS)
+    args = parser.parse_args(argv)
+
+    server = serve(args.host, args.port, args.dim, args.latency, args.rate_limit_every,
+                   args.llm_latency, args.token_latency, args.answer_tokens)
+    print(f"Stub OpenAI server on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+# Entry point for script execution
+if __name__ == "__main__":
+    main()
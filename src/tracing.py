@@ -0,0 +1,231 @@
+# src/tracing.py
+
+import os
+import json
+import time
+import uuid
+import logging
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# One JSON line per answered request on stderr (REQUEST_LOG=0 turns it off)
+REQUEST_LOG = os.getenv("REQUEST_LOG", "1") == "1"
+
+# Prometheus metrics are optional: without prometheus_client, stages are still traced and logged
+try:
+    from prometheus_client import Counter, Histogram
+except ImportError:
+    Counter = Histogram = None
+
+# Latency buckets in seconds, from sub-millisecond searches to multi-second LLM calls
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+if Histogram is not None:
+    STAGE_SECONDS = Histogram("rag_stage_seconds", "Time spent in each answer stage", ["stage"], buckets=_BUCKETS)
+    REQUEST_SECONDS = Histogram("rag_request_seconds", "End-to-end request latency", ["route"], buckets=_BUCKETS)
+    REQUESTS = Counter("rag_requests_total", "Answered requests", ["route", "status"])
+    ERRORS = Counter("rag_request_errors_total", "Requests that raised", ["route", "error"])
+    TOKENS = Counter("rag_openai_tokens_total", "Tokens reported by the OpenAI API", ["kind"])
+    CACHE = Counter("rag_answer_cache_total", "Answer cache lookups", ["result"])
+    TOP_SCORE = Histogram("rag_retrieval_top_score", "Similarity of the best retrieved chunk",
+                          buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+    RETRIEVED = Histogram("rag_retrieved_chunks", "Chunks retrieved per question", buckets=(0, 1, 2, 3, 5, 10, 20))
+
+# Structured request log; the message itself is the JSON document
+logger = logging.getLogger("loan_assistant.requests")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Trace of the request being handled in the current task or thread (None outside a request)
+_current = contextvars.ContextVar("rag_trace", default=None)
+
+
+class Trace:
+    """Timings and attributes collected while answering one request."""
+
+    __slots__ = ("request_id", "route", "started", "stages", "attrs")
+
+    def __init__(self, route, request_id=None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.attrs = {}
+
+    def add_stage(self, name, seconds):
+        """Accumulate time spent in a stage (a stage can run more than once)."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+def current_trace():
+    """Return the trace of the current request, or None."""
+    return _current.get()
+
+
+def start_trace(route, request_id=None):
+    """
+    Begin tracing a request in the current context.
+
+    Args:
+        route (str): Route or entry point name, used as a metric label.
+        request_id (str | None): Incoming X-Request-ID, or None to generate one.
+
+    Returns:
+        Trace: The new trace.
+    """
+    trace = Trace(route, request_id)
+    _current.set(trace)
+    return trace
+
+
+def finish_trace(trace, error=None):
+    """
+    Close a trace: record request metrics and write its structured log line.
+
+    Args:
+        trace (Trace): Trace returned by start_trace().
+        error (BaseException | None): Exception that ended the request, if any.
+
+    Returns:
+        dict: The logged record.
+    """
+    duration = time.perf_counter() - trace.started
+    status = "error" if error is not None else "ok"
+    if Histogram is not None:
+        REQUEST_SECONDS.labels(trace.route).observe(duration)
+        REQUESTS.labels(trace.route, status).inc()
+        if error is not None:
+            ERRORS.labels(trace.route, type(error).__name__).inc()
+
+    record = {
+        "event": "request",
+        "request_id": trace.request_id,
+        "route": trace.route,
+        "status": status,
+        "duration_ms": round(duration * 1000, 2),
+        "stages_ms": {k: round(v * 1000, 2) for k, v in trace.stages.items()},
+        **trace.attrs,
+    }
+    if error is not None:
+        record["error"] = f"{type(error).__name__}: {error}"
+    if REQUEST_LOG:
+        logger.info(json.dumps(record, ensure_ascii=False, default=str))
+    _current.set(None)
+    return record
+
+
+def record_stage(name, seconds):
+    """Record time spent in a stage on the metrics and the current trace."""
+    if Histogram is not None:
+        STAGE_SECONDS.labels(name).observe(seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.add_stage(name, seconds)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the enclosed block as one answer stage.
+
+    Args:
+        name (str): Stage name ("embed", "search", "prompt", "llm", ...).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def annotate(**attrs):
+    """Attach attributes to the current trace (ignored outside a request)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def record_usage(kind, usage):
+    """
+    Count tokens from an OpenAI response's usage block.
+
+    Args:
+        kind (str): "llm" or "embedding".
+        usage: The response's usage object (may be None, e.g. from a stub).
+    """
+    if usage is None:
+        return
+    counts = {
+        f"{kind}_prompt": getattr(usage, "prompt_tokens", None),
+        f"{kind}_completion": getattr(usage, "completion_tokens", None),
+    }
+    counts = {k: v for k, v in counts.items() if v}
+    if Histogram is not None:
+        for k, v in counts.items():
+            TOKENS.labels(k).inc(v)
+    trace = _current.get()
+    if trace is not None:
+        tokens = trace.attrs.setdefault("tokens", {})
+        for k, v in counts.items():
+            tokens[k] = tokens.get(k, 0) + v
+
+
+def record_cache(result):
+    """
+    Count an answer cache lookup.
+
+    Args:
+        result (str): "faq_hit", "exact_hit", "semantic_hit" or "miss".
+    """
+    if Histogram is not None:
+        CACHE.labels(result).inc()
+    annotate(cache=result)
+
+
+def record_retrieval(retrieved):
+    """
+    Record how many chunks were retrieved and how well the best one scored.
+
+    Args:
+        retrieved (list[dict]): Retrieved chunks, best first.
+    """
+    scores = [r["score"] for r in retrieved if r.get("score") is not None]
+    top = max(scores) if scores else None
+    if Histogram is not None:
+        RETRIEVED.observe(len(retrieved))
+        if top is not None:
+            TOP_SCORE.observe(top)
+    annotate(
+        retrieved=len(retrieved),
+        top_score=round(top, 4) if top is not None else None,
+        chunk_ids=[r.get("chunk_id") for r in retrieved],
+    )
+
+
+def metrics_payload():
+    """
+    Render all metrics in the Prometheus text format. With several gunicorn
+    workers, set PROMETHEUS_MULTIPROC_DIR so every worker's samples are merged.
+
+    Returns:
+        tuple: (body bytes, content type), or (None, None) without prometheus_client.
+    """
+    if Histogram is None:
+        return None, None
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import sys
+from pathlib import Path
+
+# Import the app modules as the "src" package, as uvicorn src.app:app does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
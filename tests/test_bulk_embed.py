@@ -0,0 +1,89 @@
+# tests/test_bulk_embed.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("openai")
+pytest.importorskip("dotenv")
+httpx = pytest.importorskip("httpx")
+
+from src.bulk_embed import BulkEmbedder, get_encoding
+from src.stub_openai import serve, stub_vector
+
+DIM = 8
+TEXTS = [f"Loan product {i}: interest rate {7 + i / 10:.2f}% per annum" for i in range(12)]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def tokenizer():
+    # tiktoken downloads its encoding files on first use
+    try:
+        get_encoding()
+    except Exception as e:
+        pytest.skip(f"tiktoken encoding unavailable: {e}")
+
+
+@pytest.fixture
+def stub():
+    server = serve(port=0, dim=DIM)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_embedder(stub, **kwargs):
+    """Embedder on the stub with two texts per request, so TEXTS needs six requests."""
+    base_url = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    return BulkEmbedder(model="stub", max_items=2, base_url=base_url, api_key="stub", **kwargs)
+
+
+def expected_vectors(texts):
+    return np.asarray([stub_vector(t, DIM) for t in texts], dtype="float32")
+
+
+def test_rate_limited_requests_are_retried(stub):
+    stub.RequestHandlerClass.state.rate_limit_every = 3
+    embedder = make_embedder(stub, concurrency=2, checkpoint_dir=None)
+
+    vecs = asyncio.run(embedder.embed_async(TEXTS))
+
+    np.testing.assert_allclose(vecs, expected_vectors(TEXTS), rtol=1e-6)
+    st = embedder.report()
+    assert st["api_batches"] == st["batches"] == 6
+    assert st["rate_limited"] > 0 and st["retries"] == st["rate_limited"]
+
+
+def test_retry_after_header_is_honoured():
+    error = SimpleNamespace(response=httpx.Response(429, headers={"retry-after": "0.05"}))
+    assert BulkEmbedder._retry_after(error, attempt=5) == 0.05
+
+    # Without the header, exponential backoff with jitter
+    delay = BulkEmbedder._retry_after(SimpleNamespace(response=None), attempt=2)
+    assert 1.0 <= delay <= 2.0
+
+
+def test_interrupted_run_resumes_from_checkpoints(stub, tmp_path):
+    state = stub.RequestHandlerClass.state
+    ckpt = tmp_path / "checkpoints"
+
+    # The third request is rate limited and retries are off, so the run stops after two batches
+    state.rate_limit_every = 3
+    first = make_embedder(stub, concurrency=1, max_retries=0, checkpoint_dir=ckpt)
+    with pytest.raises(Exception):
+        asyncio.run(first.embed_async(TEXTS))
+    assert len(list(ckpt.glob("batch_*.npy"))) == 2
+
+    # The rerun only sends the batches that have no checkpoint
+    state.rate_limit_every = 0
+    requests_before = state.requests
+    second = make_embedder(stub, concurrency=1, checkpoint_dir=ckpt)
+    vecs = second.embed(TEXTS)
+    second.close()
+
+    np.testing.assert_allclose(vecs, expected_vectors(TEXTS), rtol=1e-6)
+    st = second.report()
+    assert st["resumed_batches"] == 2 and st["api_batches"] == 4
+    assert state.requests - requests_before == 4
@@ -0,0 +1,145 @@
+# tests/test_scrape.py
+
+import json
+import time
+import asyncio
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from src.scrape import Crawler
+
+
+class FixtureSite:
+    """Pages served by a local HTTP server, with ETags and a record of every request."""
+
+    def __init__(self, latency=0.0):
+        self.pages = {}
+        self.requests = []
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    def set_page(self, path, body, etag):
+        self.pages[path] = (f"<html><body><main><p>{body}</p></main></body></html>", etag)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests.append((self.path, dict(self.headers)))
+                    site.in_flight += 1
+                    site.max_in_flight = max(site.max_in_flight, site.in_flight)
+                try:
+                    time.sleep(site.latency)
+                    if self.path not in site.pages:
+                        self.send_response(404)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    html, etag = site.pages[self.path]
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        return
+                    body = html.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with site._lock:
+                        site.in_flight -= 1
+
+        return Handler
+
+
+@pytest.fixture
+def site():
+    site = FixtureSite()
+    site.server = ThreadingHTTPServer(("127.0.0.1", 0), site.handler())
+    thread = threading.Thread(target=site.server.serve_forever, daemon=True)
+    thread.start()
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
+
+
+def crawl(site, tmp_path, paths, per_host=2):
+    """Run one crawl of the given paths with the state and output kept under tmp_path."""
+    crawler = Crawler([site.url(p) for p in paths], max_depth=0, per_host=per_host, delay=0,
+                      out_dir=tmp_path / "raw", state_path=tmp_path / "crawl_state.json")
+    return asyncio.run(crawler.run())
+
+
+def saved_record(tmp_path, site, path):
+    state = json.loads((tmp_path / "crawl_state.json").read_text(encoding="utf-8"))
+    out_file = state[site.url(path)]["out_file"]
+    with open(out_file, encoding="utf-8") as f:
+        return out_file, json.load(f)
+
+
+def test_conditional_get_keeps_saved_copy(site, tmp_path):
+    site.set_page("/home-loan", "Home loan interest rates", '"v1"')
+    assert crawl(site, tmp_path, ["/home-loan"])["fetched"] == 1
+    out_file, first = saved_record(tmp_path, site, "/home-loan")
+
+    stats = crawl(site, tmp_path, ["/home-loan"])
+    assert stats["not_modified"] == 1 and stats["fetched"] == 0
+    assert site.requests[-1][1].get("If-None-Match") == '"v1"'
+    _, second = saved_record(tmp_path, site, "/home-loan")
+    assert second == first
+
+
+def test_missing_saved_copy_is_fetched_in_full(site, tmp_path):
+    site.set_page("/home-loan", "Home loan interest rates", '"v1"')
+    crawl(site, tmp_path, ["/home-loan"])
+    out_file, _ = saved_record(tmp_path, site, "/home-loan")
+    Path(out_file).unlink()
+
+    stats = crawl(site, tmp_path, ["/home-loan"])
+    assert stats["fetched"] == 1 and stats["not_modified"] == 0
+    assert "If-None-Match" not in site.requests[-1][1]
+    _, rec = saved_record(tmp_path, site, "/home-loan")
+    assert "Home loan interest rates" in rec["raw_text"]
+
+
+def test_per_host_concurrency_limit(site, tmp_path):
+    site.latency = 0.1
+    paths = [f"/loan-{i}" for i in range(8)]
+    for i, path in enumerate(paths):
+        site.set_page(path, f"Loan product {i}", f'"{i}"')
+
+    stats = crawl(site, tmp_path, paths, per_host=2)
+    assert stats["fetched"] == len(paths)
+    assert site.max_in_flight == 2
+
+
+def test_changed_page_gets_new_content_hash(site, tmp_path):
+    site.set_page("/personal-loan", "Personal loan at 9.00% p.a.", '"v1"')
+    crawl(site, tmp_path, ["/personal-loan"])
+    _, before = saved_record(tmp_path, site, "/personal-loan")
+
+    site.set_page("/personal-loan", "Personal loan at 9.50% p.a.", '"v2"')
+    stats = crawl(site, tmp_path, ["/personal-loan"])
+    assert stats["fetched"] == 1
+    _, after = saved_record(tmp_path, site, "/personal-loan")
+    assert after["content_hash"] != before["content_hash"]
+    assert "9.50%" in after["raw_text"]